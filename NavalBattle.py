@@ -1,31 +1,305 @@
 # -*- coding: utf-8 -*-
-import pygame
+import argparse
+import os
+import random
+from concurrent.futures import ThreadPoolExecutor
 
-from constants import WINDOW_CAPTION, FPS
-from graphics import make_board_titles, make_menu_buttons, draw_game_screen
-from game_engine import (set_up_new_game, handle_events, handle_player_move,
-                         make_ai_move)
+# pygame greets on stdout when imported, which would break the JSON
+# printed by --simulate
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
 
+import pygame  # noqa: E402
+from pygame import (  # noqa: E402
+    QUIT, KEYUP, MOUSEMOTION, MOUSEBUTTONUP, WINDOWEXPOSED)
 
-def main():
+from constants import (  # noqa: E402
+    GameDataType, TextSurfaceType,
+    WINDOW_CAPTION, WINDOW_WIDTH, WINDOW_HEIGHT, FPS, EVENT_WAIT_TIMEOUT,
+    AI_THINKING_INDICATOR_DELAY, PROFILER_CSV_ENV_VAR, METRICS_FILE_ENV_VAR,
+    AI_MODES, DEFAULT_AI_MODE, RuleSet, DEFAULT_RULES, SIMUL_MAX_BOARDS)
+from graphics import (  # noqa: E402
+    make_board_titles, make_menu_buttons, draw_game_screen,
+    make_render_state, request_full_redraw, draw_splash_screen)
+from game_engine import (  # noqa: E402
+    set_up_new_game, handle_player_move, ponder_ai_move, submit_ai_move,
+    player_can_move, receive_ai_move)
+from controls import (  # noqa: E402
+    AI_MOVE_EVENT, HINT_EVENT, wait_for_events, handle_events,
+    post_ai_move_event, post_hint_event)
+from hints import update_hint  # noqa: E402
+from profiler import (  # noqa: E402
+    make_profiler, time_stage, finish_frame, draw_profiler_overlay,
+    handle_profiler_events, close_profiler)
+from results import (  # noqa: E402
+    start_results_store, stop_results_store, record_game_result,
+    make_game_result)
+from metrics import (  # noqa: E402
+    start_metrics_exporter, stop_metrics_exporter)
+from profile_hooks import (  # noqa: E402
+    start_frame_profile, finish_profiled_frame, dump_profile_results)
+from simul import (  # noqa: E402
+    set_up_simul, handle_simul_events, play_simul_move,
+    make_simul_game_result, make_simul_render_state, draw_simul_screen)
+
+
+def parse_board_size(text: str) -> tuple[int, int]:
+    """Parses a board size in WIDTHxHEIGHT format."""
+    try:
+        board_width, board_height = (int(size) for size in text.split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"invalid board size '{text}', must be like 10x10")
+    return board_width, board_height
+
+
+def parse_fleet(text: str) -> tuple[tuple[int, ...], tuple[int, ...]]:
+    """Parses a fleet in SIZE:COUNT,SIZE:COUNT... format."""
+    try:
+        ship_types = [tuple(int(number) for number in ship_type.split(':'))
+                      for ship_type in text.split(',')]
+        ship_sizes, ship_counts = zip(*ship_types)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"invalid fleet '{text}', must be like 4:1,3:2,2:3,1:4")
+    return ship_sizes, ship_counts
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Naval battle game.")
+    parser.add_argument('--ai', choices=AI_MODES, default=DEFAULT_AI_MODE,
+                        help="AI mode (default: %(default)s)")
+    parser.add_argument('--simul', type=int, metavar='N',
+                        help="fight N AI boards at once, up to "
+                             f"{SIMUL_MAX_BOARDS}")
+    parser.add_argument('--simulate', type=int, metavar='N',
+                        help="play N AI games without graphics and print "
+                             "statistics as JSON")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="simulation processes (default: CPU count)")
+    parser.add_argument('--seed', type=int, default=None,
+                        help="simulation seed (default: random)")
+    parser.add_argument('--output', default=None,
+                        help="file to write simulation JSON to")
+    parser.add_argument('--log', default=None,
+                        help="game log file to append simulated games to")
+    parser.add_argument('--corpus', action='store_true',
+                        help="generate simulation boards once into shared "
+                             "memory for the workers to read")
+    parser.add_argument('--board', type=parse_board_size,
+                        default=(DEFAULT_RULES.board_width,
+                                 DEFAULT_RULES.board_height),
+                        help="board size as WIDTHxHEIGHT (default: 10x10)")
+    parser.add_argument('--fleet', type=parse_fleet,
+                        default=(DEFAULT_RULES.ship_sizes,
+                                 DEFAULT_RULES.ship_counts),
+                        help="ship sizes and counts as SIZE:COUNT,... "
+                             "(default: 4:1,3:2,2:3,1:4)")
+    parser.add_argument('--ships-may-touch', action='store_true',
+                        help="allow ships to be placed next to each other")
+    args = parser.parse_args()
+
+    args.rules = RuleSet(board_width=args.board[0],
+                         board_height=args.board[1],
+                         ship_sizes=args.fleet[0],
+                         ship_counts=args.fleet[1],
+                         ships_may_touch=args.ships_may_touch)
+    if args.simul is not None and not 1 <= args.simul <= SIMUL_MAX_BOARDS:
+        parser.error(f"--simul must be from 1 to {SIMUL_MAX_BOARDS}")
+    # The window layout is made for the default board size, simul
+    # boards are scaled to fit
+    board_is_default = args.board == (DEFAULT_RULES.board_width,
+                                      DEFAULT_RULES.board_height)
+    if args.simulate is None and args.simul is None and not board_is_default:
+        parser.error("other board sizes can only be simulated or "
+                     "played in a simul")
+    return args
+
+
+def run_simulation(args: argparse.Namespace) -> None:
+    # Only simulations need these, so the game window starts without them
+    from board_corpus import close_board_corpus
+    from simulator import simulate, save_simulation_stats, make_board_corpus
+
+    board_corpus = None
+    if args.corpus:
+        if args.seed is None:
+            args.seed = random.randrange(2 ** 32)
+        board_corpus = make_board_corpus(args.simulate, args.seed,
+                                         args.rules)
+
+    try:
+        save_simulation_stats(simulate(args.simulate, args.workers,
+                                       args.seed, args.ai, board_corpus,
+                                       args.rules, args.log),
+                              args.output)
+    finally:
+        if board_corpus is not None:
+            close_board_corpus(board_corpus, unlink=True)
+
+
+def open_game_window() -> pygame.Surface:
+    display_surface = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
     pygame.display.set_caption(WINDOW_CAPTION)
-    fps_clock = pygame.time.Clock()
+    # Any other event would only wake the loop up for nothing
+    pygame.event.set_blocked(None)
+    pygame.event.set_allowed([QUIT, KEYUP, MOUSEMOTION, MOUSEBUTTONUP,
+                              WINDOWEXPOSED, AI_MOVE_EVENT, HINT_EVENT])
+    return display_surface
 
+
+def load_first_game(ai_mode: str,
+                    rules: RuleSet,
+                    executor: ThreadPoolExecutor
+                    ) -> tuple[dict[str, TextSurfaceType],
+                               dict[str, TextSurfaceType], GameDataType]:
+    """
+    Generates the boards of the first game on the given executor
+    while the font loads and the texts are rendered.
+
+    :param ai_mode: An AI mode from AI_MODES.
+    :param rules: A RuleSet of the game.
+    :param executor: An executor to set the game up on.
+    :return: Board titles, menu buttons and the new game data.
+    """
+    pending_game = executor.submit(set_up_new_game, ai_mode, rules)
     titles = make_board_titles()
+    buttons = make_menu_buttons(hint_button=True)
+    return titles, buttons, pending_game.result()
+
+
+def main_simul(count: int,
+               ai_mode: str = DEFAULT_AI_MODE,
+               rules: RuleSet = DEFAULT_RULES):
+    display_surface = open_game_window()
+    draw_splash_screen(display_surface)
+    fps_clock = pygame.time.Clock()
+
     buttons = make_menu_buttons()
-    game_data = set_up_new_game()
+    metrics_exporter = start_metrics_exporter(
+        os.environ.get(METRICS_FILE_ENV_VAR))
+    simul_data = set_up_simul(count, ai_mode, rules)
+    render_state = make_simul_render_state(display_surface)
+    results_store = start_results_store()
+
+    draw_simul_screen(simul_data, buttons, render_state)
+
+    try:
+        while True:
+            events = wait_for_events(EVENT_WAIT_TIMEOUT)
+            if not events:
+                continue
+
+            # Other window contents may have been drawn over the game
+            if any(event.type == WINDOWEXPOSED for event in events):
+                render_state['full_redraw'] = True
+            simul_data, simul_move = handle_simul_events(simul_data,
+                                                         buttons, events)
+
+            # AI moves take microseconds, so the AI answers at once
+            if simul_move is not None:
+                simul_data = play_simul_move(simul_move, simul_data)
+                game = simul_data['games'][simul_move[0]]
+                if game['winner'] is not None:
+                    record_game_result(results_store,
+                                       make_simul_game_result(game, ai_mode))
+
+            draw_simul_screen(simul_data, buttons, render_state)
+            fps_clock.tick(FPS)
+    finally:
+        # quit_program() exits via SystemExit, so results are saved here
+        stop_results_store(results_store)
+        stop_metrics_exporter(metrics_exporter)
+
+
+def main(ai_mode: str = DEFAULT_AI_MODE, rules: RuleSet = DEFAULT_RULES):
+    display_surface = open_game_window()
+    # The window is filled before anything else is loaded
+    draw_splash_screen(display_surface)
+    fps_clock = pygame.time.Clock()
+
+    # A single worker keeps AI moves in order and off the render thread
+    ai_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ai')
+    # Enabled before the first boards are generated to count their retries
+    metrics_exporter = start_metrics_exporter(
+        os.environ.get(METRICS_FILE_ENV_VAR))
+    titles, buttons, game_data = load_first_game(ai_mode, rules,
+                                                 ai_executor)
+    render_state = make_render_state(display_surface)
+    results_store = start_results_store()
+    # Hints are computed in the background so that no frame waits
+    hint_executor = ThreadPoolExecutor(max_workers=1,
+                                       thread_name_prefix='hint')
+    profiler = make_profiler(os.environ.get(PROFILER_CSV_ENV_VAR))
+
+    draw_game_screen(game_data, titles, buttons, render_state)
+    # None unless NAVALBATTLE_PROFILE_FRAMES is set
+    frame_profile = start_frame_profile()
+
+    try:
+        while True:
+            # Let the AI use the player's think time
+            game_data = ponder_ai_move(game_data, ai_executor)
+
+            ai_move_is_pending = game_data['pending_ai_move'] is not None
+            # Wake up in time to show the "thinking" indicator
+            if ai_move_is_pending:
+                timeout = AI_THINKING_INDICATOR_DELAY
+            else:
+                timeout = EVENT_WAIT_TIMEOUT
+
+            events = wait_for_events(timeout)
+            if not events and not ai_move_is_pending:
+                continue
+
+            # Other window contents may have been drawn over the game
+            if any(event.type == WINDOWEXPOSED for event in events):
+                request_full_redraw(render_state)
+            handle_profiler_events(profiler, render_state, events)
+            game_data, player_move = time_stage(
+                profiler, 'handle_events',
+                handle_events, game_data, buttons, events)
+            game_was_over = game_data['game_is_over']
+
+            game_data = time_stage(profiler, 'make_ai_move',
+                                   receive_ai_move, game_data)
 
-    while True:
-        game_data, player_move = handle_events(game_data, buttons)
+            if player_move and player_can_move(game_data):
+                game_data = time_stage(profiler, 'handle_player_move',
+                                       handle_player_move, player_move,
+                                       game_data)
+                if not game_data['game_is_over']:
+                    game_data = time_stage(profiler, 'make_ai_move',
+                                           submit_ai_move, game_data,
+                                           ai_executor, post_ai_move_event)
 
-        if player_move and not game_data['game_is_over']:
-            game_data = handle_player_move(player_move, game_data)
-            if not game_data['game_is_over']:
-                game_data = make_ai_move(game_data)
+            if game_data['game_is_over'] and not game_was_over:
+                record_game_result(results_store,
+                                   make_game_result(game_data))
 
-        draw_game_screen(game_data, titles, buttons)
-        fps_clock.tick(FPS)
+            game_data = update_hint(game_data, hint_executor,
+                                    post_hint_event)
+            time_stage(profiler, 'draw_game_screen',
+                       draw_game_screen, game_data, titles, buttons,
+                       render_state)
+            finish_frame(profiler)
+            draw_profiler_overlay(profiler, render_state)
+            finish_profiled_frame(frame_profile)
+            fps_clock.tick(FPS)
+    finally:
+        close_profiler(profiler)
+        dump_profile_results(frame_profile)
+        # quit_program() exits via SystemExit, so results are saved here
+        ai_executor.shutdown(wait=False, cancel_futures=True)
+        hint_executor.shutdown(wait=False, cancel_futures=True)
+        stop_results_store(results_store)
+        stop_metrics_exporter(metrics_exporter)
 
 
 if __name__ == '__main__':
-    main()
+    args = parse_args()
+    if args.simulate is not None:
+        run_simulation(args)
+    elif args.simul is not None:
+        main_simul(args.simul, args.ai, args.rules)
+    else:
+        main(args.ai, args.rules)
@@ -1,27 +1,30 @@
 # -*- coding: utf-8 -*-
 import random
+import time
 from typing import Optional
 
+from board_geometry import get_tile_halos
+from metrics import REGISTRY, inc_counter, observe_histogram
 from constants import (
-    AIDataType, GameBoardType, BOARD_HEIGHT_IN_TILES, BOARD_WIDTH_IN_TILES,
-    ATTACK_DIRECTIONS_TEMPLATE, REVERSED_ATTACK_DIRECTIONS,
-    SHIP_COUNTS, SHIP_SIZES)
+    AIDataType, GameBoardType, RuleSet, DEFAULT_RULES, DEFAULT_AI_MODE,
+    ATTACK_DIRECTIONS_TEMPLATE, REVERSED_ATTACK_DIRECTIONS)
 
 
-def set_up_ai() -> AIDataType:
+def set_up_ai(rules: RuleSet = DEFAULT_RULES) -> AIDataType:
     """
     Creates a new AI data.
 
+    :param rules: A RuleSet of the game with the board size and fleet.
     :return: An AI data structure of AIDataType (TypedDict).
     """
     # Each tile is an available move at the beginning
     available_moves = [(board_x, board_y)
-                       for board_x in range(BOARD_HEIGHT_IN_TILES)
-                       for board_y in range(BOARD_WIDTH_IN_TILES)]
+                       for board_x in range(rules.board_width)
+                       for board_y in range(rules.board_height)]
 
     # Create a list of ships placed on the game board
     ships_on_board = []
-    for count, size in zip(SHIP_COUNTS, SHIP_SIZES):
+    for count, size in zip(rules.ship_counts, rules.ship_sizes):
         for _ in range(count):
             ships_on_board.append(size)
 
@@ -65,30 +68,34 @@ def get_move_by_direction(ai_data: AIDataType
 def remove_destroyed_ship(ai_data):
     """
     Removes the destroyed ship from the list of ships on board.
+    If ships may touch, hits at neighbor ships can be taken for one
+    ship of a size that is not on board, then nothing is removed.
 
     :param ai_data: A TypedDict of AI state variables.
     :return: An AI data with updated list of ships on board.
     """
     destroyed_ship_length = len(ai_data['hit_moves'])
-    ai_data['ships_on_board_by_size'].remove(destroyed_ship_length)
+    if destroyed_ship_length in ai_data['ships_on_board_by_size']:
+        ai_data['ships_on_board_by_size'].remove(destroyed_ship_length)
     return ai_data
 
 
-def remove_ship_spacing(ai_data):
+def remove_ship_spacing(ai_data, rules: RuleSet = DEFAULT_RULES):
     """
     Removes the destroyed ship spacing from the list of available moves.
 
     :param ai_data: A TypedDict of AI state variables.
+    :param rules: A RuleSet of the game.
     :return: An AI data with updated available moves list.
     """
-    destroyed_ship = ai_data['hit_moves']
+    tile_halos = get_tile_halos(rules.board_width, rules.board_height)
+    ship_halo = set()
 
-    for tile in destroyed_ship:
-        for x_shift in range(-1, 2):
-            for y_shift in range(-1, 2):
-                adjacent_tile = (tile[0] + x_shift, tile[1] + y_shift)
-                if adjacent_tile in ai_data['available_moves']:
-                    ai_data['available_moves'].remove(adjacent_tile)
+    for board_x, board_y in ai_data['hit_moves']:
+        ship_halo.update(tile_halos[board_x][board_y])
+
+    ai_data['available_moves'] = [move for move in ai_data['available_moves']
+                                  if move not in ship_halo]
     return ai_data
 
 
@@ -105,48 +112,60 @@ def switch_ai_to_search(ai_data: AIDataType) -> AIDataType:
     return ai_data
 
 
-def finish_attack(ai_data: AIDataType) -> AIDataType:
+def finish_attack(ai_data: AIDataType,
+                  rules: RuleSet = DEFAULT_RULES) -> AIDataType:
     """
     Ends the current attack sequence by updating AI data with
     attack results and switching the AI to the search state.
 
     :param ai_data: A TypedDict of AI state variables.
+    :param rules: A RuleSet of the game.
     :return: An AI data in search state with deleted destroyed ship
     and its spacing.
     """
+    inc_counter('navalbattle_ai_attacks_finished_total')
     ai_data = remove_destroyed_ship(ai_data)
-    ai_data = remove_ship_spacing(ai_data)
+    # Tiles next to a ship may hold another one if ships may touch
+    if not rules.ships_may_touch:
+        ai_data = remove_ship_spacing(ai_data, rules)
     ai_data = switch_ai_to_search(ai_data)
     return ai_data
 
 
-def choose_random_direction(available_directions: list[str]) -> str:
+def choose_random_direction(available_directions: list[str],
+                            rng: Optional[random.Random] = None) -> str:
     """
     Returns random direction from the list of available.
 
     :param available_directions: The list of available directions.
+    :param rng: A random generator to use, the global one if None.
     :return: An attack direction ('up', 'down', 'right' or 'left').
     """
-    return random.choice(available_directions)
+    return (rng or random).choice(available_directions)
 
 
-def choose_attack_direction(ai_data: AIDataType
+def choose_attack_direction(ai_data: AIDataType,
+                            rng: Optional[random.Random] = None
                             ) -> tuple[str, AIDataType]:
     """
     Chooses next attack direction randomly from the list of currently
     available to the AI.
 
     :param ai_data: A TypedDict of AI state variables.
+    :param rng: A random generator to use, the global one if None.
     :return: An attack direction ('up', 'down', 'right' or 'left') and
     AI data with updated available directions list.
     """
-    direction = choose_random_direction(ai_data['available_directions'])
+    direction = choose_random_direction(ai_data['available_directions'],
+                                        rng)
     ai_data['available_directions'].remove(direction)
     ai_data['attack_direction'] = direction
     return direction, ai_data
 
 
-def attack_after_first_hit(ai_data: AIDataType
+def attack_after_first_hit(ai_data: AIDataType,
+                           rng: Optional[random.Random] = None,
+                           rules: RuleSet = DEFAULT_RULES
                            ) -> tuple[Optional[tuple[int, int]], AIDataType]:
     """
     Returns next attack move coordinates after the FIRST hit
@@ -160,6 +179,8 @@ def attack_after_first_hit(ai_data: AIDataType
     destroyed and finish the attack.
 
     :param ai_data: A TypedDict of AI state variables.
+    :param rng: A random generator to use, the global one if None.
+    :param rules: A RuleSet of the game.
     :return: Next shot coordinates in (x,y) format and AI data with
     updated attack direction.
     """
@@ -168,10 +189,10 @@ def attack_after_first_hit(ai_data: AIDataType
 
         if all_directions_probed:
             move_coords = None
-            ai_data = finish_attack(ai_data)
+            ai_data = finish_attack(ai_data, rules)
             break
         else:
-            direction, ai_data = choose_attack_direction(ai_data)
+            direction, ai_data = choose_attack_direction(ai_data, rng)
             move_coords = get_move_by_direction(ai_data)
 
             if move_coords in ai_data['available_moves']:
@@ -210,7 +231,8 @@ def get_reversed_move(ai_data: AIDataType
     return move_coords, ai_data
 
 
-def attack_after_second_hit(ai_data: AIDataType
+def attack_after_second_hit(ai_data: AIDataType,
+                            rules: RuleSet = DEFAULT_RULES
                             ) -> tuple[Optional[tuple[int, int]], AIDataType]:
     """
     Returns next attack move coordinates after the SECOND hit
@@ -224,6 +246,7 @@ def attack_after_second_hit(ai_data: AIDataType
     the attack.
 
     :param ai_data: A TypedDict of AI state variables.
+    :param rules: A RuleSet of the game.
     :return: Next shot coordinates in (x,y) format and AI data with
     updated attack direction.
     """
@@ -235,12 +258,14 @@ def attack_after_second_hit(ai_data: AIDataType
 
         if move_coords not in available_moves:
             move_coords = None
-            ai_data = finish_attack(ai_data)
+            ai_data = finish_attack(ai_data, rules)
 
     return move_coords, ai_data
 
 
-def attack_ship(ai_data: AIDataType
+def attack_ship(ai_data: AIDataType,
+                rng: Optional[random.Random] = None,
+                rules: RuleSet = DEFAULT_RULES
                 ) -> tuple[Optional[tuple[int, int]], AIDataType]:
     """
     Executes an attacking action based on the following logic
@@ -254,50 +279,89 @@ def attack_ship(ai_data: AIDataType
     If no attacking move available, the AI returns to the search state.
 
     :param ai_data: A TypedDict of AI state variables.
+    :param rng: A random generator to use, the global one if None.
+    :param rules: A RuleSet of the game.
     :return: Next shot coordinates in (x,y) format and updated AI data.
     """
-    current_biggest_ship = max(ai_data['ships_on_board_by_size'])
+    # The list runs out early if touching ships were taken for one
+    current_biggest_ship = max(ai_data['ships_on_board_by_size'],
+                               default=0)
     hitted_ship_length = len(ai_data['hit_moves'])
 
     if hitted_ship_length < current_biggest_ship:
         first_time_hit = len(ai_data['hit_moves']) == 1
 
         if first_time_hit:
-            move_coords, ai_data = attack_after_first_hit(ai_data)
+            move_coords, ai_data = attack_after_first_hit(ai_data, rng,
+                                                          rules)
         else:
-            move_coords, ai_data = attack_after_second_hit(ai_data)
+            move_coords, ai_data = attack_after_second_hit(ai_data, rules)
     else:
         move_coords = None
-        ai_data = finish_attack(ai_data)
+        ai_data = finish_attack(ai_data, rules)
     return move_coords, ai_data
 
 
-def make_random_move(available_moves: list[tuple[int, int]]
+def make_random_move(available_moves: list[tuple[int, int]],
+                     rng: Optional[random.Random] = None
                      ) -> tuple[int, int]:
     """
     Returns random move from the list of available.
 
     :param available_moves: List of available moves coordinates
     in (x, y) format.
+    :param rng: A random generator to use, the global one if None.
+    :return: A tuple of move coordinates in (x, y) format.
+    """
+    return (rng or random).choice(available_moves)
+
+
+def choose_search_move(ai_data: AIDataType,
+                       ai_mode: str = DEFAULT_AI_MODE,
+                       rng: Optional[random.Random] = None
+                       ) -> tuple[int, int]:
+    """
+    Chooses a move to search for a new target the way the given AI
+    mode does.
+
+    :param ai_data: A TypedDict of AI state variables.
+    :param ai_mode: An AI mode from AI_MODES.
+    :param rng: A random generator to use, the global one if None.
     :return: A tuple of move coordinates in (x, y) format.
     """
-    return random.choice(available_moves)
+    if ai_mode == 'classic':
+        move_coords = make_random_move(ai_data['available_moves'], rng)
+    else:
+        raise ValueError(f"Unknown AI mode '{ai_mode}'. "
+                         f"AI mode must be 'classic'.")
+    return move_coords
 
 
-def choose_next_move(ai_data: AIDataType
+def choose_next_move(ai_data: AIDataType,
+                     ai_mode: str = DEFAULT_AI_MODE,
+                     rng: Optional[random.Random] = None,
+                     rules: RuleSet = DEFAULT_RULES
                      ) -> tuple[tuple[int, int], AIDataType]:
     """
     Launches move choosing scenario based on the current AI state.
 
     :param ai_data: A TypedDict of AI state variables.
+    :param ai_mode: An AI mode from AI_MODES.
+    :param rng: A random generator to use, the global one if None.
+    :param rules: A RuleSet of the game.
     :return: Next shot coordinates in (x,y) format and updated AI data.
     """
+    # Moves are timed only for the metrics exporter, the flag is read
+    # once in case the exporter starts during the move
+    metrics_enabled = REGISTRY['enabled']
+    if metrics_enabled:
+        start_time = time.perf_counter()
     move_coords = None
 
     if ai_data['state'] == 'attack':
-        move_coords, ai_data = attack_ship(ai_data)
+        move_coords, ai_data = attack_ship(ai_data, rng, rules)
     if ai_data['state'] == 'search':
-        move_coords = make_random_move(ai_data['available_moves'])
+        move_coords = choose_search_move(ai_data, ai_mode, rng)
     else:
         # If AI could not find a target during the attack
         # and did not switch to search
@@ -305,6 +369,10 @@ def choose_next_move(ai_data: AIDataType
             raise RuntimeError("AI target choosing error. "
                                "The AI can not find an attacking move and "
                                "did not switched to search.")
+    if metrics_enabled:
+        observe_histogram('navalbattle_ai_move_seconds',
+                          time.perf_counter() - start_time,
+                          (('ai_mode', ai_mode),))
     return move_coords, ai_data
 
 
@@ -356,19 +424,42 @@ def handle_hit(move_coords: tuple[int, int],
     return ai_data
 
 
+def record_shot_result(move_coords: tuple[int, int],
+                       is_hit: bool,
+                       ai_data: AIDataType) -> AIDataType:
+    """
+    Updates the AI knowledge with the result of its shot.
+
+    :param move_coords: Coordinates of the shot in (x,y) format.
+    :param is_hit: True if the shot hit an enemy ship.
+    :param ai_data: A TypedDict of AI state variables.
+    :return: An AI data updated with the shot result.
+    """
+    ai_data = update_move_list(move_coords, ai_data)
+
+    if is_hit:
+        ai_data = handle_hit(move_coords, ai_data)
+    return ai_data
+
+
 def get_ai_move(ai_data: AIDataType,
-                board: GameBoardType
+                board: GameBoardType,
+                ai_mode: str = DEFAULT_AI_MODE,
+                rng: Optional[random.Random] = None,
+                rules: RuleSet = DEFAULT_RULES
                 ) -> tuple[tuple[int, int], AIDataType]:
     """
     Returns next AI move coordinates.
 
     :param ai_data: A TypedDict of AI state variables.
     :param board: The game board where to search move.
+    :param ai_mode: An AI mode from AI_MODES.
+    :param rng: A random generator to use, the global one if None.
+    :param rules: A RuleSet of the game.
     :return: Next shot coordinates in (x,y) format and updated AI data.
     """
-    move_coords, ai_data = choose_next_move(ai_data)
-    ai_data = update_move_list(move_coords, ai_data)
-
-    if ship_was_hitted(move_coords, board):
-        ai_data = handle_hit(move_coords, ai_data)
+    move_coords, ai_data = choose_next_move(ai_data, ai_mode, rng, rules)
+    ai_data = record_shot_result(move_coords,
+                                 ship_was_hitted(move_coords, board),
+                                 ai_data)
     return move_coords, ai_data
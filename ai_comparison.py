@@ -0,0 +1,324 @@
+# -*- coding: utf-8 -*-
+import argparse
+import json
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from statistics import NormalDist
+from typing import Any, Optional, TypedDict
+
+from constants import (
+    RuleSet, AI_MODES, DEFAULT_RULES, SIMULATION_CHUNK_SIZE,
+    COMPARISON_DELTA, COMPARISON_ALPHA, COMPARISON_BETA, COMPARISON_MIN_GAMES,
+    COMPARISON_MAX_GAMES)
+from board_corpus import BoardCorpusType
+from simulator import play_simulated_game, get_game_board, get_pool_options
+
+
+SequentialTestType = TypedDict('SequentialTestType',
+                               {'delta': float,
+                                'accept_bound': float,
+                                'reject_bound': float,
+                                'games': int,
+                                'shot_sums': list[int],
+                                'mean': float,
+                                'sum_of_squares': float})
+
+
+def play_paired_games(seed: int,
+                      game_numbers: range,
+                      ai_modes: tuple[str, str],
+                      rules: RuleSet = DEFAULT_RULES
+                      ) -> list[tuple[int, int]]:
+    """
+    Lets both AI modes sink the same fleets. A game number gives
+    the same board, and the same AI random stream, to both modes.
+
+    :param seed: A seed of the whole comparison.
+    :param game_numbers: Numbers of the games to play.
+    :param ai_modes: The two AI modes to compare.
+    :param rules: A RuleSet of the comparison.
+    :return: A list of (first mode shots, second mode shots) pairs
+    in game order.
+    """
+    game_pairs = []
+
+    for game_number in game_numbers:
+        board = get_game_board(seed, game_number, rules)
+        first_shots, second_shots = (
+            play_simulated_game(seed, game_number, ai_mode, board, rules)[0]
+            for ai_mode in ai_modes)
+        game_pairs.append((first_shots, second_shots))
+    return game_pairs
+
+
+def make_sequential_test(delta: float = COMPARISON_DELTA,
+                         alpha: float = COMPARISON_ALPHA,
+                         beta: float = COMPARISON_BETA
+                         ) -> SequentialTestType:
+    """
+    Creates a two-sided sequential probability ratio test of the mean
+    paired shot difference: zero against plus or minus delta.
+
+    :param delta: The smallest difference in mean shots worth finding.
+    :param alpha: The chance to find a difference that does not exist.
+    :param beta: The chance to miss a difference of delta.
+    :return: A sequential test of SequentialTestType(TypedDict).
+    """
+    # Each side of the test gets half of the false positive rate
+    sequential_test: SequentialTestType
+    sequential_test = {'delta': delta,
+                       'accept_bound': math.log((1 - beta) / (alpha / 2)),
+                       'reject_bound': math.log(beta / (1 - alpha / 2)),
+                       'games': 0,
+                       'shot_sums': [0, 0],
+                       'mean': 0.0,
+                       'sum_of_squares': 0.0}
+    return sequential_test
+
+
+def add_game_pair(shots: tuple[int, int],
+                  sequential_test: SequentialTestType) -> None:
+    """
+    Adds the shot difference of a game pair to the running mean and
+    variance (Welford's method).
+
+    :param shots: Shots of the first and the second mode on one board.
+    :param sequential_test: A sequential test of SequentialTestType.
+    :return: None.
+    """
+    difference = shots[0] - shots[1]
+    sequential_test['games'] += 1
+    sequential_test['shot_sums'][0] += shots[0]
+    sequential_test['shot_sums'][1] += shots[1]
+
+    shift = difference - sequential_test['mean']
+    sequential_test['mean'] += shift / sequential_test['games']
+    sequential_test['sum_of_squares'] += (
+        shift * (difference - sequential_test['mean']))
+
+
+def get_difference_variance(sequential_test: SequentialTestType) -> float:
+    """
+    Returns the sample variance of the paired shot differences.
+
+    :param sequential_test: A sequential test of SequentialTestType.
+    :return: The variance, never below a small floor so that equal
+    results do not divide by zero.
+    """
+    games = sequential_test['games']
+    if games < 2:
+        return math.inf
+    return max(sequential_test['sum_of_squares'] / (games - 1), 1e-6)
+
+
+def get_log_likelihood_ratios(sequential_test: SequentialTestType
+                              ) -> tuple[float, float]:
+    """
+    Returns log-likelihood ratios of a mean difference of -delta
+    (the first mode is stronger) and of +delta (the second mode is
+    stronger) against no difference, treating differences as normal
+    with the current sample variance.
+
+    :param sequential_test: A sequential test of SequentialTestType.
+    :return: A tuple of (first stronger, second stronger) ratios.
+    """
+    delta = sequential_test['delta']
+    games = sequential_test['games']
+    difference_sum = sequential_test['mean'] * games
+    scale = delta / get_difference_variance(sequential_test)
+
+    first_stronger = scale * (-difference_sum - games * delta / 2)
+    second_stronger = scale * (difference_sum - games * delta / 2)
+    return first_stronger, second_stronger
+
+
+def get_decision(sequential_test: SequentialTestType) -> Optional[str]:
+    """
+    Checks if the test can stop.
+
+    :param sequential_test: A sequential test of SequentialTestType.
+    :return: 'first_stronger', 'second_stronger' or 'no_difference'
+    if the test is decided, else None.
+    """
+    if sequential_test['games'] < COMPARISON_MIN_GAMES:
+        return None
+
+    first_stronger, second_stronger = get_log_likelihood_ratios(
+        sequential_test)
+
+    if first_stronger >= sequential_test['accept_bound']:
+        return 'first_stronger'
+    elif second_stronger >= sequential_test['accept_bound']:
+        return 'second_stronger'
+    elif max(first_stronger, second_stronger) <= (
+            sequential_test['reject_bound']):
+        return 'no_difference'
+    return None
+
+
+def get_confidence_interval(mean: float,
+                            variance: float,
+                            games: int,
+                            confidence: float) -> tuple[float, float]:
+    """
+    Returns a normal confidence interval of a mean.
+
+    :param mean: The sample mean.
+    :param variance: The sample variance.
+    :param games: The sample size.
+    :param confidence: The confidence level, 0.95 is 95%.
+    :return: A (low, high) tuple.
+    """
+    margin = (NormalDist().inv_cdf((1 + confidence) / 2)
+              * math.sqrt(variance / games))
+    return mean - margin, mean + margin
+
+
+def get_fixed_sample_size(variance: float,
+                          delta: float = COMPARISON_DELTA,
+                          alpha: float = COMPARISON_ALPHA,
+                          beta: float = COMPARISON_BETA) -> int:
+    """
+    Returns how many game pairs a fixed-size test with the same error
+    rates would need.
+
+    :param variance: The variance of paired shot differences.
+    :param delta: The smallest difference in mean shots worth finding.
+    :param alpha: The chance to find a difference that does not exist.
+    :param beta: The chance to miss a difference of delta.
+    :return: The number of game pairs.
+    """
+    z_scores = (NormalDist().inv_cdf(1 - alpha / 2)
+                + NormalDist().inv_cdf(1 - beta))
+    return math.ceil(variance * (z_scores / delta) ** 2)
+
+
+def make_comparison_report(ai_modes: tuple[str, str],
+                           sequential_test: SequentialTestType,
+                           decision: Optional[str],
+                           alpha: float,
+                           beta: float) -> dict[str, Any]:
+    """
+    Summarizes a finished comparison.
+
+    :param ai_modes: The two compared AI modes.
+    :param sequential_test: A sequential test of SequentialTestType.
+    :param decision: The test decision, None if games ran out.
+    :param alpha: The chance to find a difference that does not exist.
+    :param beta: The chance to miss a difference.
+    :return: A dictionary of comparison results ready for JSON.
+    """
+    games = sequential_test['games']
+    variance = get_difference_variance(sequential_test)
+    confidence = 1 - alpha
+    low, high = get_confidence_interval(sequential_test['mean'], variance,
+                                        games, confidence)
+
+    return {'ai_modes': list(ai_modes),
+            'decision': decision or 'undecided',
+            'games': games,
+            'fixed_sample_games': get_fixed_sample_size(
+                variance, sequential_test['delta'], alpha, beta),
+            'mean_shots': {ai_mode: round(shot_sum / games, 3)
+                           for ai_mode, shot_sum in zip(
+                               ai_modes, sequential_test['shot_sums'])},
+            'mean_difference': round(sequential_test['mean'], 3),
+            'confidence': confidence,
+            'difference_interval': [round(low, 3), round(high, 3)],
+            'difference_stdev': round(math.sqrt(variance), 3)}
+
+
+def compare_ai_modes(ai_modes: tuple[str, str],
+                     delta: float = COMPARISON_DELTA,
+                     alpha: float = COMPARISON_ALPHA,
+                     beta: float = COMPARISON_BETA,
+                     max_games: int = COMPARISON_MAX_GAMES,
+                     workers: Optional[int] = None,
+                     seed: Optional[int] = None,
+                     board_corpus: Optional[BoardCorpusType] = None,
+                     rules: RuleSet = DEFAULT_RULES) -> dict[str, Any]:
+    """
+    Plays both AI modes on the same fleets until a sequential test
+    decides if their mean shots to win differ by delta or more.
+
+    Games are played in rounds of one chunk per worker, and checked
+    in game order, so the decision for a seed does not depend on
+    the number of workers.
+
+    :param ai_modes: The two AI modes to compare.
+    :param delta: The smallest difference in mean shots worth finding.
+    :param alpha: The chance to find a difference that does not exist.
+    :param beta: The chance to miss a difference of delta.
+    :param max_games: Game pairs to play at most if undecided.
+    :param workers: The number of worker processes, one per CPU if None.
+    :param seed: A seed of the comparison, a random one if None.
+    :param board_corpus: Pregenerated boards of BoardCorpusType
+    the workers share instead of generating boards, if any.
+    :param rules: A RuleSet of the comparison.
+    :return: A dictionary of comparison results.
+    """
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    workers = workers or os.cpu_count() or 1
+    sequential_test = make_sequential_test(delta, alpha, beta)
+    decision = None
+    next_game = 0
+    start_time = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers,
+                             **get_pool_options(board_corpus)) as executor:
+        while decision is None and next_game < max_games:
+            round_end = min(next_game + workers * SIMULATION_CHUNK_SIZE,
+                            max_games)
+            chunks = [range(first_game,
+                            min(first_game + SIMULATION_CHUNK_SIZE,
+                                round_end))
+                      for first_game in range(next_game, round_end,
+                                              SIMULATION_CHUNK_SIZE)]
+            next_game = round_end
+
+            for chunk_shots in executor.map(play_paired_games, repeat(seed),
+                                            chunks, repeat(ai_modes),
+                                            repeat(rules)):
+                for shots in chunk_shots:
+                    if decision is None:
+                        add_game_pair(shots, sequential_test)
+                        decision = get_decision(sequential_test)
+    elapsed_time = time.perf_counter() - start_time
+
+    return {'seed': seed,
+            'delta': delta,
+            'elapsed': round(elapsed_time, 3),
+            **make_comparison_report(ai_modes, sequential_test, decision,
+                                     alpha, beta)}
+
+
+def main() -> None:
+    """Compares two AI modes and prints the results as JSON."""
+    parser = argparse.ArgumentParser(
+        description="Compare two AI modes on the same random fleets.")
+    parser.add_argument('first_mode', choices=AI_MODES)
+    parser.add_argument('second_mode', choices=AI_MODES)
+    parser.add_argument('--delta', type=float, default=COMPARISON_DELTA,
+                        help="smallest mean shot difference worth finding "
+                             "(default: %(default)s)")
+    parser.add_argument('--alpha', type=float, default=COMPARISON_ALPHA)
+    parser.add_argument('--beta', type=float, default=COMPARISON_BETA)
+    parser.add_argument('--max-games', type=int,
+                        default=COMPARISON_MAX_GAMES)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    report = compare_ai_modes((args.first_mode, args.second_mode),
+                              args.delta, args.alpha, args.beta,
+                              args.max_games, args.workers, args.seed)
+    print(json.dumps(report, indent=4))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,351 @@
+# -*- coding: utf-8 -*-
+import argparse
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import reduce
+from itertools import repeat
+from typing import Any, Iterable, Iterator, Optional, TypedDict, Union
+
+import numpy as np
+
+from constants import RuleSet, ANALYTICS_CHUNK_SIZE, ANALYTICS_RANGE_SIZE
+
+
+LogAggregateType = TypedDict('LogAggregateType',
+                             {'ai_mode': str,
+                              'board_width': int,
+                              'board_height': int,
+                              'games': int,
+                              'shot_counts': np.ndarray,
+                              'first_hits': np.ndarray,
+                              'exhausted_probes': int,
+                              'games_with_exhausted_probes': int})
+
+# Aggregates by 'ai_mode:WIDTHxHEIGHT' key
+LogAggregatesType = dict[str, LogAggregateType]
+
+
+def get_shot_dtype(board_width: int, board_height: int) -> str:
+    """
+    Returns the NumPy type of logged shots on boards of the given size.
+    A shot is logged as its tile number, x * height + y.
+
+    :param board_width: The board width in tiles.
+    :param board_height: The board height in tiles.
+    :return: A NumPy type name, one byte per shot if it fits.
+    """
+    if board_width * board_height <= 256:
+        return 'u1'
+    return '<u2'
+
+
+def make_game_log_line(game_number: int,
+                       ai_mode: str,
+                       rules: RuleSet,
+                       moves: list[tuple[int, int]],
+                       hits: list[bool],
+                       exhausted_probes: int) -> str:
+    """
+    Encodes a played game as a JSON line of the game log. Shots are
+    hex encoded tile numbers and hits are hex encoded packed bits,
+    so that many games decode into arrays at once.
+
+    :param game_number: A number of the game in the simulation.
+    :param ai_mode: An AI mode from AI_MODES.
+    :param rules: A RuleSet of the game.
+    :param moves: Shot coordinates in (x, y) format in shot order.
+    :param hits: True for every shot that hit a ship.
+    :param exhausted_probes: How many times the AI probed all four
+    directions after a first hit without finding the rest of a ship.
+    :return: A log line without the line end.
+    """
+    tiles = np.array([board_x * rules.board_height + board_y
+                      for board_x, board_y in moves],
+                     get_shot_dtype(rules.board_width, rules.board_height))
+    return json.dumps({'game': game_number,
+                       'ai_mode': ai_mode,
+                       'board_width': rules.board_width,
+                       'board_height': rules.board_height,
+                       'shots': tiles.tobytes().hex(),
+                       'hits': np.packbits(hits).tobytes().hex(),
+                       'exhausted_probes': exhausted_probes})
+
+
+def make_log_aggregate(ai_mode: str,
+                       board_width: int,
+                       board_height: int) -> LogAggregateType:
+    """
+    Creates an empty aggregate of games of one AI mode and board size.
+
+    :param ai_mode: An AI mode from AI_MODES.
+    :param board_width: The board width in tiles.
+    :param board_height: The board height in tiles.
+    :return: A TypedDict of game counters.
+    """
+    tile_count = board_width * board_height
+    return {'ai_mode': ai_mode,
+            'board_width': board_width,
+            'board_height': board_height,
+            'games': 0,
+            'shot_counts': np.zeros(tile_count + 1, np.int64),
+            'first_hits': np.zeros(tile_count, np.int64),
+            'exhausted_probes': 0,
+            'games_with_exhausted_probes': 0}
+
+
+def decode_log_records(records: list[dict[str, Any]],
+                       board_width: int,
+                       board_height: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Decodes shots of logged games on boards of the same size at once.
+
+    :param records: Decoded log lines.
+    :param board_width: The board width in tiles.
+    :param board_height: The board height in tiles.
+    :return: An array of shot counts of every game and an array
+    of first hit tile numbers of the games with a hit.
+    """
+    dtype = np.dtype(get_shot_dtype(board_width, board_height))
+    shots = np.frombuffer(bytes.fromhex(''.join(record['shots']
+                                                for record in records)),
+                          dtype)
+    hit_bytes = np.frombuffer(bytes.fromhex(''.join(record['hits']
+                                                    for record in records)),
+                              np.uint8)
+    shot_counts = np.fromiter((len(record['shots']) for record in records),
+                              np.int64, len(records)) // (2 * dtype.itemsize)
+    hit_bit_counts = np.fromiter((len(record['hits']) for record in records),
+                                 np.int64, len(records)) * 4
+
+    # Games take whole bytes of hit bits, padded with zeros
+    hit_positions = np.flatnonzero(np.unpackbits(hit_bytes))
+    bit_offsets = np.cumsum(hit_bit_counts) - hit_bit_counts
+    hit_games = np.searchsorted(bit_offsets, hit_positions, side='right') - 1
+    games_with_hits, first_hit_indexes = np.unique(hit_games,
+                                                   return_index=True)
+    first_hit_shots = (hit_positions[first_hit_indexes]
+                       - bit_offsets[games_with_hits])
+    shot_offsets = np.cumsum(shot_counts) - shot_counts
+    first_hits = shots[shot_offsets[games_with_hits] + first_hit_shots]
+    return shot_counts, first_hits
+
+
+def fold_log_lines(lines: Iterable[Union[str, bytes]],
+                   aggregates: LogAggregatesType) -> LogAggregatesType:
+    """
+    Adds logged games to the aggregates of their AI mode and board size.
+
+    :param lines: Lines of a game log.
+    :param aggregates: Aggregates to update.
+    :return: The updated aggregates.
+    """
+    groups: dict[tuple[str, int, int], list[dict[str, Any]]] = {}
+
+    for line in lines:
+        record = json.loads(line)
+        group_key = (record['ai_mode'], record['board_width'],
+                     record['board_height'])
+        groups.setdefault(group_key, []).append(record)
+
+    for (ai_mode, board_width, board_height), records in groups.items():
+        aggregate = aggregates.setdefault(
+            f'{ai_mode}:{board_width}x{board_height}',
+            make_log_aggregate(ai_mode, board_width, board_height))
+        shot_counts, first_hits = decode_log_records(records, board_width,
+                                                     board_height)
+        exhausted_probes = np.fromiter(
+            (record['exhausted_probes'] for record in records), np.int64,
+            len(records))
+
+        aggregate['games'] += len(records)
+        aggregate['shot_counts'] += np.bincount(
+            shot_counts, minlength=len(aggregate['shot_counts']))
+        aggregate['first_hits'] += np.bincount(
+            first_hits, minlength=len(aggregate['first_hits']))
+        aggregate['exhausted_probes'] += int(exhausted_probes.sum())
+        aggregate['games_with_exhausted_probes'] += int(
+            np.count_nonzero(exhausted_probes))
+    return aggregates
+
+
+def merge_aggregates(first: LogAggregatesType,
+                     second: LogAggregatesType) -> LogAggregatesType:
+    """
+    Combines aggregates of two parts of the logs.
+
+    :param first: Aggregates to add to, updated in place.
+    :param second: Aggregates to add.
+    :return: The combined aggregates.
+    """
+    for key, aggregate in second.items():
+        if key not in first:
+            first[key] = aggregate
+            continue
+        for counter in ('games', 'shot_counts', 'first_hits',
+                        'exhausted_probes', 'games_with_exhausted_probes'):
+            first[key][counter] += aggregate[counter]
+    return first
+
+
+def get_log_ranges(paths: list[str],
+                   range_size: int = ANALYTICS_RANGE_SIZE
+                   ) -> list[tuple[str, int, int]]:
+    """
+    Splits game logs into byte ranges of about the same size,
+    so that a single large log is also read by several workers.
+
+    :param paths: Paths of game log files.
+    :param range_size: Bytes of a range.
+    :return: A list of (path, start, end) byte ranges.
+    """
+    log_ranges = []
+
+    for path in paths:
+        file_size = os.path.getsize(path)
+        range_count = max(1, math.ceil(file_size / range_size))
+        bounds = [file_size * part // range_count
+                  for part in range(range_count + 1)]
+        log_ranges += [(path, start, end)
+                       for start, end in zip(bounds, bounds[1:])]
+    return log_ranges
+
+
+def read_log_chunks(path: str,
+                    start: int,
+                    end: int,
+                    chunk_size: int = ANALYTICS_CHUNK_SIZE
+                    ) -> Iterator[list[bytes]]:
+    """
+    Reads lines of a game log byte range in chunks. A line belongs
+    to the range where it starts.
+
+    :param path: A game log path.
+    :param start: The first byte of the range.
+    :param end: The byte after the range.
+    :param chunk_size: The most lines of a chunk.
+    :return: A generator of lists of lines.
+    """
+    with open(path, 'rb') as log_file:
+        if start > 0:
+            # Skip the line that started in the previous range
+            log_file.seek(start - 1)
+            log_file.readline()
+        chunk = []
+
+        while log_file.tell() < end:
+            line = log_file.readline()
+            if not line:
+                break
+            chunk.append(line)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def fold_log_range(path: str,
+                   start: int,
+                   end: int,
+                   chunk_size: int = ANALYTICS_CHUNK_SIZE
+                   ) -> LogAggregatesType:
+    """
+    Aggregates the games of a game log byte range chunk by chunk.
+
+    :param path: A game log path.
+    :param start: The first byte of the range.
+    :param end: The byte after the range.
+    :param chunk_size: Lines decoded at once.
+    :return: Aggregates of the range.
+    """
+    aggregates: LogAggregatesType = {}
+
+    for chunk in read_log_chunks(path, start, end, chunk_size):
+        aggregates = fold_log_lines(chunk, aggregates)
+    return aggregates
+
+
+def analyze_logs(paths: list[str],
+                 workers: Optional[int] = None,
+                 chunk_size: int = ANALYTICS_CHUNK_SIZE
+                 ) -> LogAggregatesType:
+    """
+    Aggregates game logs on a pool of processes. Memory use depends on
+    the chunk size and the board sizes only, not on the log size.
+
+    :param paths: Paths of game log files.
+    :param workers: The number of worker processes, one per CPU if None.
+    :param chunk_size: Lines a worker decodes at once.
+    :return: Aggregates of all the logs.
+    """
+    log_ranges = get_log_ranges(paths)
+    workers = workers or os.cpu_count() or 1
+
+    range_paths, starts, ends = zip(*log_ranges)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return reduce(merge_aggregates,
+                      executor.map(fold_log_range, range_paths, starts, ends,
+                                   repeat(chunk_size)),
+                      {})
+
+
+def make_analytics_report(aggregates: LogAggregatesType) -> dict[str, Any]:
+    """
+    Summarizes aggregates of game logs.
+
+    :param aggregates: Aggregates by 'ai_mode:WIDTHxHEIGHT' key.
+    :return: A dictionary of statistics by key ready for JSON.
+    """
+    report = {}
+
+    for key, aggregate in sorted(aggregates.items()):
+        games = aggregate['games']
+        shot_counts = aggregate['shot_counts']
+        # Tile numbers are x * height + y, so rows of the map are by x
+        first_hits = aggregate['first_hits'].reshape(
+            aggregate['board_width'], aggregate['board_height'])
+        report[key] = {
+            'games': games,
+            'shots': {
+                'mean': round(float(np.arange(len(shot_counts))
+                                    @ shot_counts) / games, 3),
+                'distribution': {int(shots): int(count)
+                                 for shots, count in enumerate(shot_counts)
+                                 if count}},
+            'first_hit_heatmap': first_hits.T.tolist(),
+            'exhausted_probes': {
+                'total': aggregate['exhausted_probes'],
+                'per_game': round(aggregate['exhausted_probes'] / games, 4),
+                'games_share': round(
+                    aggregate['games_with_exhausted_probes'] / games, 4)}}
+    return report
+
+
+def main() -> None:
+    """Aggregates game logs and prints the results as JSON."""
+    parser = argparse.ArgumentParser(
+        description="Aggregate game logs written by simulations.")
+    parser.add_argument('logs', nargs='+', help="game log files")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunk-size', type=int,
+                        default=ANALYTICS_CHUNK_SIZE,
+                        help="lines decoded at once (default: %(default)s)")
+    parser.add_argument('--output', default=None,
+                        help="file to write analytics JSON to")
+    args = parser.parse_args()
+
+    report = make_analytics_report(analyze_logs(args.logs, args.workers,
+                                                args.chunk_size))
+    if args.output is None:
+        print(json.dumps(report, indent=4))
+    else:
+        with open(args.output, 'w') as report_file:
+            json.dump(report, report_file, indent=4)
+            report_file.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,500 @@
+# -*- coding: utf-8 -*-
+"""
+Performance benchmarks of the board generator, the AI, the game engine,
+the renderer and the game window startup.
+
+Run from the repository root:
+    python -m benchmarks.benchmark                  # compare to HEAD
+    python -m benchmarks.benchmark --reference main # compare to a branch
+    python -m benchmarks.benchmark --save-baseline  # record this machine
+
+The working tree and the reference revision are measured in the same
+session, in turns, by two worker processes running the same benchmark
+code. Shared machines slow down by tens of percent for minutes at a
+time, so rates are only compared sample by sample, never against
+numbers measured in another run. The stored baselines are medians
+recorded on one machine, kept to see where the numbers stand.
+"""
+import argparse
+import compileall
+import json
+import math
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from functools import partial
+from typing import Callable
+
+# The renderer benchmark must run without a real display, and workers
+# answer on stdout, which must not get the pygame banner
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import pygame  # noqa: E402
+
+from ai import set_up_ai, get_ai_move  # noqa: E402
+from board_generator import get_random_board  # noqa: E402
+from constants import (  # noqa: E402
+    RuleSet, PLAYER_BOARD_TOPLEFT, WINDOW_WIDTH, WINDOW_HEIGHT, DEFAULT_RULES)
+from game_engine import (  # noqa: E402
+    set_up_new_game, handle_player_move, make_ai_move,
+    update_highlighted_tile)
+from graphics import (  # noqa: E402
+    make_board_titles, make_menu_buttons, make_render_state,
+    draw_game_screen, request_full_redraw)
+from simul import (  # noqa: E402
+    set_up_simul, make_simul_render_state, draw_simul_screen)
+from benchmarks.startup_probe import SPLASH_MARKER, READY_MARKER  # noqa: E402
+
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), 'baselines.json')
+# Allowed slowdown of the median sample ratio to the reference. Runs
+# of a tree against itself stayed within 7% on a noisy single-CPU box.
+DEFAULT_THRESHOLD = 0.1
+DEFAULT_REFERENCE = 'HEAD'
+# A slowdown must also exceed this many standard errors of its median
+NOISE_FACTOR = 3
+MIN_RUN_TIME = 0.1  # seconds each sample runs for at least
+ROUNDS = 25  # samples of each benchmark in each tree
+SEED = 2023
+SIMUL_BOARDS = 16  # games drawn by the simul benchmarks
+REPOSITORY_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Board generator and AI benchmarks also run with these rules
+LARGE_BOARD_RULES = {'16x16': RuleSet(board_width=16,
+                                      board_height=16,
+                                      ship_sizes=(5, 4, 3, 2, 1),
+                                      ship_counts=(1, 2, 3, 4, 5),
+                                      ships_may_touch=False)}
+
+
+def bench_board_generation(rules: RuleSet = DEFAULT_RULES) -> int:
+    """Generates one random board. Returns 1 board."""
+    get_random_board(PLAYER_BOARD_TOPLEFT, rules=rules)
+    return 1
+
+
+def bench_ai_moves(rules: RuleSet = DEFAULT_RULES) -> int:
+    """Lets the AI sink a random fleet. Returns the number of moves."""
+    board = get_random_board(PLAYER_BOARD_TOPLEFT, rules=rules)
+    ai_data = set_up_ai(rules)
+    targets = set(board['targets'])
+    moves = 0
+
+    while targets:
+        move, ai_data = get_ai_move(ai_data, board, rules=rules)
+        targets.discard(move)
+        moves += 1
+    return moves
+
+
+def bench_engine_games() -> int:
+    """Plays a full game of random player shots against the AI
+    through the game engine. Returns 1 game."""
+    game_data = set_up_new_game()
+    player_moves = [(board_x, board_y)
+                    for board_x, column in enumerate(
+                        game_data['enemy_board']['tiles'])
+                    for board_y in range(len(column))]
+    random.shuffle(player_moves)
+
+    for player_move in player_moves:
+        game_data = handle_player_move(player_move, game_data)
+        if game_data['game_is_over']:
+            break
+        game_data = make_ai_move(game_data)
+        if game_data['game_is_over']:
+            break
+    return 1
+
+
+def make_render_benchmarks() -> dict[str, Callable[[], int]]:
+    """
+    Opens a dummy display and prepares a game to draw.
+
+    :return: A dictionary of render benchmark functions by name.
+    """
+    display_surface = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+    titles = make_board_titles()
+    buttons = make_menu_buttons()
+    render_state = make_render_state(display_surface)
+    game_data = set_up_new_game()
+    hover_tiles = [(board_x, board_y)
+                   for board_x in range(len(game_data['enemy_board']['tiles']))
+                   for board_y in (0, 1)]
+    hover_index = [0]
+
+    def bench_full_frames() -> int:
+        """Redraws the whole screen. Returns 1 frame."""
+        request_full_redraw(render_state)
+        draw_game_screen(game_data, titles, buttons, render_state)
+        return 1
+
+    def bench_hover_frames() -> int:
+        """Moves the highlight to the next tile, as mouse motion does,
+        and draws the frame. Returns 1 frame."""
+        last_tile = game_data['mouse_position_tile']
+        current_tile = hover_tiles[hover_index[0] % len(hover_tiles)]
+        hover_index[0] += 1
+
+        update_highlighted_tile(current_tile, last_tile,
+                                game_data['enemy_board'])
+        game_data['mouse_position_tile'] = current_tile
+        draw_game_screen(game_data, titles, buttons, render_state)
+        return 1
+
+    def bench_idle_frames() -> int:
+        """Draws a frame with nothing changed. Returns 1 frame."""
+        draw_game_screen(game_data, titles, buttons, render_state)
+        return 1
+
+    return {'full_frames_per_s': bench_full_frames,
+            'hover_frames_per_s': bench_hover_frames,
+            'idle_frames_per_s': bench_idle_frames}
+
+
+def make_simul_benchmarks() -> dict[str, Callable[[], int]]:
+    """
+    Prepares a simul of SIMUL_BOARDS games to draw on the display
+    opened by make_render_benchmarks().
+
+    :return: A dictionary of simul render benchmark functions by name.
+    """
+    buttons = make_menu_buttons()
+    render_state = make_simul_render_state(pygame.display.get_surface())
+    simul_data = set_up_simul(SIMUL_BOARDS)
+    hover_tiles = [(game_number, (board_x, 0))
+                   for game_number in range(SIMUL_BOARDS)
+                   for board_x in range(2)]
+    hover_index = [0]
+
+    def bench_simul_full_frames() -> int:
+        """Redraws the whole simul screen. Returns 1 frame."""
+        render_state['full_redraw'] = True
+        draw_simul_screen(simul_data, buttons, render_state)
+        return 1
+
+    def bench_simul_hover_frames() -> int:
+        """Moves the highlight to the next tile, hopping between
+        boards, and draws the frame. Returns 1 frame."""
+        simul_data['mouse_position_tile'] = hover_tiles[
+            hover_index[0] % len(hover_tiles)]
+        hover_index[0] += 1
+        draw_simul_screen(simul_data, buttons, render_state)
+        return 1
+
+    return {f'simul_full_frames_per_s[{SIMUL_BOARDS}]':
+            bench_simul_full_frames,
+            f'simul_hover_frames_per_s[{SIMUL_BOARDS}]':
+            bench_simul_hover_frames}
+
+
+def measure_startup() -> dict[str, float]:
+    """
+    Starts the game window in a new process, the way a player does,
+    so that imports and font loading are measured cold.
+
+    :return: A dictionary of seconds from the process start until
+    the splash and until the first game frame, by marker.
+    :raise RuntimeError: If the startup probe fails.
+    """
+    start_time = time.perf_counter()
+    marker_times = {}
+
+    with subprocess.Popen([sys.executable, '-m', 'benchmarks.startup_probe'],
+                          stdout=subprocess.PIPE, text=True,
+                          cwd=REPOSITORY_ROOT) as probe:
+        if probe.stdout is None:
+            raise RuntimeError("Benchmark error. The startup probe output "
+                               "is not piped.")
+        for line in probe.stdout:
+            marker_times[line.strip()] = time.perf_counter() - start_time
+    if probe.returncode != 0:
+        raise RuntimeError(f"Benchmark error. The startup probe exited "
+                           f"with code {probe.returncode}.")
+    return marker_times
+
+
+def measure_startup_rate(marker: str) -> float:
+    """
+    Measures one cold start of the game window.
+
+    :param marker: SPLASH_MARKER or READY_MARKER.
+    :return: 1 / seconds from the process start until the marker.
+    """
+    return 1 / measure_startup()[marker]
+
+
+def measure_rate(benchmark: Callable[[], int]) -> float:
+    """
+    Runs the given benchmark repeatedly for at least MIN_RUN_TIME
+    seconds.
+
+    :param benchmark: A function doing one unit of work and returning
+    the number of operations done.
+    :return: The rate in operations per second.
+    """
+    operations = 0
+    start_time = time.perf_counter()
+    elapsed_time = 0.0
+
+    while elapsed_time < MIN_RUN_TIME:
+        operations += benchmark()
+        elapsed_time = time.perf_counter() - start_time
+    return operations / elapsed_time
+
+
+def make_benchmarks() -> dict[str, Callable[[], float]]:
+    """
+    Prepares every benchmark with a fixed random seed.
+
+    :return: A dictionary of functions taking one rate sample,
+    by benchmark name.
+    """
+    random.seed(SEED)
+    benchmarks = {'boards_per_s': bench_board_generation,
+                  'ai_moves_per_s': bench_ai_moves,
+                  'engine_games_per_s': bench_engine_games,
+                  **make_render_benchmarks(),
+                  **make_simul_benchmarks()}
+    for rules_name, rules in LARGE_BOARD_RULES.items():
+        benchmarks[f'boards_per_s[{rules_name}]'] = partial(
+            bench_board_generation, rules)
+        benchmarks[f'ai_moves_per_s[{rules_name}]'] = partial(
+            bench_ai_moves, rules)
+
+    samplers: dict[str, Callable[[], float]] = {
+        name: partial(measure_rate, benchmark)
+        for name, benchmark in benchmarks.items()}
+    samplers['splash_startups_per_s'] = partial(measure_startup_rate,
+                                                SPLASH_MARKER)
+    samplers['game_startups_per_s'] = partial(measure_startup_rate,
+                                              READY_MARKER)
+    return samplers
+
+
+def run_worker() -> None:
+    """
+    Serves rate samples over stdin and stdout: prints the benchmark
+    names as a JSON list, then answers every benchmark name read
+    with one rate sample.
+
+    :return: None.
+    """
+    benchmarks = make_benchmarks()
+    print(json.dumps(list(benchmarks)), flush=True)
+
+    for line in sys.stdin:
+        print(repr(benchmarks[line.strip()]()), flush=True)
+
+
+def read_worker_line(worker: subprocess.Popen) -> str:
+    """
+    Reads an answer of a benchmark worker.
+
+    :param worker: A worker process started with piped stdin, stdout.
+    :return: The answer line.
+    :raise RuntimeError: If the worker has exited.
+    """
+    line = worker.stdout.readline() if worker.stdout is not None else ''
+
+    if not line:
+        raise RuntimeError(f"Benchmark error. A benchmark worker exited "
+                           f"with code {worker.wait()}.")
+    return line
+
+
+def take_worker_sample(worker: subprocess.Popen, name: str) -> float:
+    """
+    Asks a benchmark worker for one rate sample.
+
+    :param worker: A worker process started with piped stdin, stdout.
+    :param name: A benchmark name.
+    :return: The rate sample.
+    :raise RuntimeError: If the worker has exited.
+    """
+    if worker.stdin is None:
+        raise RuntimeError("Benchmark error. The benchmark worker "
+                           "has no input pipe.")
+    worker.stdin.write(name + '\n')
+    worker.stdin.flush()
+    return float(read_worker_line(worker))
+
+
+def measure_trees(trees: list[str]) -> list[dict[str, list[float]]]:
+    """
+    Takes ROUNDS rate samples of every benchmark in each of the given
+    source trees. Trees take turns sample by sample, so that slow
+    periods of the machine hit them alike.
+
+    :param trees: Paths of source trees with the benchmarks package.
+    :return: A dictionary of rate samples by benchmark name for each
+    tree, samples of the same round at the same index.
+    :raise RuntimeError: If a worker exits or the trees do not have
+    the same benchmarks.
+    """
+    # A fresh checkout has no bytecode cache, which would slow down
+    # its cold starts, and Python may be told not to write one
+    for tree in trees:
+        compileall.compile_dir(tree, quiet=1)
+    workers = [subprocess.Popen([sys.executable, '-m', 'benchmarks.benchmark',
+                                 '--worker'],
+                                stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                text=True, cwd=tree)
+               for tree in trees]
+    try:
+        names = [json.loads(read_worker_line(worker)) for worker in workers]
+        if any(tree_names != names[0] for tree_names in names):
+            raise RuntimeError("Benchmark error. The trees do not have "
+                               "the same benchmarks.")
+        samples: list[dict[str, list[float]]] = [
+            {name: [] for name in names[0]} for _ in trees]
+
+        for round_number in range(ROUNDS):
+            for name in names[0]:
+                # Every tree goes first in its share of the rounds
+                for turn in range(len(trees)):
+                    tree_number = (round_number + turn) % len(trees)
+                    samples[tree_number][name].append(
+                        take_worker_sample(workers[tree_number], name))
+    finally:
+        for worker in workers:
+            # A worker exits at the end of its input
+            worker.communicate()
+    return samples
+
+
+def add_reference_tree(revision: str) -> str:
+    """
+    Checks out the given revision into a temporary git worktree with
+    the benchmarks of the working tree, so that both trees run the
+    same benchmark code.
+
+    :param revision: A git revision, e.g. 'HEAD' or 'main'.
+    :return: A path of the reference tree.
+    """
+    reference_tree = tempfile.mkdtemp(prefix='navalbattle-reference-')
+    subprocess.run(['git', 'worktree', 'add', '--detach', reference_tree,
+                    revision],
+                   cwd=REPOSITORY_ROOT, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    shutil.copytree(os.path.join(REPOSITORY_ROOT, 'benchmarks'),
+                    os.path.join(reference_tree, 'benchmarks'),
+                    ignore=shutil.ignore_patterns('__pycache__'),
+                    dirs_exist_ok=True)
+    return reference_tree
+
+
+def remove_reference_tree(reference_tree: str) -> None:
+    """
+    Removes a worktree made by add_reference_tree().
+
+    :param reference_tree: A path of the reference tree.
+    :return: None.
+    """
+    subprocess.run(['git', 'worktree', 'remove', '--force', reference_tree],
+                   cwd=REPOSITORY_ROOT, check=True)
+
+
+def get_allowed_slowdown(ratios: list[float], threshold: float) -> float:
+    """
+    Returns the slowdown the median of the given sample ratios may
+    show before it counts as a regression: the threshold, or more
+    if the ratios are too noisy to tell the threshold from noise.
+
+    :param ratios: Rate ratios of the tree to the reference by round.
+    :param threshold: Allowed relative slowdown, 0.05 is 5%.
+    :return: The allowed relative slowdown.
+    """
+    median_ratio = statistics.median(ratios)
+    deviation = statistics.median(abs(ratio - median_ratio)
+                                  for ratio in ratios)
+    # The standard error of a median is about 1.86 deviations / sqrt(n)
+    median_error = 1.86 * deviation / math.sqrt(len(ratios))
+    return max(threshold, NOISE_FACTOR * median_error)
+
+
+def compare_samples(samples: dict[str, list[float]],
+                    reference_samples: dict[str, list[float]],
+                    threshold: float) -> list[str]:
+    """
+    Compares the rate samples of a tree to those of the reference,
+    round by round, and prints the comparison.
+
+    :param samples: A dictionary of rate samples by benchmark name.
+    :param reference_samples: A dictionary of the reference rate
+    samples taken in the same rounds.
+    :param threshold: Allowed relative slowdown, 0.05 is 5%.
+    :return: A list of regression descriptions, empty if none.
+    """
+    regressions = []
+
+    for name, rates in samples.items():
+        reference_rates = reference_samples[name]
+        ratios = [rate / reference_rate
+                  for rate, reference_rate in zip(rates, reference_rates)]
+        change = statistics.median(ratios) - 1
+        allowed_slowdown = get_allowed_slowdown(ratios, threshold)
+        print(f"{name:>28}: {statistics.median(rates):12.1f} vs "
+              f"{statistics.median(reference_rates):12.1f} "
+              f"({change:+.1%}, allowed -{allowed_slowdown:.1%})")
+
+        if change < -allowed_slowdown:
+            regressions.append(f"{name}: {change:+.1%} vs reference, "
+                               f"allowed -{allowed_slowdown:.1%}")
+    return regressions
+
+
+def main() -> None:
+    """Runs benchmarks and compares them to the reference revision."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="store medians of the working tree as "
+                             "the baselines of this machine")
+    parser.add_argument('--reference', default=DEFAULT_REFERENCE,
+                        help="git revision to compare the working tree "
+                             "to (default: %(default)s)")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed relative slowdown (default: %(default)s)")
+    # Internal: serve rate samples to the process comparing the trees
+    parser.add_argument('--worker', action='store_true',
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker()
+        return
+
+    if args.save_baseline:
+        samples = measure_trees([REPOSITORY_ROOT])[0]
+        for name, rates in samples.items():
+            print(f"{name:>28}: {statistics.median(rates):12.1f}")
+
+        with open(BASELINES_PATH, 'w') as baselines_file:
+            json.dump({name: round(statistics.median(rates), 1)
+                       for name, rates in samples.items()},
+                      baselines_file, indent=4, sort_keys=True)
+            baselines_file.write('\n')
+        print(f"Baselines saved to {BASELINES_PATH}")
+        return
+
+    reference_tree = add_reference_tree(args.reference)
+    try:
+        samples, reference_samples = measure_trees([REPOSITORY_ROOT,
+                                                    reference_tree])
+    finally:
+        remove_reference_tree(reference_tree)
+    regressions = compare_samples(samples, reference_samples, args.threshold)
+
+    if regressions:
+        print("Performance regressions:", *regressions, sep='\n  ')
+        sys.exit(1)
+    print("No regressions.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+Starts the game window the way NavalBattle.main() does, reports
+on stdout when the splash and the first game frame are shown, and
+exits. Run in a new process by the startup benchmark:
+    python -m benchmarks.startup_probe
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# The probe must run without a real display
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+from NavalBattle import open_game_window, load_first_game  # noqa: E402
+from constants import DEFAULT_AI_MODE, DEFAULT_RULES  # noqa: E402
+from graphics import (  # noqa: E402
+    draw_splash_screen, make_render_state, draw_game_screen)
+
+
+SPLASH_MARKER = 'splash'
+READY_MARKER = 'ready'
+
+
+def main() -> None:
+    """Shows the first frames of the game and reports them."""
+    display_surface = open_game_window()
+    draw_splash_screen(display_surface)
+    print(SPLASH_MARKER, flush=True)
+
+    ai_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ai')
+    titles, buttons, game_data = load_first_game(DEFAULT_AI_MODE,
+                                                 DEFAULT_RULES, ai_executor)
+    draw_game_screen(game_data, titles, buttons,
+                     make_render_state(display_surface))
+    print(READY_MARKER, flush=True)
+    ai_executor.shutdown()
+
+
+if __name__ == '__main__':
+    main()
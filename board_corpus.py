@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+from multiprocessing.shared_memory import SharedMemory
+from typing import Iterable, Optional, TypedDict
+
+import numpy as np
+
+from board_generator import get_new_board, fill_targets_list
+from constants import (
+    GameBoardType, RuleSet, SHIP_COLORS, PLAYER_BOARD_TOPLEFT, DEFAULT_RULES,
+    CORPUS_SPACING_FLAG)
+
+
+BoardCorpusType = TypedDict('BoardCorpusType',
+                            {'shared_memory': SharedMemory,
+                             'tiles': np.ndarray,
+                             'seed': int,
+                             'rules': RuleSet})
+
+
+def encode_board(board: GameBoardType) -> np.ndarray:
+    """
+    Encodes ship placement of the given board as one byte per tile:
+    0 for water or the ship color index plus one, with
+    CORPUS_SPACING_FLAG set on ship spacing tiles.
+
+    :param board: A game board of GameBoardType(TypedDict).
+    :return: An array of tile codes indexed by [x, y].
+    """
+    return np.array(
+        [[(0 if tile['is_empty'] else SHIP_COLORS.index(tile['color']) + 1)
+          | (CORPUS_SPACING_FLAG if tile['is_for_spacing'] else 0)
+          for tile in column]
+         for column in board['tiles']], dtype=np.uint8)
+
+
+def decode_board(tile_codes: np.ndarray,
+                 board_topleft: tuple[int, int] = PLAYER_BOARD_TOPLEFT
+                 ) -> GameBoardType:
+    """
+    Builds a game-ready board from encoded tiles.
+
+    :param tile_codes: An array of tile codes indexed by [x, y].
+    :param board_topleft: The top left corner coordinates
+    of the board in (x, y) format.
+    :return: A game board of GameBoardType(TypedDict).
+    """
+    board = get_new_board(board_topleft, *tile_codes.shape)
+
+    # Water tiles are left as get_new_board makes them
+    for board_x, board_y in zip(*np.nonzero(tile_codes)):
+        tile_code = int(tile_codes[board_x, board_y])
+        tile = board['tiles'][board_x][board_y]
+        ship_color = tile_code & ~CORPUS_SPACING_FLAG
+
+        if ship_color:
+            tile['is_empty'] = False
+            tile['color'] = SHIP_COLORS[ship_color - 1]
+        tile['is_for_spacing'] = bool(tile_code & CORPUS_SPACING_FLAG)
+    return fill_targets_list(board)
+
+
+def create_board_corpus(boards: Iterable[GameBoardType],
+                        count: int,
+                        seed: int,
+                        rules: RuleSet = DEFAULT_RULES) -> BoardCorpusType:
+    """
+    Encodes the given boards into a new shared memory block.
+
+    :param boards: Game boards of GameBoardType(TypedDict), may be
+    a generator so that only one board is kept at a time.
+    :param count: The number of boards.
+    :param seed: A seed of the simulation the boards are for.
+    :param rules: A RuleSet the boards were generated with.
+    :return: A board corpus of BoardCorpusType(TypedDict), the caller
+    must close it with unlink=True when done.
+    """
+    shape = (count, rules.board_width, rules.board_height)
+    shared_memory = SharedMemory(create=True, size=int(np.prod(shape)))
+    tiles = np.ndarray(shape, np.uint8, buffer=shared_memory.buf)
+
+    for board_number, board in zip(range(count), boards):
+        tiles[board_number] = encode_board(board)
+
+    board_corpus: BoardCorpusType
+    board_corpus = {'shared_memory': shared_memory,
+                    'tiles': tiles,
+                    'seed': seed,
+                    'rules': rules}
+    return board_corpus
+
+
+def attach_board_corpus(name: str,
+                        count: int,
+                        seed: int,
+                        rules: RuleSet = DEFAULT_RULES) -> BoardCorpusType:
+    """
+    Attaches to a board corpus created by another process. Tiles are
+    a view of the shared memory, nothing is copied.
+
+    :param name: The shared memory block name.
+    :param count: The number of boards in the corpus.
+    :param seed: A seed of the simulation the boards are for.
+    :param rules: A RuleSet the boards were generated with.
+    :return: A board corpus of BoardCorpusType(TypedDict).
+    """
+    shared_memory = SharedMemory(name=name)
+    tiles = np.ndarray((count, rules.board_width, rules.board_height),
+                       np.uint8, buffer=shared_memory.buf)
+
+    board_corpus: BoardCorpusType
+    board_corpus = {'shared_memory': shared_memory,
+                    'tiles': tiles,
+                    'seed': seed,
+                    'rules': rules}
+    return board_corpus
+
+
+def get_corpus_board(board_corpus: Optional[BoardCorpusType],
+                     seed: int,
+                     board_number: int,
+                     rules: RuleSet = DEFAULT_RULES
+                     ) -> Optional[GameBoardType]:
+    """
+    Decodes a board from the corpus if the corpus has it.
+
+    :param board_corpus: A board corpus of BoardCorpusType, if any.
+    :param seed: A seed of the simulation asking for the board.
+    :param board_number: A number of the board.
+    :param rules: A RuleSet of the simulation asking for the board.
+    :return: A game board of GameBoardType(TypedDict), None if there
+    is no corpus or it was made for other games.
+    """
+    if (board_corpus is None or board_corpus['seed'] != seed
+            or board_corpus['rules'] != rules
+            or board_number >= len(board_corpus['tiles'])):
+        return None
+    return decode_board(board_corpus['tiles'][board_number])
+
+
+def close_board_corpus(board_corpus: BoardCorpusType,
+                       unlink: bool = False) -> None:
+    """
+    Releases the shared memory of the corpus.
+
+    :param board_corpus: A board corpus of BoardCorpusType(TypedDict).
+    :param unlink: True to destroy the shared memory block, done once
+    by the process that created it.
+    :return: None.
+    """
+    # The view must go before the buffer it points to can be closed,
+    # an empty array leaves a closed corpus without boards
+    rules = board_corpus['rules']
+    board_corpus['tiles'] = np.empty((0, rules.board_width,
+                                      rules.board_height), np.uint8)
+    board_corpus['shared_memory'].close()
+    if unlink:
+        board_corpus['shared_memory'].unlink()
@@ -1,10 +1,13 @@
 # -*- coding: utf-8 -*-
 import random
+from typing import Literal, Optional
 
+from board_geometry import get_placement_tables
+from metrics import inc_counter
 from constants import (
-    GameBoardType, TileMatrixType, TargetListType, BOARD_WIDTH_IN_TILES,
-    BOARD_HEIGHT_IN_TILES, GRID_STEP, GRID_WIDTH, DARK_TURQUOISE, SHIP_SIZES,
-    SHIP_COUNTS, SHIP_COLORS)
+    GameBoardType, TileMatrixType, TargetListType, RuleSet,
+    BOARD_WIDTH_IN_TILES, BOARD_HEIGHT_IN_TILES, GRID_STEP, GRID_WIDTH,
+    DARK_TURQUOISE, SHIP_COLORS, DEFAULT_RULES, BOARD_GENERATION_ATTEMPTS)
 
 
 def get_tile_pixel_coords(x: int, y: int,
@@ -96,6 +99,16 @@ def tile_is_on_board(board_x: int,
         return False
 
 
+def get_board_size(board: GameBoardType) -> tuple[int, int]:
+    """
+    Returns the size of the given board.
+
+    :param board: A game board of GameBoardType(TypedDict).
+    :return: Board width and height in tiles.
+    """
+    return len(board['tiles']), len(board['tiles'][0])
+
+
 def tile_is_ready_for_placement(board_x: int,
                                 board_y: int,
                                 board: GameBoardType) -> bool:
@@ -108,7 +121,7 @@ def tile_is_ready_for_placement(board_x: int,
     of GameBoardType(TypedDict).
     :return: True if tile is ready for ship placement, else False.
     """
-    if tile_is_on_board(board_x, board_y):
+    if tile_is_on_board(board_x, board_y, *get_board_size(board)):
         tile = board['tiles'][board_x][board_y]
         if tile['is_empty'] and not tile['is_for_spacing']:
             return True
@@ -124,32 +137,37 @@ def search_placement_ready_tiles(board: GameBoardType
     :return: A list of (x, y) tuples with coordinates
     of placement-ready tiles.
     """
-    tiles = [(board_x, board_y)
-             for board_x in range(BOARD_WIDTH_IN_TILES)
-             for board_y in range(BOARD_HEIGHT_IN_TILES)
-             if tile_is_ready_for_placement(board_x, board_y, board)]
+    tiles = [(column[0]['board_x'], tile['board_y'])
+             for column in board['tiles']
+             for tile in column
+             if tile['is_empty'] and not tile['is_for_spacing']]
     return tiles
 
 
-def choose_orientation_randomly() -> str:
+def choose_orientation_randomly(rng: Optional[random.Random] = None) -> str:
     """
     Randomly chooses horizontal or vertical orientation of the ship.
+
+    :param rng: A random generator to use, the global one if None.
     :return: Ship orientation in 'horizontal' or 'vertical' format.
     """
-    return random.choice(('horizontal', 'vertical'))
+    return (rng or random).choice(('horizontal', 'vertical'))
 
 
-def select_random_tile(tiles: list[tuple[int, int]]) -> dict[str, int]:
+def select_random_tile(tiles: list[tuple[int, int]],
+                       rng: Optional[random.Random] = None
+                       ) -> dict[str, int]:
     """
     Selects a random tile from the given list.
 
     :param tiles: A list of (x, y) tuples with
     tile coordinates to select.
+    :param rng: A random generator to use, the global one if None.
     :return: A dictionary of selected tile coordinates
     in {'x': int, 'y': int} format.
     """
     tile = {}
-    (tile['x'], tile['y']) = random.choice(tiles)
+    (tile['x'], tile['y']) = (rng or random).choice(tiles)
     return tile
 
 
@@ -183,10 +201,35 @@ def get_ship_body_coords(first_tile: dict[str, int],
     return ship_tiles
 
 
+def get_placement_table(table_name: Literal['bodies', 'halos'],
+                        length: int,
+                        orientation: str,
+                        rules: RuleSet = DEFAULT_RULES) -> tuple:
+    """
+    Returns a compiled placement table of ships of the given length
+    and orientation.
+
+    :param table_name: 'bodies' or 'halos'.
+    :param length: The length of the ship.
+    :param orientation: The orientation of the ship can be
+    'horizontal' or 'vertical'.
+    :param rules: A RuleSet of the game.
+    :return: A table of tile coordinates indexed by head [x][y].
+    """
+    tables = get_placement_tables(rules)[table_name]
+
+    if (length, orientation) not in tables:
+        raise ValueError("Placement table getting error. The ship length "
+                         "must be one of the fleet ship sizes and the "
+                         "orientation 'horizontal' or 'vertical'.")
+    return tables[length, orientation]
+
+
 def check_ship_placement_possibility(first_tile: dict[str, int],
                                      length: int,
                                      orientation: str,
-                                     board: GameBoardType) -> bool:
+                                     board: GameBoardType,
+                                     rules: RuleSet = DEFAULT_RULES) -> bool:
     """
     Checks if a ship of the given length can be placed on the board,
     starting from the given tile.
@@ -198,12 +241,19 @@ def check_ship_placement_possibility(first_tile: dict[str, int],
     'horizontal' or 'vertical'.
     :param board: A game board of GameBoardType(TypedDict)
     to place the ship.
+    :param rules: A RuleSet of the game.
     :return: True if the ship can be placed, else False.
     """
-    ship_tiles = get_ship_body_coords(first_tile, length, orientation)
+    ship_tiles = get_placement_table('bodies', length, orientation,
+                                     rules)[first_tile['x']][first_tile['y']]
+    # The ship does not fit on the board
+    if ship_tiles is None:
+        return False
 
+    tiles = board['tiles']
     for board_x, board_y in ship_tiles:
-        if not tile_is_ready_for_placement(board_x, board_y, board):
+        tile = tiles[board_x][board_y]
+        if not tile['is_empty'] or tile['is_for_spacing']:
             return False
     return True
 
@@ -239,7 +289,8 @@ def place_ship_on_board(first_tile: dict[str, int],
 def mark_ship_spacing(first_tile: dict[str, int],
                       length: int,
                       orientation: str,
-                      board: GameBoardType) -> GameBoardType:
+                      board: GameBoardType,
+                      rules: RuleSet = DEFAULT_RULES) -> GameBoardType:
     """
     Marks ship surrounding tiles as spacing.
 
@@ -250,30 +301,28 @@ def mark_ship_spacing(first_tile: dict[str, int],
     'horizontal' or 'vertical'.
     :param board: A game board of GameBoardType(TypedDict)
     to place the ship.
+    :param rules: A RuleSet of the game, nothing is marked if ships
+    may touch.
     :return: The game board with marked ship spacing.
     """
-    for length_shift in range(-1, length + 1):
-        for width_shift in (- 1, 0, 1):
-            if orientation == 'horizontal':
-                board_x = first_tile['x'] + length_shift
-                board_y = first_tile['y'] + width_shift
-            elif orientation == 'vertical':
-                board_x = first_tile['x'] + width_shift
-                board_y = first_tile['y'] + length_shift
-            else:
-                raise ValueError("Ship spacing marking error. Invalid ship "
-                                 "orientation, must be 'horizontal' "
-                                 "or 'vertical'.")
-
-            if tile_is_ready_for_placement(board_x, board_y, board):
-                current_tile = board['tiles'][board_x][board_y]
-                current_tile['is_for_spacing'] = True
+    tiles = board['tiles']
+    ship_halo = get_placement_table('halos', length, orientation,
+                                    rules)[first_tile['x']][first_tile['y']]
+
+    # The halo is clipped to the board and includes the ship itself,
+    # which is not empty and so is not marked
+    for board_x, board_y in ship_halo:
+        current_tile = tiles[board_x][board_y]
+        if current_tile['is_empty']:
+            current_tile['is_for_spacing'] = True
     return board
 
 
 def place_ship_randomly(length: int,
                         color: tuple[int, int, int],
-                        board: GameBoardType) -> GameBoardType:
+                        board: GameBoardType,
+                        rng: Optional[random.Random] = None,
+                        rules: RuleSet = DEFAULT_RULES) -> GameBoardType:
     """
     Places a ship of the given length and color on random tiles
     of the game board.
@@ -282,14 +331,17 @@ def place_ship_randomly(length: int,
     :param color: A color of the ship in (R, G, B) format.
     :param board: A board of GameBoardType(TypedDict)
     to place the ship.
+    :param rng: A random generator to use, the global one if None.
+    :param rules: A RuleSet of the game.
     :return: The game board with placed ship and marked ship spacing.
     """
-    orientation = choose_orientation_randomly()
+    orientation = choose_orientation_randomly(rng)
     available_tiles = search_placement_ready_tiles(board)
+    retries = 0
 
     while True:
         if len(available_tiles) > 0:
-            selected_tile = select_random_tile(available_tiles)
+            selected_tile = select_random_tile(available_tiles, rng)
         else:
             raise RuntimeError("Can't fit all ships on board! "
                                "Make ships smaller or decrease their numbers.")
@@ -297,7 +349,8 @@ def place_ship_randomly(length: int,
             first_tile=selected_tile,
             length=length,
             orientation=orientation,
-            board=board)
+            board=board,
+            rules=rules)
 
         if ship_can_be_placed:
             board = place_ship_on_board(first_tile=selected_tile,
@@ -308,26 +361,40 @@ def place_ship_randomly(length: int,
             board = mark_ship_spacing(first_tile=selected_tile,
                                       length=length,
                                       orientation=orientation,
-                                      board=board)
+                                      board=board,
+                                      rules=rules)
+            inc_counter('navalbattle_ships_placed_total')
+            if retries:
+                inc_counter('navalbattle_ship_placement_retries_total',
+                            amount=retries)
             return board
         # If the tile fails the check, remove it and repeat
         available_tiles.remove((selected_tile['x'], selected_tile['y']))
+        retries += 1
 
 
-def place_ships_randomly(board: GameBoardType) -> GameBoardType:
+def place_ships_randomly(board: GameBoardType,
+                         rng: Optional[random.Random] = None,
+                         rules: RuleSet = DEFAULT_RULES) -> GameBoardType:
     """
     Places full set of ships on game board randomly.
 
     :param board: A board of GameBoardType(TypedDict)
     to place ships.
+    :param rng: A random generator to use, the global one if None.
+    :param rules: A RuleSet of the game with the fleet to place.
     :return: The game board with placed ships.
     """
-    total_ship_types_count = len(SHIP_SIZES)
+    total_ship_types_count = len(rules.ship_sizes)
     for i in range(total_ship_types_count):
-        for _ in range(SHIP_COUNTS[i]):
-            board = place_ship_randomly(length=SHIP_SIZES[i],
-                                        color=SHIP_COLORS[i],
-                                        board=board)
+        for _ in range(rules.ship_counts[i]):
+            # Fleets of many ship types reuse the colors
+            board = place_ship_randomly(
+                length=rules.ship_sizes[i],
+                color=SHIP_COLORS[i % len(SHIP_COLORS)],
+                board=board,
+                rng=rng,
+                rules=rules)
     return board
 
 
@@ -340,23 +407,38 @@ def fill_targets_list(board: GameBoardType) -> GameBoardType:
     :return: The game board with filled list of targets.
     """
     board['targets'] = [
-        (board_x, board_y)
-        for board_x in range(BOARD_WIDTH_IN_TILES)
-        for board_y in range(BOARD_HEIGHT_IN_TILES)
-        if not board['tiles'][board_x][board_y]['is_empty']]
+        (column[0]['board_x'], tile['board_y'])
+        for column in board['tiles']
+        for tile in column
+        if not tile['is_empty']]
     return board
 
 
-def get_random_board(board_topleft: tuple[int, int]) -> GameBoardType:
+def get_random_board(board_topleft: tuple[int, int],
+                     rng: Optional[random.Random] = None,
+                     rules: RuleSet = DEFAULT_RULES) -> GameBoardType:
     """
-    Creates a new game board with randomly placed ships.
+    Creates a new game board with randomly placed ships. Dense fleets
+    may not fit into a board once the first ships are placed, so up
+    to BOARD_GENERATION_ATTEMPTS fresh boards are tried.
 
     :param board_topleft: The top left corner coordinates
     of the new board in format (x, y).
+    :param rng: A random generator to use, the global one if None,
+    so that boards can be reproduced from a seed.
+    :param rules: A RuleSet of the game with the board size and fleet.
     :return: A game-ready board data structure
     of GameBoardType (TypedDict).
     """
-    board = get_new_board(board_topleft)
-    board = place_ships_randomly(board)
-    board = fill_targets_list(board)
-    return board
+    for _ in range(BOARD_GENERATION_ATTEMPTS):
+        board = get_new_board(board_topleft, rules.board_width,
+                              rules.board_height)
+        try:
+            board = place_ships_randomly(board, rng, rules)
+        except RuntimeError:
+            continue
+        board = fill_targets_list(board)
+        return board
+
+    raise RuntimeError("Can't fit all ships on board! "
+                       "Make ships smaller or decrease their numbers.")
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+from functools import lru_cache
+from typing import Optional, TypedDict
+
+from constants import RuleSet, BOARD_WIDTH_IN_TILES, BOARD_HEIGHT_IN_TILES
+
+
+CoordsTupleType = tuple[tuple[int, int], ...]
+PlacementTablesType = TypedDict(
+    'PlacementTablesType',
+    {'bodies': dict[tuple[int, str],
+                    tuple[tuple[Optional[CoordsTupleType], ...], ...]],
+     'halos': dict[tuple[int, str], tuple[tuple[CoordsTupleType, ...], ...]]})
+
+
+@lru_cache()
+def get_tile_halos(board_width: int = BOARD_WIDTH_IN_TILES,
+                   board_height: int = BOARD_HEIGHT_IN_TILES
+                   ) -> tuple[tuple[CoordsTupleType, ...], ...]:
+    """
+    Returns a table of 3x3 neighborhoods of every tile of a board
+    of the given size, the tile itself included.
+
+    :param board_width: The width of the game board in tiles.
+    :param board_height: The height of the game board in tiles.
+    :return: A table indexed by [x][y] of in-bounds (x, y) coordinates
+    of the tile neighborhood.
+    """
+    return tuple(
+        tuple(tuple((neighbor_x, neighbor_y)
+                    for neighbor_x in range(max(board_x - 1, 0),
+                                            min(board_x + 2, board_width))
+                    for neighbor_y in range(max(board_y - 1, 0),
+                                            min(board_y + 2, board_height)))
+              for board_y in range(board_height))
+        for board_x in range(board_width))
+
+
+def get_ship_halo(head_x: int,
+                  head_y: int,
+                  length: int,
+                  orientation: str,
+                  board_width: int = BOARD_WIDTH_IN_TILES,
+                  board_height: int = BOARD_HEIGHT_IN_TILES
+                  ) -> CoordsTupleType:
+    """
+    Returns the ship body and its one tile wide surrounding clipped
+    to the board.
+
+    :param head_x: The x coordinate of the ship first (head) tile.
+    :param head_y: The y coordinate of the ship first (head) tile.
+    :param length: The length of the ship.
+    :param orientation: The orientation of the ship can be
+    'horizontal' or 'vertical'.
+    :param board_width: The width of the game board in tiles.
+    :param board_height: The height of the game board in tiles.
+    :return: A tuple of in-bounds (x, y) coordinates.
+    """
+    if orientation == 'horizontal':
+        x_range = range(head_x - 1, head_x + length + 1)
+        y_range = range(head_y - 1, head_y + 2)
+    elif orientation == 'vertical':
+        x_range = range(head_x - 1, head_x + 2)
+        y_range = range(head_y - 1, head_y + length + 1)
+    else:
+        raise ValueError("Ship halo getting error. Invalid ship "
+                         "orientation, must be 'horizontal' "
+                         "or 'vertical'.")
+
+    return tuple((board_x, board_y)
+                 for board_x in x_range
+                 for board_y in y_range
+                 if 0 <= board_x < board_width
+                 and 0 <= board_y < board_height)
+
+
+def get_ship_body(head_x: int,
+                  head_y: int,
+                  length: int,
+                  orientation: str,
+                  board_width: int = BOARD_WIDTH_IN_TILES,
+                  board_height: int = BOARD_HEIGHT_IN_TILES
+                  ) -> Optional[CoordsTupleType]:
+    """
+    Returns tiles of a ship body if the whole ship fits on the board.
+
+    :param head_x: The x coordinate of the ship first (head) tile.
+    :param head_y: The y coordinate of the ship first (head) tile.
+    :param length: The length of the ship.
+    :param orientation: The orientation of the ship can be
+    'horizontal' or 'vertical'.
+    :param board_width: The width of the game board in tiles.
+    :param board_height: The height of the game board in tiles.
+    :return: A tuple of (x, y) coordinates, None if the ship does not
+    fit on the board.
+    """
+    if orientation == 'horizontal':
+        tail_x, tail_y = head_x + length - 1, head_y
+    elif orientation == 'vertical':
+        tail_x, tail_y = head_x, head_y + length - 1
+    else:
+        raise ValueError("Ship body getting error. Invalid ship "
+                         "orientation, must be 'horizontal' "
+                         "or 'vertical'.")
+
+    if tail_x >= board_width or tail_y >= board_height:
+        return None
+    return tuple((board_x, board_y)
+                 for board_x in range(head_x, tail_x + 1)
+                 for board_y in range(head_y, tail_y + 1))
+
+
+@lru_cache()
+def get_placement_tables(rules: RuleSet) -> PlacementTablesType:
+    """
+    Compiles ship placement tables of the given rules: the body and
+    the spacing halo of every ship of the fleet at every head tile
+    in both orientations. Tables are cached by the rules, so a rule
+    set is compiled once per process however many games use it.
+
+    :param rules: A RuleSet of the game.
+    :return: Tables of PlacementTablesType(TypedDict) keyed by
+    (ship length, orientation) and indexed by head [x][y]. Halos are
+    empty if ships may touch.
+    """
+    tables: PlacementTablesType
+    tables = {'bodies': {}, 'halos': {}}
+
+    for length in set(rules.ship_sizes):
+        for orientation in ('horizontal', 'vertical'):
+            tables['bodies'][length, orientation] = tuple(
+                tuple(get_ship_body(head_x, head_y, length, orientation,
+                                    rules.board_width, rules.board_height)
+                      for head_y in range(rules.board_height))
+                for head_x in range(rules.board_width))
+            tables['halos'][length, orientation] = tuple(
+                tuple(() if rules.ships_may_touch
+                      else get_ship_halo(head_x, head_y, length, orientation,
+                                         rules.board_width,
+                                         rules.board_height)
+                      for head_y in range(rules.board_height))
+                for head_x in range(rules.board_width))
+    return tables
@@ -1,10 +1,13 @@
 # -*- coding: utf-8 -*-
-from typing import TypedDict, Optional
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, NamedTuple, TypedDict, Optional
 
-import pygame
-from pygame.font import Font
-from pygame.rect import Rect
-from pygame.surface import Surface
+# Only GUI modules import pygame, the engine and the terminal front end
+# must work without it
+if TYPE_CHECKING:
+    from numpy import ndarray
+    from pygame.rect import Rect
+    from pygame.surface import Surface
 
 
 #                    R    G    B
@@ -30,8 +33,21 @@ LIGHT_COLORS = (DARK_GRAY, LIGHT_GRAY, LIGHT_RED, LIGHT_GREEN,
 BG_COLOR = DARK_TURQUOISE
 BUTTON_COLOR = TURQUOISE
 TEXT_COLOR = WHITE
+HINT_LEVELS = 8  # shades of hidden tiles by ship probability
+HINT_HOT_COLOR = (235, 110, 40)  # shade of the most likely tiles
+# Shades are unpacked into (R, G, B) tuples, so they type as colors
+HINT_COLORS = tuple((red, green, blue) for red, green, blue in (
+    [gray + (hot - gray) * level // (HINT_LEVELS - 1)
+     for gray, hot in zip(GRAY, HINT_HOT_COLOR)]
+    for level in range(HINT_LEVELS)))
+HINT_LIGHT_COLORS = tuple(
+    (min(red + 40, 255), min(green + 40, 255), min(blue + 40, 255))
+    for red, green, blue in HINT_COLORS)
+HINT_HIT_WEIGHT = 10  # how much likelier a ship is for each hit it explains
 
 FPS = 60
+EVENT_WAIT_TIMEOUT = 1000  # ms to sleep when no events arrive
+AI_THINKING_INDICATOR_DELAY = 150  # ms before "thinking" is shown
 WINDOW_WIDTH = 1024
 WINDOW_HEIGHT = 720
 WINDOW_CAPTION = "Naval Battle"
@@ -68,20 +84,27 @@ SHIP_SIZES = (CARRIER_SIZE, CRUISER_SIZE, DESTROYER_SIZE, FRIGATE_SIZE)
 SHIP_COUNTS = (CARRIER_COUNT, CRUISER_COUNT, DESTROYER_COUNT, FRIGATE_COUNT)
 SHIP_COLORS = (CARRIER_COLOUR, CRUISER_COLOUR,
                DESTROYER_COLOUR, FRIGATE_COLOUR)
+SHIPS_MAY_TOUCH = False  # by default ships are kept one tile apart
+BOARD_GENERATION_ATTEMPTS = 100  # fresh boards tried before giving up
 
 BASIC_FONT_NAME = 'freesansbold.ttf'
 BASIC_FONT_SIZE = 20
+TEXT_CACHE_SIZE = 128  # rendered text surfaces kept for reuse
 
 MESSAGE_TOPLEFT = (10, 30)
 STARTGAME_TEXT = ("Welcome aboard, admiral! "
                   "Choose your targets on the right board.")
 ENDGAME_WIN_TEXT = "Congratulations, admiral! You have won the battle!!!"
 ENDGAME_DEFEAT_TEXT = "Sadly, you have loose the battle..."
+AI_THINKING_TEXT = "AI is thinking..."
+AI_THINKING_TOPLEFT = (10, 60)
 
 NEWGAME_BUTTON_TEXT = "New Game"
 NEWGAME_BUTTON_TOPLEFT = (WINDOW_WIDTH - 160, WINDOW_HEIGHT - 90)
 REVEAL_BUTTON_TEXT = "Reveal AI board"
 REVEAL_BUTTON_TOPLEFT = (WINDOW_WIDTH - 160, WINDOW_HEIGHT - 60)
+HINT_BUTTON_TEXT = "Hint"
+HINT_BUTTON_TOPLEFT = (WINDOW_WIDTH - 220, WINDOW_HEIGHT - 60)
 QUIT_BUTTON_TEXT = "Quit"
 QUIT_BUTTON_TOPLEFT = (WINDOW_WIDTH - 160, WINDOW_HEIGHT - 30)
 PLAYER_BOARD_TITLE_TEXT = "Player board"
@@ -91,12 +114,81 @@ AI_BOARD_TITLE_TOPLEFT = (
     X_MARGIN + 160 + BOARD_WIDTH_IN_PIXELS + DISTANCE_BEETWEEN_BOARDS,
     Y_MARGIN - 30)
 
+TERMINAL_BOARDS_TOP = 3  # terminal row of the first board row
+TERMINAL_BOARD_LEFT = 2  # terminal column of the player board
+TERMINAL_TILE_WIDTH = 2  # characters per tile, the glyph and a space
+TERMINAL_BOARD_GAP = 6  # characters between the boards
+TERMINAL_SHIP_COLORS = ('red', 'green', 'blue', 'yellow')  # curses names
+TERMINAL_WATCH_DELAY = 100  # ms between moves when an AI plays for you
+TERMINAL_HELP_TEXT = ("Arrows/click: aim  Space/Enter: shoot  "
+                      "n: new game  r: reveal  q: quit")
+TERMINAL_TOO_SMALL_TEXT = "Please make the terminal bigger"
+
+SIMUL_MAX_BOARDS = 16  # enemy boards a player may fight at once
+SIMUL_MAX_TILE_SIZE = 24  # simul tile size, grid line included
+SIMUL_MIN_TILE_SIZE = 6
+SIMUL_GRID_TOPLEFT = (10, 70)  # below the screen message
+SIMUL_GRID_SIZE = (WINDOW_WIDTH - 20, WINDOW_HEIGHT - 170)  # above buttons
+SIMUL_CELL_GAP = 12  # pixels between neighbor games
+SIMUL_BOARD_GAP = 6  # pixels between the enemy and the player board
+SIMUL_SCORE_TEXT = "Won: {won}  Lost: {lost}  Playing: {playing}"
+SIMUL_OVER_TEXT = "The simul is over, admiral! Won: {won}  Lost: {lost}"
+
+AI_MODES = ('classic',)
+DEFAULT_AI_MODE = 'classic'
+SIMULATION_CHUNK_SIZE = 100  # games sent to a worker at once
+SIMULATION_LATENCY_BUCKET = 100  # ns, resolution of move time stats
+CORPUS_SPACING_FLAG = 0x80  # tile code bit of ship spacing tiles
+COMPARISON_DELTA = 1.0  # smallest mean shot difference worth finding
+COMPARISON_ALPHA = 0.05  # chance to find a difference that is not there
+COMPARISON_BETA = 0.05  # chance to miss a difference of DELTA
+COMPARISON_MIN_GAMES = 100  # game pairs before the variance is trusted
+COMPARISON_MAX_GAMES = 100_000
+ANALYTICS_CHUNK_SIZE = 10_000  # game log lines decoded at once
+ANALYTICS_RANGE_SIZE = 64 * 2 ** 20  # bytes of a game log a worker reads
+TOURNAMENT_GAMES = 100  # boards every bot plays by default
+TOURNAMENT_MOVE_TIMEOUT = 0.1  # seconds a bot may think over one shot
+TOURNAMENT_START_TIMEOUT = 2.0  # seconds a bot may take to start a game
+TOURNAMENT_MEMORY_LIMIT = 256  # MiB of address space of a bot process
+TOURNAMENT_MAX_FORFEITS = 3  # forfeits in a row before a bot sits out
+LOAD_TEST_STAGES = (50, 100, 250, 500, 1000, 2000)  # clients per stage
+LOAD_TEST_STAGE_DURATION = 5.0  # seconds every stage is measured for
+LOAD_TEST_THINK_TIME = 0.5  # mean seconds a simulated human thinks
+LOAD_TEST_QUEUE_SIZE = 256  # requests waiting for the server engine
+LOAD_TEST_LATENCY_BUCKET = 10_000  # ns, resolution of round trip stats
+LOAD_TEST_RTT_LIMIT = 0.1  # seconds of p99 round trip a stage may take
+
+RESULTS_DB_PATH = 'results.sqlite3'
+RESULTS_BATCH_SIZE = 64  # max records written in one transaction
+RESULTS_FLUSH_INTERVAL = 2.0  # seconds between background flushes
+
+PROFILER_HOTKEY = 'f3'  # pygame key name
+PROFILER_CSV_ENV_VAR = 'NAVALBATTLE_PROFILE_CSV'
+PROFILER_STAGES = ('handle_events', 'handle_player_move', 'make_ai_move',
+                   'draw_game_screen')
+PROFILER_WINDOW = 600  # frames kept for rolling percentiles
+PROFILER_OVERLAY_INTERVAL = 500  # ms between overlay refreshes
+PROFILER_OVERLAY_TOPLEFT = (10, WINDOW_HEIGHT - 100)
+PROFILER_OVERLAY_LINE_HEIGHT = 20
+
+PROFILE_HOOKS_ENV_VAR = 'NAVALBATTLE_PROFILE_FRAMES'  # frames to cProfile
+PROFILE_HOOKS_DIR_ENV_VAR = 'NAVALBATTLE_PROFILE_DIR'  # where to dump results
+PROFILE_HOOKS_MEMORY_CALLS = 3  # traced calls of every memory hooked function
+PROFILE_HOOKS_TOP_STATS = 30  # lines of profile and memory reports
+
+METRICS_FILE_ENV_VAR = 'NAVALBATTLE_METRICS_FILE'
+METRICS_EXPORT_INTERVAL = 15.0  # seconds between metrics file writes
+# Upper bounds in seconds of the latency histogram buckets
+METRICS_LATENCY_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025,
+                           0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05)
+
 ATTACK_DIRECTIONS_TEMPLATE = ('up', 'down', 'left', 'right')
 REVERSED_ATTACK_DIRECTIONS = ('down', 'up', 'right', 'left')
 MISS_SIGN_RADIUS = 4
+THUMBNAIL_TILE_SIZE = 8  # headless renderer tile size, grid line included
 
-TextSurfaceType = TypedDict('TextSurfaceType', {'surf': Surface,
-                                                'rect': Rect})
+TextSurfaceType = TypedDict('TextSurfaceType', {'surf': 'Surface',
+                                                'rect': 'Rect'})
 TileDataType = TypedDict('TileDataType', {'pixel_x': int,
                                           'pixel_y': int,
                                           'board_x': int,
@@ -118,16 +210,87 @@ AIDataType = TypedDict('AIDataType',
                         'hit_moves': list[tuple[int, int]],
                         'available_directions': list[str],
                         'ships_on_board_by_size': list[int]})
+RuleSet = NamedTuple('RuleSet', [('board_width', int),
+                                 ('board_height', int),
+                                 ('ship_sizes', tuple[int, ...]),
+                                 ('ship_counts', tuple[int, ...]),
+                                 ('ships_may_touch', bool)])
+DEFAULT_RULES = RuleSet(board_width=BOARD_WIDTH_IN_TILES,
+                        board_height=BOARD_HEIGHT_IN_TILES,
+                        ship_sizes=SHIP_SIZES,
+                        ship_counts=SHIP_COUNTS,
+                        ships_may_touch=SHIPS_MAY_TOUCH)
+HintType = TypedDict('HintType',
+                     {'shots': int,
+                      'hits': 'ndarray',
+                      'misses': 'ndarray',
+                      'misses_covered': 'ndarray',
+                      'hits_covered': 'ndarray',
+                      'halo_hits': 'ndarray',
+                      'levels': list[list[int]]})
 GameDataType = TypedDict('GameDataType',
                          {'game_is_over': bool,
+                          'ai_mode': str,
+                          'rules': RuleSet,
+                          'start_time': float,
                           'enemy_is_hidden': bool,
-                          'screen_message': TextSurfaceType,
+                          'hint_is_shown': bool,
+                          'screen_message': str,
                           'player_board': GameBoardType,
                           'enemy_board': GameBoardType,
                           'ai_data': AIDataType,
+                          'player_moves': list[tuple[int, int]],
                           'last_ai_move': Optional[tuple[int, int]],
+                          'pending_ai_move': Optional[Future],
+                          'ai_ponder': Optional[Future],
+                          'ai_move_requested_at': float,
+                          'hint': Optional[HintType],
+                          'pending_hint': Optional[Future],
                           'mouse_position_tile': Optional[tuple[int, int]]})
-
-DISPLAY_SURFACE = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
-pygame.font.init()  # needed to initialize font
-BASIC_FONT = pygame.font.Font(BASIC_FONT_NAME, BASIC_FONT_SIZE)
+SimulGameType = TypedDict('SimulGameType',
+                          {'player_board': GameBoardType,
+                           'enemy_board': GameBoardType,
+                           'ai_data': AIDataType,
+                           'winner': Optional[str],
+                           'player_shots': int,
+                           'ai_shots': int,
+                           'start_time': float})
+SimulLayoutType = TypedDict('SimulLayoutType',
+                            {'columns': int,
+                             'tile_size': int,
+                             'player_tile_size': int,
+                             'origin': tuple[int, int],
+                             'cell_size': tuple[int, int],
+                             'enemy_boards': list['Rect'],
+                             'player_boards': list['Rect']})
+SimulDataType = TypedDict('SimulDataType',
+                          {'games': list[SimulGameType],
+                           'ai_mode': str,
+                           'rules': RuleSet,
+                           'layout': SimulLayoutType,
+                           'enemy_is_hidden': bool,
+                           'screen_message': str,
+                           'mouse_position_tile': Optional[
+                               tuple[int, tuple[int, int]]]})
+GameResultType = TypedDict('GameResultType', {'winner': str,
+                                              'player_shots': int,
+                                              'ai_shots': int,
+                                              'duration': float,
+                                              'ai_mode': str,
+                                              'finished_at': float})
+TileLookType = tuple[tuple[int, int, int], bool, Optional[str], bool]
+RenderStateType = TypedDict('RenderStateType',
+                            {'surface': 'Surface',
+                             'full_redraw': bool,
+                             'background': Optional['Surface'],
+                             'layout_key': Optional[tuple],
+                             'tile_looks': dict[tuple[int, int],
+                                                TileLookType],
+                             'screen_message': Optional[TextSurfaceType],
+                             'thinking_indicator': Optional[TextSurfaceType]})
+SimulRenderStateType = TypedDict('SimulRenderStateType',
+                                 {'surface': 'Surface',
+                                  'full_redraw': bool,
+                                  'background': Optional['Surface'],
+                                  'board_keys': dict[tuple[int, str], tuple],
+                                  'screen_message': Optional[TextSurfaceType]})
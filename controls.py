@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+import sys
+from concurrent.futures import Future
+from typing import Optional
+
+import pygame
+from pygame import QUIT, KEYUP, K_ESCAPE, MOUSEBUTTONUP, MOUSEMOTION, NOEVENT
+from pygame.event import Event
+
+from constants import GameDataType, TextSurfaceType
+from game_engine import (set_up_new_game, highlight_tile_under_mouse,
+                         handle_board_click)
+
+
+# Kept out of constants, which must not need pygame
+AI_MOVE_EVENT = pygame.USEREVENT + 1  # posted when an AI move is ready
+HINT_EVENT = pygame.USEREVENT + 2  # posted when a hint is ready
+
+
+def quit_program() -> None:
+    """Finalizes the program execution."""
+    pygame.quit()
+    sys.exit()
+
+
+def handle_button_click(click_coords: tuple[int, int],
+                        buttons: dict[str, TextSurfaceType],
+                        game_data: GameDataType) -> GameDataType:
+    """
+    Does appropriate action if one of the menu buttons have been
+    pressed.
+
+    :param click_coords: Mouse click pixel coordinates in (x, y)
+    format.
+    :param buttons: A dictionary containing menu buttons
+    of TextSurfaceType.
+    :param game_data: A TypedDict of game state variables.
+    :return: An updated TypedDict of game state variables.
+    """
+    newgame_was_pressed = buttons['newgame']['rect'].collidepoint(click_coords)
+    reveal_was_pressed = buttons['reveal_enemy']['rect'].collidepoint(
+        click_coords)
+    quit_was_pressed = buttons['quit']['rect'].collidepoint(click_coords)
+    # The hint button is only shown in the single game window
+    hint_was_pressed = 'hint' in buttons and buttons['hint'][
+        'rect'].collidepoint(click_coords)
+
+    if newgame_was_pressed:
+        hint_is_shown = game_data['hint_is_shown']
+        game_data = set_up_new_game(game_data['ai_mode'],
+                                    game_data['rules'])
+        game_data['hint_is_shown'] = hint_is_shown
+
+    elif reveal_was_pressed:
+        enemy_is_hidden = game_data['enemy_is_hidden']
+        if enemy_is_hidden:
+            game_data['enemy_is_hidden'] = False
+        else:
+            game_data['enemy_is_hidden'] = True
+
+    elif hint_was_pressed:
+        game_data['hint_is_shown'] = not game_data['hint_is_shown']
+
+    elif quit_was_pressed:
+        quit_program()
+
+    return game_data
+
+
+def wait_for_events(timeout: int) -> list[Event]:
+    """
+    Sleeps until at least one event arrives or the timeout expires,
+    then returns all pending events.
+
+    :param timeout: Maximal waiting time in milliseconds.
+    :return: A list of pending events, empty if the timeout expired.
+    """
+    first_event = pygame.event.wait(timeout)
+
+    if first_event.type == NOEVENT:
+        return []
+    return [first_event] + pygame.event.get()
+
+
+def handle_events(game_data: GameDataType,
+                  buttons: dict[str, TextSurfaceType],
+                  events: list[Event]
+                  ) -> tuple[GameDataType, Optional[tuple[int, int]]]:
+    """
+    Handles events of the game: mouse movement and click, closing
+    the game window or pressing ESC button.
+
+    :param game_data: A TypedDict of game state variables.
+    :param buttons: A dictionary containing menu buttons
+    of TextSurfaceType.
+    :param events: A list of events to handle.
+    :return: A tuple of updated game data and board
+    coordinates of a player move in format (x, y).
+    """
+    player_move = None
+
+    for event in events:
+        window_was_closed = (event.type == QUIT)
+        esc_was_pressed = (event.type == KEYUP and event.key == K_ESCAPE)
+        mouse_was_moved = (event.type == MOUSEMOTION)
+        mouse_was_clicked = (event.type == MOUSEBUTTONUP)
+
+        if window_was_closed or esc_was_pressed:
+            quit_program()
+
+        elif mouse_was_moved:
+            game_data = highlight_tile_under_mouse(game_data, event.pos)
+
+        elif mouse_was_clicked:
+            enemy_board = game_data['enemy_board']
+            player_move = handle_board_click(event.pos, enemy_board)
+            game_data = handle_button_click(event.pos, buttons, game_data)
+            # A new game has no highlighted tile until the mouse moves
+            game_data = highlight_tile_under_mouse(game_data, event.pos)
+
+    return game_data, player_move
+
+
+def post_ai_move_event(_: Future) -> None:
+    """
+    Wakes up the main loop when an AI move computation finishes.
+
+    :param _: The finished AI move future.
+    :return: None.
+    """
+    pygame.event.post(Event(AI_MOVE_EVENT))
+
+
+def post_hint_event(_: Future) -> None:
+    """
+    Wakes up the main loop when a hint computation finishes.
+
+    :param _: The finished hint future.
+    :return: None.
+    """
+    pygame.event.post(Event(HINT_EVENT))
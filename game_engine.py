@@ -1,43 +1,55 @@
 # -*- coding: utf-8 -*-
-import sys
-from typing import Optional
+import time
+from concurrent.futures import Executor, Future
+from typing import Callable, Optional
 
-import pygame
-from pygame import QUIT, KEYUP, K_ESCAPE, MOUSEBUTTONUP
-
-from ai import set_up_ai, get_ai_move
+from ai import (set_up_ai, get_ai_move, choose_next_move, record_shot_result,
+                ship_was_hitted)
 from board_generator import get_random_board
 from constants import (
-    GameDataType, GameBoardType, TileDataType, TextSurfaceType,
-    PLAYER_BOARD_TOPLEFT, ENEMY_BOARD_TOPLEFT,
-    STARTGAME_TEXT, MESSAGE_TOPLEFT, ENDGAME_DEFEAT_TEXT, ENDGAME_WIN_TEXT,
-    BOARD_WIDTH_IN_PIXELS, BOARD_HEIGHT_IN_PIXELS, GRID_STEP)
-from graphics import make_text_surface
+    GameDataType, GameBoardType, TileDataType, AIDataType,
+    RuleSet, PLAYER_BOARD_TOPLEFT, ENEMY_BOARD_TOPLEFT, DEFAULT_AI_MODE,
+    DEFAULT_RULES, STARTGAME_TEXT, ENDGAME_DEFEAT_TEXT, ENDGAME_WIN_TEXT,
+    GRID_STEP)
+from metrics import inc_counter
+from profile_hooks import trace_memory
 
 
-def set_up_new_game() -> GameDataType:
+@trace_memory
+def set_up_new_game(ai_mode: str = DEFAULT_AI_MODE,
+                    rules: RuleSet = DEFAULT_RULES) -> GameDataType:
     """
     Creates a TypedDict of new game state variables: player and enemy
     boards, AI data, flags and other special variables.
 
+    :param ai_mode: An AI mode from AI_MODES the enemy plays with.
+    :param rules: A RuleSet of the game.
     :return: A TypedDict of game state variables.
     """
-    player_board = get_random_board(PLAYER_BOARD_TOPLEFT)
-    enemy_board = get_random_board(ENEMY_BOARD_TOPLEFT)
-    ai_data = set_up_ai()
-    screen_message = make_text_surface(text=STARTGAME_TEXT,
-                                       topleft=MESSAGE_TOPLEFT)
+    player_board = get_random_board(PLAYER_BOARD_TOPLEFT, rules=rules)
+    enemy_board = get_random_board(ENEMY_BOARD_TOPLEFT, rules=rules)
+    ai_data = set_up_ai(rules)
     enemy_is_hidden = True
     game_is_over = False
 
     game_data: GameDataType
     game_data = {'game_is_over': game_is_over,
+                 'ai_mode': ai_mode,
+                 'rules': rules,
+                 'start_time': time.monotonic(),
                  'enemy_is_hidden': enemy_is_hidden,
-                 'screen_message': screen_message,
+                 'hint_is_shown': False,
+                 'screen_message': STARTGAME_TEXT,
                  'player_board': player_board,
                  'enemy_board': enemy_board,
                  'ai_data': ai_data,
+                 'player_moves': [],
                  'last_ai_move': None,
+                 'pending_ai_move': None,
+                 'ai_ponder': None,
+                 'ai_move_requested_at': 0.0,
+                 'hint': None,
+                 'pending_hint': None,
                  'mouse_position_tile': None}
     return game_data
 
@@ -98,10 +110,12 @@ def get_tile_at_pixel(pixel_coords: tuple[int, int],
     pixel_x, pixel_y = pixel_coords
     x_margin = board['topleft']['pixel_x']
     y_margin = board['topleft']['pixel_y']
+    board_width_in_pixels = len(board['tiles']) * GRID_STEP
+    board_height_in_pixels = len(board['tiles'][0]) * GRID_STEP
 
     mouse_is_on_board = (
-            x_margin < pixel_x < x_margin + BOARD_WIDTH_IN_PIXELS
-            and y_margin < pixel_y < y_margin + BOARD_HEIGHT_IN_PIXELS)
+            x_margin < pixel_x < x_margin + board_width_in_pixels
+            and y_margin < pixel_y < y_margin + board_height_in_pixels)
 
     if mouse_is_on_board:
         board_x = (pixel_x - x_margin) // GRID_STEP
@@ -111,30 +125,22 @@ def get_tile_at_pixel(pixel_coords: tuple[int, int],
         return None
 
 
-def get_mouse_position(board: GameBoardType) -> Optional[tuple[int, int]]:
-    """
-    Returns tile coordinates at mouse position on the fiven board.
-
-    :param board: A game board to search the tile.
-    :return: A tuple of tile coordinates in (x, y) format.
+def highlight_tile_under_mouse(game_data: GameDataType,
+                               mouse_coords: tuple[int, int]
+                               ) -> GameDataType:
     """
-    mouse_coords = pygame.mouse.get_pos()
-    current_tile = get_tile_at_pixel(mouse_coords, board)
-    return current_tile
-
-
-def highlight_tile_under_mouse(game_data: GameDataType) -> GameDataType:
-    """
-    Highlights tile at the current position of the mouse cursor,
+    Highlights tile at the given position of the mouse cursor,
     if cursor is over enemy board.
 
     :param game_data: A TypedDict of game state variables.
+    :param mouse_coords: Mouse cursor pixel coordinates in (x, y)
+    format.
     :return: A TypedDict of game state variables.
     """
     last_tile = game_data['mouse_position_tile']
     enemy_board = game_data['enemy_board']
 
-    current_tile = get_mouse_position(enemy_board)
+    current_tile = get_tile_at_pixel(mouse_coords, enemy_board)
     enemy_board = update_highlighted_tile(current_tile, last_tile, enemy_board)
 
     game_data['mouse_position_tile'] = current_tile
@@ -164,80 +170,6 @@ def handle_board_click(click_coords: tuple[int, int],
     return None
 
 
-def quit_program() -> None:
-    """Finalizes the program execution."""
-    pygame.quit()
-    sys.exit()
-
-
-def handle_button_click(click_coords: tuple[int, int],
-                        buttons: dict[str, TextSurfaceType],
-                        game_data: GameDataType) -> GameDataType:
-    """
-    Does appropriate action if one of the menu buttons have been
-    pressed.
-
-    :param click_coords: Mouse click pixel coordinates in (x, y)
-    format.
-    :param buttons: A dictionary containing menu buttons
-    of TextSurfaceType.
-    :param game_data: A TypedDict of game state variables.
-    :return: An updated TypedDict of game state variables.
-    """
-    newgame_was_pressed = buttons['newgame']['rect'].collidepoint(click_coords)
-    reveal_was_pressed = buttons['reveal_enemy']['rect'].collidepoint(
-        click_coords)
-    quit_was_pressed = buttons['quit']['rect'].collidepoint(click_coords)
-
-    if newgame_was_pressed:
-        game_data = set_up_new_game()
-
-    elif reveal_was_pressed:
-        enemy_is_hidden = game_data['enemy_is_hidden']
-        if enemy_is_hidden:
-            game_data['enemy_is_hidden'] = False
-        else:
-            game_data['enemy_is_hidden'] = True
-
-    elif quit_was_pressed:
-        quit_program()
-
-    return game_data
-
-
-def handle_events(game_data: GameDataType,
-                  buttons: dict[str, TextSurfaceType]
-                  ) -> tuple[GameDataType, Optional[tuple[int, int]]]:
-    """
-    Handles events of the game: mouse movement and click, closing
-    the game window or pressing ESC button.
-
-    :param game_data: A TypedDict of game state variables.
-    :param buttons: A dictionary containing menu buttons
-    of TextSurfaceType.
-    :return: A tuple of updated game data and board
-    coordinates of a player move in format (x, y).
-    """
-    player_move = None
-    enemy_board = game_data['enemy_board']
-
-    game_data = highlight_tile_under_mouse(game_data)
-
-    for event in pygame.event.get():
-        window_was_closed = (event.type == QUIT)
-        esc_was_pressed = (event.type == KEYUP and event.key == K_ESCAPE)
-        mouse_was_clicked = (event.type == MOUSEBUTTONUP)
-
-        if window_was_closed or esc_was_pressed:
-            quit_program()
-
-        elif mouse_was_clicked:
-            player_move = handle_board_click(event.pos, enemy_board)
-            game_data = handle_button_click(event.pos, buttons, game_data)
-
-    return game_data, player_move
-
-
 def mark_shot_result(tile_coords: tuple[int, int],
                      board: GameBoardType) -> GameBoardType:
     """
@@ -290,37 +222,167 @@ def handle_player_move(player_move_coords: tuple[int, int],
     game_data['enemy_board'] = mark_shot_result(
         tile_coords=player_move_coords,
         board=board)
+    game_data['player_moves'].append(player_move_coords)
+    hit_result = get_reference_to_tile(player_move_coords,
+                                       board)['hit_result']
+    inc_counter('navalbattle_shots_total',
+                (('shooter', 'player'), ('result', str(hit_result))))
 
     if victory_achieved(board):
         game_data['game_is_over'] = True
-        game_data['screen_message'] = make_text_surface(
-            text=ENDGAME_WIN_TEXT,
-            topleft=MESSAGE_TOPLEFT)
+        game_data['screen_message'] = ENDGAME_WIN_TEXT
+        inc_counter('navalbattle_games_total', (('winner', 'player'),))
     return game_data
 
 
-def make_ai_move(game_data: GameDataType) -> GameDataType:
+def apply_ai_move(move: tuple[int, int],
+                  game_data: GameDataType) -> GameDataType:
     """
-    Updates the player board by marking the result of AI move.
-    If the AI has won, ends the game.
+    Updates the player board by marking the result of the given AI
+    move. If the AI has won, ends the game.
 
+    :param move: Coordinates of the AI shot in (x, y) format.
     :param game_data: A TypedDict of game state variables.
     :return: A TypedDict of game state variables with updated player
-    board and AI data.
+    board.
     """
     board = game_data['player_board']
-    ai_data = game_data['ai_data']
     last_move = game_data['last_ai_move']
 
-    move, ai_data = get_ai_move(ai_data, board)
     board = mark_shot_result(move, board)
     board = update_highlighted_tile(move, last_move, board)
 
     game_data['last_ai_move'] = move
+    hit_result = get_reference_to_tile(move, board)['hit_result']
+    inc_counter('navalbattle_shots_total',
+                (('shooter', 'ai'), ('result', str(hit_result))))
 
     if victory_achieved(board):
-        game_data['screen_message'] = make_text_surface(
-            text=ENDGAME_DEFEAT_TEXT,
-            topleft=MESSAGE_TOPLEFT)
+        game_data['screen_message'] = ENDGAME_DEFEAT_TEXT
         game_data['game_is_over'] = True
+        inc_counter('navalbattle_games_total', (('winner', 'ai'),))
+    return game_data
+
+
+def make_ai_move(game_data: GameDataType) -> GameDataType:
+    """
+    Updates the player board by marking the result of AI move.
+    If the AI has won, ends the game.
+
+    :param game_data: A TypedDict of game state variables.
+    :return: A TypedDict of game state variables with updated player
+    board and AI data.
+    """
+    move, game_data['ai_data'] = get_ai_move(game_data['ai_data'],
+                                             game_data['player_board'],
+                                             game_data['ai_mode'],
+                                             rules=game_data['rules'])
+    return apply_ai_move(move, game_data)
+
+
+def ponder_ai_move(game_data: GameDataType,
+                   executor: Executor) -> GameDataType:
+    """
+    Starts choosing the next AI move in the background while
+    the player is thinking, if it is not chosen or being chosen yet.
+
+    The choice depends only on the AI own knowledge, which does not
+    change until the AI shot is resolved, so it stays valid for
+    the whole player turn.
+
+    :param game_data: A TypedDict of game state variables.
+    :param executor: An executor to run the AI computation.
+    :return: A TypedDict of game state variables with the AI
+    pondering.
+    """
+    ai_is_busy = (game_data['ai_ponder'] is not None
+                  or game_data['pending_ai_move'] is not None)
+
+    if not (ai_is_busy or game_data['game_is_over']):
+        game_data['ai_ponder'] = executor.submit(choose_next_move,
+                                                 game_data['ai_data'],
+                                                 game_data['ai_mode'],
+                                                 rules=game_data['rules'])
+    return game_data
+
+
+def resolve_pondered_move(ai_ponder: Future,
+                          board: GameBoardType
+                          ) -> tuple[tuple[int, int], AIDataType]:
+    """
+    Returns the pondered AI move and the AI data updated with
+    the shot result on the given board.
+
+    :param ai_ponder: A future of the pondered (move, AI data) pair.
+    :param board: The game board the AI shoots at.
+    :return: Shot coordinates in (x,y) format and updated AI data.
+    """
+    move, ai_data = ai_ponder.result()
+    ai_data = record_shot_result(move, ship_was_hitted(move, board), ai_data)
+    return move, ai_data
+
+
+def submit_ai_move(game_data: GameDataType,
+                   executor: Executor,
+                   done_callback: Optional[Callable[[Future], None]] = None
+                   ) -> GameDataType:
+    """
+    Starts computing the AI move in the background, answering from
+    the pondered choice if there is one. The AI data belongs
+    to the worker until the move is received.
+
+    :param game_data: A TypedDict of game state variables.
+    :param executor: An executor to run the AI computation.
+    :param done_callback: A function to call with the move future
+    when the move is ready, if any.
+    :return: A TypedDict of game state variables with a pending
+    AI move.
+    """
+    ai_ponder = game_data['ai_ponder']
+
+    if ai_ponder is not None:
+        # The executor has a single worker, so the ponder is done first
+        ai_move_future = executor.submit(resolve_pondered_move, ai_ponder,
+                                         game_data['player_board'])
+        game_data['ai_ponder'] = None
+    else:
+        ai_move_future = executor.submit(get_ai_move, game_data['ai_data'],
+                                         game_data['player_board'],
+                                         game_data['ai_mode'],
+                                         rules=game_data['rules'])
+    if done_callback is not None:
+        ai_move_future.add_done_callback(done_callback)
+
+    game_data['pending_ai_move'] = ai_move_future
+    game_data['ai_move_requested_at'] = time.monotonic()
+    return game_data
+
+
+def player_can_move(game_data: GameDataType) -> bool:
+    """
+    Tells whether a player shot may be made now. Clicks made while
+    the AI is thinking are ignored.
+
+    :param game_data: A TypedDict of game state variables.
+    :return: True if the game goes on and no AI move is pending.
+    """
+    return not (game_data['game_is_over']
+                or game_data['pending_ai_move'] is not None)
+
+
+def receive_ai_move(game_data: GameDataType) -> GameDataType:
+    """
+    Applies the pending AI move if its computation has finished.
+
+    :param game_data: A TypedDict of game state variables.
+    :return: A TypedDict of game state variables, with updated player
+    board and AI data if the AI move was ready.
+    """
+    ai_move_future = game_data['pending_ai_move']
+
+    if ai_move_future is not None and ai_move_future.done():
+        move, game_data['ai_data'] = ai_move_future.result()
+        game_data['pending_ai_move'] = None
+        game_data = apply_ai_move(move, game_data)
     return game_data
+
@@ -1,24 +1,83 @@
 # -*- coding: utf-8 -*-
+import time
+from functools import lru_cache
+from typing import Optional
+
 import pygame
 from pygame.font import Font
+from pygame.rect import Rect
+from pygame.surface import Surface
 
 from constants import (
     TextSurfaceType, TileDataType, GameBoardType, GameDataType,
-    DISPLAY_SURFACE, BASIC_FONT, TEXT_COLOR, BG_COLOR, WHITE, BLACK,
-    GRAY, LIGHT_GRAY, DARK_COLORS, LIGHT_COLORS,
+    TileLookType, RenderStateType, TEXT_CACHE_SIZE,
+    BASIC_FONT_NAME, BASIC_FONT_SIZE, TEXT_COLOR, BG_COLOR, WHITE, BLACK,
+    GRAY, LIGHT_GRAY, DARK_COLORS, LIGHT_COLORS, HINT_COLORS,
+    HINT_LIGHT_COLORS,
     TILE_SIZE, GRID_STEP, GRID_WIDTH, MISS_SIGN_RADIUS,
-    BOARD_WIDTH_IN_PIXELS, BOARD_HEIGHT_IN_PIXELS,
-    BOARD_WIDTH_IN_TILES, BOARD_HEIGHT_IN_TILES,
     NEWGAME_BUTTON_TEXT, NEWGAME_BUTTON_TOPLEFT, BUTTON_COLOR,
     REVEAL_BUTTON_TEXT, REVEAL_BUTTON_TOPLEFT,
+    HINT_BUTTON_TEXT, HINT_BUTTON_TOPLEFT,
     QUIT_BUTTON_TEXT, QUIT_BUTTON_TOPLEFT,
     PLAYER_BOARD_TITLE_TEXT, PLAYER_BOARD_TITLE_TOPLEFT,
-    AI_BOARD_TITLE_TEXT, AI_BOARD_TITLE_TOPLEFT)
+    AI_BOARD_TITLE_TEXT, AI_BOARD_TITLE_TOPLEFT,
+    AI_THINKING_TEXT, AI_THINKING_TOPLEFT, AI_THINKING_INDICATOR_DELAY,
+    MESSAGE_TOPLEFT)
+from profile_hooks import trace_memory
+
+
+LIGHTER_SHADES = dict(zip(DARK_COLORS + HINT_COLORS,
+                          LIGHT_COLORS + HINT_LIGHT_COLORS))
+# Pre-rendered tiles by look: (color, is_lighted, hit_result, is_hidden)
+TILE_SPRITES: dict[TileLookType, Surface] = {}
+
+
+@lru_cache()
+def get_basic_font() -> Font:
+    """
+    Returns the font of all game texts, loading it on the first call.
+
+    :return: The Font object from "pygame.font" module of Pygame
+    package.
+    """
+    pygame.font.init()  # needed to initialize font
+    return Font(BASIC_FONT_NAME, BASIC_FONT_SIZE)
+
+
+@lru_cache(maxsize=TEXT_CACHE_SIZE)
+def render_text(text: str,
+                font: Font,
+                text_color: tuple[int, int, int],
+                bgcolor: tuple[int, int, int]) -> Surface:
+    """
+    Renders the given text, reusing the surface rendered earlier
+    for the same arguments.
+
+    :param text: A text to render.
+    :param font: The Font object from "pygame.font" module
+    of Pygame package.
+    :param text_color: A text color in (R, G, B) format.
+    :param bgcolor: A background color in (R, G, B) format.
+    :return: A shared text surface, must not be modified.
+    """
+    return font.render(text, True, text_color, bgcolor)
+
+
+def get_text_cache_info() -> dict[str, int]:
+    """
+    Returns usage statistics of the rendered text cache.
+
+    :return: A dictionary of cache hits, misses and current size.
+    """
+    cache_info = render_text.cache_info()
+    return {'hits': cache_info.hits,
+            'misses': cache_info.misses,
+            'size': cache_info.currsize}
 
 
 def make_text_surface(text: str,
                       topleft: tuple[int, int],
-                      font: Font = BASIC_FONT,
+                      font: Optional[Font] = None,
                       text_color: tuple[int, int, int] = TEXT_COLOR,
                       bgcolor: tuple[int, int, int] = BG_COLOR
                       ) -> TextSurfaceType:
@@ -27,7 +86,7 @@ def make_text_surface(text: str,
 
     :param text: A text to draw on the surface.
     :param font: The Font object from "pygame.font" module
-    of Pygame package.
+    of Pygame package, the basic font if None.
     :param text_color: A text color in (R, G, B) format.
     :param bgcolor: A background color of the surface
     in (R, G, B) format.
@@ -36,7 +95,9 @@ def make_text_surface(text: str,
     :return: A TypeDict of surface and rectangular objects
     from Pygame in {'surf': Surface, 'rect': Rect} format.
     """
-    text_surf = font.render(text, True, text_color, bgcolor)
+    text_surf = render_text(text, font or get_basic_font(), text_color,
+                            bgcolor)
+    # Surfaces are shared between callers, rects are not
     border_rect = text_surf.get_rect()
     border_rect.topleft = topleft
 
@@ -44,11 +105,13 @@ def make_text_surface(text: str,
     return text_surface
 
 
-def make_menu_buttons() -> dict[str, TextSurfaceType]:
+def make_menu_buttons(hint_button: bool = False
+                      ) -> dict[str, TextSurfaceType]:
     """
     Creates a dictionary containing 'New game', 'Show enemy',
     and 'Quit' buttons.
 
+    :param hint_button: 'True' to add the 'Hint' button as well.
     :return: A dictionary containing buttons of TextSurfaceType.
     """
     newgame_button = make_text_surface(text=NEWGAME_BUTTON_TEXT,
@@ -63,6 +126,10 @@ def make_menu_buttons() -> dict[str, TextSurfaceType]:
     buttons = {'newgame': newgame_button,
                'reveal_enemy': reveal_enemy_button,
                'quit': quit_button}
+    if hint_button:
+        buttons['hint'] = make_text_surface(text=HINT_BUTTON_TEXT,
+                                            topleft=HINT_BUTTON_TOPLEFT,
+                                            bgcolor=BUTTON_COLOR)
     return buttons
 
 
@@ -103,68 +170,64 @@ def get_tile_color(tile: TileDataType,
     return color
 
 
-def draw_miss_sign(tile: TileDataType,
+def draw_miss_sign(sprite: Surface,
                    hit_color: tuple[int, int, int]) -> None:
     """
-    Draws miss sign (dot) inside the given tile.
+    Draws miss sign (dot) inside the given tile sprite.
 
-    :param tile: A tile of TileDataType to draw the sign.
+    :param sprite: A tile sprite surface to draw the sign.
     :param hit_color: The sign color in (R, G, B) format.
     :return: None.
     """
-    center_point = (tile['pixel_x'] + TILE_SIZE / 2,
-                    tile['pixel_y'] + TILE_SIZE / 2)
-    pygame.draw.circle(surface=DISPLAY_SURFACE,
+    center_point = (TILE_SIZE / 2, TILE_SIZE / 2)
+    pygame.draw.circle(surface=sprite,
                        color=hit_color,
                        center=center_point,
                        radius=MISS_SIGN_RADIUS)
 
 
-def draw_hit_sign(tile: TileDataType,
+def draw_hit_sign(sprite: Surface,
                   hit_color: tuple[int, int, int]) -> None:
     """
-    Draws the hit sign (cross) inside the given tile.
+    Draws the hit sign (cross) inside the given tile sprite.
 
-    :param tile: A tile of TileDataType to draw the sign.
+    :param sprite: A tile sprite surface to draw the sign.
     :param hit_color: The sign color in (R, G, B) format.
     :return: None.
     """
-    upper_left = (tile['pixel_x'], tile['pixel_y'])
-    lower_right = (tile['pixel_x'] + TILE_SIZE, tile['pixel_y'] + TILE_SIZE)
-    pygame.draw.line(surface=DISPLAY_SURFACE,
+    pygame.draw.line(surface=sprite,
                      color=hit_color,
-                     start_pos=upper_left,
-                     end_pos=lower_right,
+                     start_pos=(0, 0),
+                     end_pos=(TILE_SIZE, TILE_SIZE),
                      width=GRID_WIDTH)
-
-    upper_right = (tile['pixel_x'] + TILE_SIZE, tile['pixel_y'])
-    lower_left = (tile['pixel_x'], tile['pixel_y'] + TILE_SIZE)
-    pygame.draw.line(surface=DISPLAY_SURFACE,
+    pygame.draw.line(surface=sprite,
                      color=hit_color,
-                     start_pos=upper_right,
-                     end_pos=lower_left,
+                     start_pos=(TILE_SIZE, 0),
+                     end_pos=(0, TILE_SIZE),
                      width=GRID_WIDTH)
 
 
-def draw_hit_result(tile: TileDataType,
+def draw_hit_result(sprite: Surface,
+                    hit_result: str,
                     is_hidden: bool) -> None:
     """
-    Draws hit result in a tile: damage (cross) or miss (dot).
+    Draws hit result in a tile sprite: damage (cross) or miss (dot).
 
-    :param tile: A tile of TileDataType to draw hit result.
+    :param sprite: A tile sprite surface to draw hit result.
+    :param hit_result: The result of the shot, 'miss' or 'damage'.
     :param is_hidden: 'True' if the tile belongs to the enemy
     and needs to be hidden.
     :return: None.
     """
     hit_color = WHITE
 
-    if tile['hit_result'] == 'miss':
-        draw_miss_sign(tile, hit_color)
+    if hit_result == 'miss':
+        draw_miss_sign(sprite, hit_color)
 
-    elif tile['hit_result'] == 'damage':
+    elif hit_result == 'damage':
         if not is_hidden:
             hit_color = BLACK
-        draw_hit_sign(tile, hit_color)
+        draw_hit_sign(sprite, hit_color)
 
 
 def get_lighter_shade(color: tuple[int, int, int]) -> tuple[int, int, int]:
@@ -174,92 +237,125 @@ def get_lighter_shade(color: tuple[int, int, int]) -> tuple[int, int, int]:
     :param color: The dark shade in (R, G, B) format.
     :return: The light shade in (R, G, B) format.
     """
-    color_index = DARK_COLORS.index(color)
-    color = LIGHT_COLORS[color_index]
-    return color
+    return LIGHTER_SHADES[color]
 
 
-def draw_tile_background(tile: TileDataType,
-                         color: tuple[int, int, int]) -> None:
+def get_tile_look(tile: TileDataType,
+                  is_hidden: bool) -> TileLookType:
     """
-    Draws tile background filled with the given color.
+    Returns everything that defines how the given tile looks on screen.
 
-    :param tile: A tile of TileDataType to draw background.
-    :param color: The tile background color in (R, G, B) format.
-    :return: None.
+    :param tile: A tile of TileDataType.
+    :param is_hidden: 'True' if the tile belongs to the enemy
+    and needs to be hidden.
+    :return: A tuple of (color, is_lighted, hit_result, is_hidden).
     """
-    tile_rect = (tile['pixel_x'], tile['pixel_y'], TILE_SIZE, TILE_SIZE)
-    pygame.draw.rect(surface=DISPLAY_SURFACE,
-                     color=color,
-                     rect=tile_rect)
+    return (get_tile_color(tile, is_hidden), tile['is_lighted'],
+            tile['hit_result'], is_hidden)
 
 
-def draw_tile(tile: TileDataType,
-              is_hidden: bool = False,
-              need_highlight: bool = False) -> None:
+def make_tile_sprite(tile_look: TileLookType) -> Surface:
     """
-    Draws a tile of the given game board on the display surface.
+    Renders a tile of the given look onto a new tile-sized surface.
 
-    :param tile: A tile to draw.
-    :param is_hidden: True if the board belongs to enemy and
-    needs to be hidden.
-    :param need_highlight: True, if the tile needs to be lighted.
-    :return: None.
+    :param tile_look: A tuple of (color, is_lighted, hit_result,
+    is_hidden).
+    :return: A tile sprite surface.
     """
-    color = get_tile_color(tile, is_hidden)
+    color, is_lighted, hit_result, is_hidden = tile_look
 
-    if tile['is_lighted'] or need_highlight:
+    if is_lighted:
         color = get_lighter_shade(color)
 
-    draw_tile_background(tile, color)
+    sprite = make_surface((TILE_SIZE, TILE_SIZE))
+    sprite.fill(color)
+
+    if hit_result is not None:
+        draw_hit_result(sprite, hit_result, is_hidden)
+    return sprite
+
+
+def make_surface(size: tuple[int, int]) -> Surface:
+    """
+    Creates a new surface, in the display pixel format if the display
+    is open, so that blitting it there needs no conversion.
+
+    :param size: The surface size in (width, height) format.
+    :return: A new surface.
+    """
+    surface = Surface(size)
 
-    if tile['hit_result'] is not None:
-        draw_hit_result(tile, is_hidden)
+    if pygame.display.get_surface() is not None:
+        surface = surface.convert()
+    return surface
 
 
-def draw_border(board: GameBoardType) -> None:
+def get_tile_sprite(tile_look: TileLookType) -> Surface:
     """
-    Draws border lines of the given board on the display surface.
+    Returns a pre-rendered sprite of the given tile look, rendering
+    it on the first request.
+
+    :param tile_look: A tuple of (color, is_lighted, hit_result,
+    is_hidden).
+    :return: A shared tile sprite surface, must not be modified.
+    """
+    sprite = TILE_SPRITES.get(tile_look)
+
+    if sprite is None:
+        sprite = make_tile_sprite(tile_look)
+        TILE_SPRITES[tile_look] = sprite
+    return sprite
+
+
+def draw_border(board: GameBoardType,
+                surface: Surface) -> None:
+    """
+    Draws border lines of the given board on the given surface.
 
     :param board: A board of GameBoardType(TypedDict) to draw borders.
+    :param surface: A surface to draw on.
     :return: None.
     """
     topleft_x = board['topleft']['pixel_x']
     topleft_y = board['topleft']['pixel_y']
-    length_x = BOARD_WIDTH_IN_PIXELS + GRID_WIDTH
-    length_y = BOARD_HEIGHT_IN_PIXELS + GRID_WIDTH
+    length_x = len(board['tiles']) * GRID_STEP + GRID_WIDTH
+    length_y = len(board['tiles'][0]) * GRID_STEP + GRID_WIDTH
 
     border_rect = (topleft_x, topleft_y, length_x, length_y)
-    pygame.draw.rect(surface=DISPLAY_SURFACE,
+    pygame.draw.rect(surface=surface,
                      color=LIGHT_GRAY,
                      rect=border_rect,
                      width=GRID_WIDTH)
 
 
-def draw_grid(board: GameBoardType) -> None:
+def draw_grid(board: GameBoardType,
+              surface: Surface) -> None:
     """
-    Draws grid lines of the given board on the display surface.
+    Draws grid lines of the given board on the given surface.
 
     :param board: A board of GameBoardType(TypedDict) to draw grid.
+    :param surface: A surface to draw on.
     :return: None.
     """
     topleft_x = board['topleft']['pixel_x']
     topleft_y = board['topleft']['pixel_y']
-    topright_x = topleft_x + BOARD_WIDTH_IN_PIXELS
-    downleft_y = topleft_y + BOARD_HEIGHT_IN_PIXELS
+    board_width = len(board['tiles'])
+    board_height = len(board['tiles'][0])
+    topright_x = topleft_x + board_width * GRID_STEP
+    downleft_y = topleft_y + board_height * GRID_STEP
 
     # Draw vertical grid lines
-    for board_x in range(BOARD_WIDTH_IN_TILES):
+    for board_x in range(board_width):
         x = topleft_x + GRID_STEP * board_x
-        pygame.draw.line(surface=DISPLAY_SURFACE,
+        pygame.draw.line(surface=surface,
                          color=LIGHT_GRAY,
                          start_pos=(x, topleft_y),
                          end_pos=(x, downleft_y),
                          width=GRID_WIDTH)
     # Draw horizontal grid lines
-    for board_y in range(BOARD_HEIGHT_IN_TILES):
+    for board_y in range(board_height):
         y = topleft_y + GRID_STEP * board_y
-        pygame.draw.line(surface=DISPLAY_SURFACE,
+        pygame.draw.line(surface=surface,
                          color=LIGHT_GRAY,
                          start_pos=(topleft_x, y),
                          end_pos=(topright_x, y),
@@ -267,51 +363,336 @@ def draw_grid(board: GameBoardType) -> None:
 
 
 def draw_board(board: GameBoardType,
+               surface: Surface,
                is_hidden: bool = False) -> None:
     """
-    Draws the given game board on the display surface.
+    Draws the given game board on the given surface.
 
     :param board: A game board of GameBoardType(TypedDict).
+    :param surface: A surface to draw on.
     :param is_hidden: 'True' if the board belongs to the enemy
     and needs to be hidden.
     :return: None.
     """
-    draw_border(board)
-    draw_grid(board)
+    draw_border(board, surface)
+    draw_grid(board, surface)
 
-    for board_x in range(BOARD_WIDTH_IN_TILES):
-        for board_y in range(BOARD_HEIGHT_IN_TILES):
-            tile = board['tiles'][board_x][board_y]
-            draw_tile(tile, is_hidden)
+    surface.blits(
+        [(get_tile_sprite(get_tile_look(tile, is_hidden)),
+          (tile['pixel_x'], tile['pixel_y']))
+         for column in board['tiles'] for tile in column],
+        doreturn=False)
 
 
-def draw_game_screen(game_data: GameDataType,
-                     titles: dict[str, TextSurfaceType],
-                     buttons: dict[str, TextSurfaceType]) -> None:
+def draw_changed_tiles(board: GameBoardType,
+                       render_state: RenderStateType,
+                       is_hidden: bool = False,
+                       hint_levels: Optional[list[list[int]]] = None
+                       ) -> list[Rect]:
+    """
+    Draws tiles of the given board whose look has changed since they
+    were drawn last time.
+
+    :param board: A game board of GameBoardType(TypedDict).
+    :param render_state: A TypedDict of what is currently on screen.
+    :param is_hidden: 'True' if the board belongs to the enemy
+    and needs to be hidden.
+    :param hint_levels: Ship probability levels of the tiles by [x][y]
+    to shade the tiles that were not shot with, if any.
+    :return: A list of screen areas that have been redrawn.
+    """
+    tile_looks = render_state['tile_looks']
+    tile_blits = []
+    changed_rects = []
+
+    for board_x, column in enumerate(board['tiles']):
+        # Looked up once per column, most frames have no hint to shade
+        column_levels = None if hint_levels is None else hint_levels[board_x]
+
+        for board_y, tile in enumerate(column):
+            tile_look = get_tile_look(tile, is_hidden)
+            if column_levels is not None and tile['hit_result'] is None:
+                hint_color = HINT_COLORS[column_levels[board_y]]
+                tile_look = (hint_color, *tile_look[1:])
+            # Tile pixel position is unique across both boards
+            tile_key = (tile['pixel_x'], tile['pixel_y'])
+
+            if tile_looks.get(tile_key) != tile_look:
+                tile_looks[tile_key] = tile_look
+                tile_blits.append((get_tile_sprite(tile_look), tile_key))
+                changed_rects.append(Rect(tile_key, (TILE_SIZE, TILE_SIZE)))
+
+    render_state['surface'].blits(tile_blits, doreturn=False)
+    return changed_rects
+
+
+def erase_area(rect: Rect,
+               render_state: RenderStateType) -> None:
+    """
+    Covers the given screen area with the background layer.
+
+    :param rect: A screen area to erase.
+    :param render_state: A TypedDict of what is currently on screen.
+    :return: None.
+    :raise RuntimeError: If the background has not been drawn yet.
+    """
+    if render_state['background'] is None:
+        raise RuntimeError("Rendering error. An area can not be erased "
+                           "before the background is drawn.")
+    render_state['surface'].blit(render_state['background'], rect, rect)
+
+
+def draw_screen_message(text: str,
+                        render_state: RenderStateType) -> list[Rect]:
+    """
+    Replaces the message on screen if the given one differs from it.
+
+    :param text: A message text to show.
+    :param render_state: A TypedDict of what is currently on screen.
+    :return: A list of screen areas that have been redrawn.
+    """
+    last_message = render_state['screen_message']
+    # Rendered texts are cached, so the same text has the same surface
+    screen_message = make_text_surface(text=text, topleft=MESSAGE_TOPLEFT)
+    changed_rects = []
+
+    if last_message is None or screen_message['surf'] is not (
+            last_message['surf']):
+        if last_message is not None:
+            erase_area(last_message['rect'], render_state)
+            changed_rects.append(last_message['rect'])
+
+        render_state['surface'].blit(screen_message['surf'],
+                                     screen_message['rect'])
+        changed_rects.append(screen_message['rect'])
+        render_state['screen_message'] = screen_message
+    return changed_rects
+
+
+def ai_is_thinking(game_data: GameDataType) -> bool:
+    """
+    Checks if the AI has been computing its move long enough
+    for the player to notice.
+
+    :param game_data: A TypedDict of game state variables.
+    :return: True if the "thinking" indicator should be shown.
+    """
+    if game_data['pending_ai_move'] is None:
+        return False
+
+    thinking_time = time.monotonic() - game_data['ai_move_requested_at']
+    return thinking_time * 1000 >= AI_THINKING_INDICATOR_DELAY
+
+
+def draw_thinking_indicator(is_thinking: bool,
+                            render_state: RenderStateType) -> list[Rect]:
+    """
+    Shows or hides the "AI is thinking" indicator.
+
+    :param is_thinking: True if the indicator needs to be shown.
+    :param render_state: A TypedDict of what is currently on screen.
+    :return: A list of screen areas that have been redrawn.
+    """
+    indicator = render_state['thinking_indicator']
+
+    if is_thinking and indicator is None:
+        indicator = make_text_surface(text=AI_THINKING_TEXT,
+                                      topleft=AI_THINKING_TOPLEFT)
+        render_state['surface'].blit(indicator['surf'], indicator['rect'])
+        render_state['thinking_indicator'] = indicator
+        return [indicator['rect']]
+
+    elif not is_thinking and indicator is not None:
+        erase_area(indicator['rect'], render_state)
+        render_state['thinking_indicator'] = None
+        return [indicator['rect']]
+    return []
+
+
+def get_layout_key(game_data: GameDataType,
+                   titles: dict[str, TextSurfaceType],
+                   buttons: dict[str, TextSurfaceType]) -> tuple:
     """
-    Draws the game on the display surface.
+    Returns a key that changes whenever the static screen layout does.
 
     :param game_data: A TypedDict of game state variables.
     :param titles: A dictionary containing player and enemy boards
     titles of TextSurfaceType.
     :param buttons: A dictionary containing menu buttons
     of TextSurfaceType.
-    :return: None.
+    :return: A hashable layout key.
     """
-    screen_message = game_data['screen_message']
-    player_board = game_data['player_board']
-    enemy_board = game_data['enemy_board']
-    enemy_is_hidden = game_data['enemy_is_hidden']
+    boards_key = tuple(
+        (board['topleft']['pixel_x'], board['topleft']['pixel_y'],
+         len(board['tiles']), len(board['tiles'][0]))
+        for board in (game_data['player_board'], game_data['enemy_board']))
+    texts_key = tuple((id(text['surf']), tuple(text['rect']))
+                      for text in (*titles.values(), *buttons.values()))
+    return boards_key + texts_key
+
+
+def make_background(game_data: GameDataType,
+                    titles: dict[str, TextSurfaceType],
+                    buttons: dict[str, TextSurfaceType],
+                    surface_size: tuple[int, int]) -> Surface:
+    """
+    Composes the parts of the screen that do not change during
+    the game into a single offscreen surface: titles, board frames
+    and buttons.
 
-    DISPLAY_SURFACE.fill(BG_COLOR)
-    DISPLAY_SURFACE.blit(screen_message['surf'], screen_message['rect'])
+    :param game_data: A TypedDict of game state variables.
+    :param titles: A dictionary containing player and enemy boards
+    titles of TextSurfaceType.
+    :param buttons: A dictionary containing menu buttons
+    of TextSurfaceType.
+    :param surface_size: The size of the screen surface
+    in (width, height) format.
+    :return: A background surface of the given size.
+    """
+    background = make_surface(surface_size)
+    background.fill(BG_COLOR)
 
     for _, title in titles.items():
-        DISPLAY_SURFACE.blit(title['surf'], title['rect'])
-    draw_board(player_board)
-    draw_board(enemy_board, is_hidden=enemy_is_hidden)
-
+        background.blit(title['surf'], title['rect'])
+    for board in (game_data['player_board'], game_data['enemy_board']):
+        draw_border(board, background)
+        draw_grid(board, background)
     for _, button in buttons.items():
-        DISPLAY_SURFACE.blit(button['surf'], button['rect'])
+        background.blit(button['surf'], button['rect'])
+    return background
+
+
+def draw_static_screen(game_data: GameDataType,
+                       titles: dict[str, TextSurfaceType],
+                       buttons: dict[str, TextSurfaceType],
+                       render_state: RenderStateType) -> list[Rect]:
+    """
+    Covers the whole display surface with the background layer,
+    composing it again if the layout has changed.
+
+    :param game_data: A TypedDict of game state variables.
+    :param titles: A dictionary containing player and enemy boards
+    titles of TextSurfaceType.
+    :param buttons: A dictionary containing menu buttons
+    of TextSurfaceType.
+    :param render_state: A TypedDict of what is currently on screen.
+    :return: A list with the whole screen area.
+    """
+    layout_key = get_layout_key(game_data, titles, buttons)
+    background = render_state['background']
+
+    if background is None or render_state['layout_key'] != layout_key:
+        background = make_background(
+            game_data, titles, buttons, render_state['surface'].get_size())
+        render_state['background'] = background
+        render_state['layout_key'] = layout_key
+
+    render_state['surface'].blit(background, (0, 0))
+
+    # Nothing dynamic is on screen anymore
+    render_state['tile_looks'].clear()
+    render_state['screen_message'] = None
+    render_state['thinking_indicator'] = None
+    render_state['full_redraw'] = False
+    return [render_state['surface'].get_rect()]
 
-    pygame.display.update()
+
+def draw_splash_screen(surface: Surface) -> None:
+    """
+    Shows the background color on the whole display at once, before
+    fonts are loaded and boards are generated.
+
+    :param surface: The display surface.
+    :return: None.
+    """
+    surface.fill(BG_COLOR)
+    pygame.display.flip()
+
+
+def make_render_state(surface: Surface) -> RenderStateType:
+    """
+    Creates a TypedDict tracking what is currently drawn on screen.
+
+    :param surface: The display surface to draw the game on.
+    :return: A render state that requests the full screen redraw.
+    """
+    render_state: RenderStateType
+    render_state = {'surface': surface,
+                    'full_redraw': True,
+                    'background': None,
+                    'layout_key': None,
+                    'tile_looks': {},
+                    'screen_message': None,
+                    'thinking_indicator': None}
+    return render_state
+
+
+def request_full_redraw(render_state: RenderStateType) -> None:
+    """
+    Makes the next draw_game_screen() call redraw the whole screen.
+
+    :param render_state: A TypedDict of what is currently on screen.
+    :return: None.
+    """
+    render_state['full_redraw'] = True
+
+
+def get_hint_levels(game_data: GameDataType) -> Optional[list[list[int]]]:
+    """
+    Returns the ship probability levels of the enemy tiles if the hint
+    is shown. The levels are computed in the background, so drawing
+    only looks them up.
+
+    :param game_data: A TypedDict of game state variables.
+    :return: Levels of the enemy tiles by [x][y], None if the hint
+    is hidden, not computed yet, or the enemy board is revealed.
+    """
+    hint = game_data['hint']
+
+    if game_data['hint_is_shown'] and game_data['enemy_is_hidden'] and (
+            hint is not None):
+        return hint['levels']
+    return None
+
+
+@trace_memory
+def draw_game_screen(game_data: GameDataType,
+                     titles: dict[str, TextSurfaceType],
+                     buttons: dict[str, TextSurfaceType],
+                     render_state: RenderStateType) -> None:
+    """
+    Draws the game on the display surface of the given render state.
+    Only the screen areas changed since the previous call are redrawn
+    and updated.
+
+    :param game_data: A TypedDict of game state variables.
+    :param titles: A dictionary containing player and enemy boards
+    titles of TextSurfaceType.
+    :param buttons: A dictionary containing menu buttons
+    of TextSurfaceType.
+    :param render_state: A TypedDict of what is currently on screen.
+    :return: None.
+    """
+    dirty_rects = []
+
+    # A layout change makes the whole background outdated
+    layout_changed = (render_state['layout_key']
+                      != get_layout_key(game_data, titles, buttons))
+
+    if render_state['full_redraw'] or layout_changed:
+        dirty_rects += draw_static_screen(game_data, titles, buttons,
+                                          render_state)
+
+    dirty_rects += draw_screen_message(game_data['screen_message'],
+                                       render_state)
+    dirty_rects += draw_thinking_indicator(ai_is_thinking(game_data),
+                                           render_state)
+    dirty_rects += draw_changed_tiles(game_data['player_board'],
+                                      render_state)
+    dirty_rects += draw_changed_tiles(game_data['enemy_board'],
+                                      render_state,
+                                      is_hidden=game_data['enemy_is_hidden'],
+                                      hint_levels=get_hint_levels(game_data))
+
+    if dirty_rects:
+        pygame.display.update(dirty_rects)
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+from concurrent.futures import Executor, Future
+from functools import lru_cache
+from typing import Callable, Optional, TypedDict
+
+import numpy as np
+
+from board_geometry import get_placement_tables
+from constants import (
+    GameDataType, HintType, RuleSet, DEFAULT_RULES, HINT_LEVELS,
+    HINT_HIT_WEIGHT)
+from game_engine import get_reference_to_tile
+
+
+HintTablesType = TypedDict('HintTablesType',
+                           {'bodies': np.ndarray,
+                            'surroundings': np.ndarray,
+                            'fleet': list[tuple[np.ndarray, int]]})
+
+
+@lru_cache()
+def get_hint_tables(rules: RuleSet = DEFAULT_RULES) -> HintTablesType:
+    """
+    Compiles every distinct ship placement of the given rules into
+    matrices of placements by tile number, x * height + y.
+
+    :param rules: A RuleSet of the game.
+    :return: Tables of HintTablesType(TypedDict): placement bodies,
+    tiles around the bodies where no other ship may be, and a mask
+    of placements with the count of ships for every ship size.
+    """
+    placement_tables = get_placement_tables(rules)
+    # One ship tile has the same body in both orientations
+    placements: dict[tuple[tuple[int, int], ...],
+                     tuple[int, set[tuple[int, int]]]] = {}
+
+    for (length, orientation), bodies in placement_tables['bodies'].items():
+        halos = placement_tables['halos'][length, orientation]
+        for head_x, column in enumerate(bodies):
+            for head_y, body in enumerate(column):
+                if body is not None:
+                    placements.setdefault(body, (length, set(
+                        halos[head_x][head_y]) - set(body)))
+
+    tile_count = rules.board_width * rules.board_height
+    bodies_table = np.zeros((len(placements), tile_count))
+    surroundings_table = np.zeros((len(placements), tile_count))
+    lengths = np.zeros(len(placements), int)
+
+    for placement, (body, (length, surrounding)) in enumerate(
+            placements.items()):
+        lengths[placement] = length
+        for board_x, board_y in body:
+            bodies_table[placement, board_x * rules.board_height
+                         + board_y] = 1
+        for board_x, board_y in surrounding:
+            surroundings_table[placement, board_x * rules.board_height
+                               + board_y] = 1
+
+    return {'bodies': bodies_table,
+            'surroundings': surroundings_table,
+            'fleet': [(lengths == size, count)
+                      for size, count in zip(rules.ship_sizes,
+                                             rules.ship_counts)]}
+
+
+def make_empty_hint(rules: RuleSet = DEFAULT_RULES) -> HintType:
+    """
+    Creates a hint of a board with no shots.
+
+    :param rules: A RuleSet of the game.
+    :return: A hint of HintType(TypedDict) with no levels yet.
+    """
+    tile_count = rules.board_width * rules.board_height
+    placement_count = len(get_hint_tables(rules)['bodies'])
+    return {'shots': 0,
+            'hits': np.zeros(tile_count, bool),
+            'misses': np.zeros(tile_count, bool),
+            'misses_covered': np.zeros(placement_count),
+            'hits_covered': np.zeros(placement_count),
+            'halo_hits': np.zeros(placement_count),
+            'levels': []}
+
+
+def get_ship_probabilities(hint: HintType,
+                           rules: RuleSet = DEFAULT_RULES) -> np.ndarray:
+    """
+    Estimates the probability of every tile to hold a ship from
+    the shots of the given hint and the fleet of the rules.
+
+    A placement is possible if it covers no miss and, unless ships may
+    touch, has no hit around it. Possible placements are weighted
+    by HINT_HIT_WEIGHT for every hit they cover. Ships are taken
+    as independent of each other.
+
+    :param hint: A hint of HintType(TypedDict).
+    :param rules: A RuleSet of the game.
+    :return: An array of probabilities by tile number, 0 for tiles
+    that were shot.
+    """
+    tables = get_hint_tables(rules)
+    is_possible = (hint['misses_covered'] == 0) & (hint['halo_hits'] == 0)
+    weights = np.where(is_possible,
+                       float(HINT_HIT_WEIGHT) ** hint['hits_covered'], 0.0)
+    no_ship_probabilities = np.ones(tables['bodies'].shape[1])
+
+    for is_of_size, count in tables['fleet']:
+        size_weights = weights[is_of_size]
+        total_weight = size_weights.sum()
+        if total_weight > 0:
+            covered = size_weights @ tables['bodies'][is_of_size]
+            no_ship_probabilities *= (1 - covered / total_weight) ** count
+
+    probabilities = 1 - no_ship_probabilities
+    probabilities[hint['hits'] | hint['misses']] = 0
+    return probabilities
+
+
+def compute_hint(hint: Optional[HintType],
+                 new_shots: list[tuple[tuple[int, int], bool]],
+                 rules: RuleSet = DEFAULT_RULES) -> HintType:
+    """
+    Updates a hint with the shots made since it was computed. Only
+    the placements covering or touching the new shots are changed,
+    the given hint is not modified.
+
+    :param hint: The last hint of HintType(TypedDict), None to start
+    from a board with no shots.
+    :param new_shots: Coordinates in (x, y) format and hit flags
+    of the new shots in shot order.
+    :param rules: A RuleSet of the game.
+    :return: A new hint of HintType(TypedDict).
+    """
+    if hint is None:
+        hint = make_empty_hint(rules)
+    tables = get_hint_tables(rules)
+    new_hits = [board_x * rules.board_height + board_y
+                for (board_x, board_y), is_hit in new_shots if is_hit]
+    new_misses = [board_x * rules.board_height + board_y
+                  for (board_x, board_y), is_hit in new_shots if not is_hit]
+
+    new_hint: HintType
+    new_hint = {'shots': hint['shots'] + len(new_shots),
+                'hits': hint['hits'].copy(),
+                'misses': hint['misses'].copy(),
+                'misses_covered': hint['misses_covered']
+                + tables['bodies'][:, new_misses].sum(axis=1),
+                'hits_covered': hint['hits_covered']
+                + tables['bodies'][:, new_hits].sum(axis=1),
+                'halo_hits': hint['halo_hits']
+                + tables['surroundings'][:, new_hits].sum(axis=1),
+                'levels': []}
+    new_hint['hits'][new_hits] = True
+    new_hint['misses'][new_misses] = True
+
+    levels = np.minimum(get_ship_probabilities(new_hint, rules) * HINT_LEVELS,
+                        HINT_LEVELS - 1).astype(int)
+    new_hint['levels'] = levels.reshape(rules.board_width,
+                                        rules.board_height).tolist()
+    return new_hint
+
+
+def update_hint(game_data: GameDataType,
+                executor: Executor,
+                done_callback: Optional[Callable[[Future], None]] = None
+                ) -> GameDataType:
+    """
+    Receives the hint computed in the background, and starts computing
+    a new one if the hint is shown and the player has shot since.
+    Hints are computed from the player's shots only, never from
+    the hidden ships.
+
+    :param game_data: A TypedDict of game state variables.
+    :param executor: An executor to run the hint computation.
+    :param done_callback: A function to call with the hint future
+    when the hint is ready, if any.
+    :return: A TypedDict of game state variables with the latest hint.
+    """
+    pending_hint = game_data['pending_hint']
+
+    if pending_hint is not None and pending_hint.done():
+        game_data['hint'] = pending_hint.result()
+        game_data['pending_hint'] = pending_hint = None
+
+    hint = game_data['hint']
+    player_moves = game_data['player_moves']
+    hint_is_outdated = hint is None or hint['shots'] < len(player_moves)
+
+    if game_data['hint_is_shown'] and pending_hint is None and (
+            hint_is_outdated):
+        enemy_board = game_data['enemy_board']
+        new_moves = player_moves[0 if hint is None else hint['shots']:]
+        new_shots = [(move, get_reference_to_tile(
+            move, enemy_board)['hit_result'] == 'damage')
+            for move in new_moves]
+        pending_hint = executor.submit(compute_hint, hint, new_shots,
+                                       game_data['rules'])
+        if done_callback is not None:
+            pending_hint.add_done_callback(done_callback)
+        game_data['pending_hint'] = pending_hint
+    return game_data
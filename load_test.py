@@ -0,0 +1,586 @@
+# -*- coding: utf-8 -*-
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import time
+from collections import Counter
+from multiprocessing.connection import Connection
+from typing import Any, Optional, TypedDict
+
+from ai import set_up_ai, choose_next_move, record_shot_result
+from constants import (
+    GameDataType, AI_MODES, DEFAULT_AI_MODE, DEFAULT_RULES, LOAD_TEST_STAGES,
+    LOAD_TEST_STAGE_DURATION, LOAD_TEST_THINK_TIME, LOAD_TEST_QUEUE_SIZE,
+    LOAD_TEST_LATENCY_BUCKET, LOAD_TEST_RTT_LIMIT)
+from game_engine import set_up_new_game, handle_player_move, make_ai_move
+from simulator import get_bucket_percentile, save_simulation_stats
+
+try:
+    import resource
+    HAS_RESOURCE = True
+except ImportError:  # not available on Windows
+    HAS_RESOURCE = False
+
+
+ServerStatsType = TypedDict('ServerStatsType',
+                            {'sessions': int,
+                             'requests': int,
+                             'depth_sum': int,
+                             'max_depth': int,
+                             'backpressure_waits': int,
+                             'backpressure_time': float,
+                             'base_rss': Optional[int]})
+ClientStatsType = TypedDict('ClientStatsType',
+                            {'clients': int,
+                             'moves': int,
+                             'games': int,
+                             'errors': int,
+                             'round_trips': Counter})
+
+HUMAN_POLICIES = ('random', *AI_MODES)
+
+
+def raise_file_limit() -> None:
+    """
+    Raises the open file limit of the process to the hard limit, so
+    that thousands of sockets fit.
+
+    :return: None.
+    """
+    if HAS_RESOURCE:
+        _, hard_limit = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard_limit, hard_limit))
+
+
+def get_rss() -> Optional[int]:
+    """
+    Returns the resident memory of the process.
+
+    :return: Resident memory in bytes, None where /proc is missing.
+    """
+    try:
+        with open('/proc/self/statm') as statm_file:
+            resident_pages = int(statm_file.read().split()[1])
+    except OSError:
+        return None
+    return resident_pages * os.sysconf('SC_PAGE_SIZE')
+
+
+def make_server_stats() -> ServerStatsType:
+    """
+    Creates a TypedDict of server counters, kept since the last stats
+    request, apart from the number of sessions.
+
+    :return: A TypedDict of server counters.
+    """
+    return {'sessions': 0,
+            'requests': 0,
+            'depth_sum': 0,
+            'max_depth': 0,
+            'backpressure_waits': 0,
+            'backpressure_time': 0.0,
+            'base_rss': get_rss()}
+
+
+def handle_request(line: str,
+                   game_data: Optional[GameDataType],
+                   ai_mode: str = DEFAULT_AI_MODE
+                   ) -> tuple[str, Optional[GameDataType]]:
+    """
+    Plays one request of a client session.
+
+    A session sends 'n' to start a game, answered with 'ok', and
+    's x y' to shoot, answered with 'h' or 'm' for a hit or a miss,
+    then 'w' if the player has won, 'l' if the AI has won, '-' if
+    the game goes on, and the AI move 'x y' unless the player has won.
+    Anything else is answered with 'e'.
+
+    :param line: A request line of the session.
+    :param game_data: A TypedDict of the session game state, if any.
+    :param ai_mode: An AI mode from AI_MODES the server plays with.
+    :return: An answer line and the session game state.
+    :raise RuntimeError: If the AI has not moved after the player.
+    """
+    command, *fields = line.split()
+
+    if command == 'n':
+        return 'ok', set_up_new_game(ai_mode)
+    if command != 's' or game_data is None or game_data['game_is_over']:
+        return 'e', game_data
+
+    try:
+        board_x, board_y = (int(field) for field in fields)
+    except ValueError:
+        return 'e', game_data
+    rules = game_data['rules']
+    if not (0 <= board_x < rules.board_width
+            and 0 <= board_y < rules.board_height):
+        return 'e', game_data
+    tile = game_data['enemy_board']['tiles'][board_x][board_y]
+    if tile['hit_result'] is not None:
+        return 'e', game_data
+
+    game_data = handle_player_move((board_x, board_y), game_data)
+    result = 'h' if tile['hit_result'] == 'damage' else 'm'
+
+    if game_data['game_is_over']:
+        return f'{result} w', game_data
+    game_data = make_ai_move(game_data)
+    if game_data['last_ai_move'] is None:
+        raise RuntimeError("Load test error. The AI has not answered "
+                           "the player move.")
+    ai_x, ai_y = game_data['last_ai_move']
+    status = 'l' if game_data['game_is_over'] else '-'
+    return f'{result} {status} {ai_x} {ai_y}', game_data
+
+
+def report_server_stats(server_stats: ServerStatsType,
+                        requests: asyncio.Queue) -> dict[str, Any]:
+    """
+    Summarizes the server counters and starts counting anew.
+
+    :param server_stats: A TypedDict of server counters.
+    :param requests: The server request queue.
+    :return: A dictionary of server statistics ready for JSON.
+    """
+    rss = get_rss()
+    base_rss = server_stats['base_rss']
+    sessions = server_stats['sessions']
+    report: dict[str, Any] = {
+        'sessions': sessions,
+        'queue_depth': {'mean': round(server_stats['depth_sum']
+                                      / max(server_stats['requests'], 1), 1),
+                        'max': server_stats['max_depth'],
+                        'end': requests.qsize()},
+        'backpressure_waits': server_stats['backpressure_waits'],
+        'backpressure_ms': round(server_stats['backpressure_time'] * 1000, 1),
+        'rss_mib': None,
+        'kib_per_session': None}
+
+    if rss is not None:
+        report['rss_mib'] = round(rss / 2 ** 20, 1)
+        if sessions and base_rss is not None:
+            report['kib_per_session'] = round(
+                (rss - base_rss) / sessions / 1024, 1)
+    server_stats.update({'requests': 0,
+                         'depth_sum': 0,
+                         'max_depth': 0,
+                         'backpressure_waits': 0,
+                         'backpressure_time': 0.0})
+    return report
+
+
+async def run_engine(requests: asyncio.Queue,
+                     server_stats: ServerStatsType,
+                     ai_mode: str) -> None:
+    """
+    Plays queued requests one by one. The queue is bounded, so
+    sessions wait to enqueue, and stop reading their sockets, when
+    the engine falls behind.
+
+    :param requests: A queue of (line, game data, answer future)
+    requests.
+    :param server_stats: A TypedDict of server counters.
+    :param ai_mode: An AI mode from AI_MODES the server plays with.
+    :return: None.
+    """
+    while True:
+        line, game_data, answer = await requests.get()
+        depth = requests.qsize()
+        server_stats['requests'] += 1
+        server_stats['depth_sum'] += depth
+        server_stats['max_depth'] = max(server_stats['max_depth'], depth)
+
+        if not answer.cancelled():
+            answer.set_result(handle_request(line, game_data, ai_mode))
+
+
+async def serve_session(reader: asyncio.StreamReader,
+                        writer: asyncio.StreamWriter,
+                        requests: asyncio.Queue,
+                        server_stats: ServerStatsType) -> None:
+    """
+    Serves one client connection until it is closed. A 'stats' line
+    is answered with a JSON line of server statistics. A connection
+    counts as a session once it has started a game.
+
+    :param reader: A stream of client lines.
+    :param writer: A stream to write answers to.
+    :param requests: The server request queue.
+    :param server_stats: A TypedDict of server counters.
+    :return: None.
+    """
+    game_data = None
+    loop = asyncio.get_running_loop()
+
+    try:
+        while line := (await reader.readline()).decode():
+            if line.strip() == 'stats':
+                writer.write(json.dumps(report_server_stats(
+                    server_stats, requests)).encode() + b'\n')
+                continue
+            answer = loop.create_future()
+
+            if requests.full():
+                start_time = time.perf_counter()
+                await requests.put((line, game_data, answer))
+                server_stats['backpressure_waits'] += 1
+                server_stats['backpressure_time'] += (time.perf_counter()
+                                                      - start_time)
+            else:
+                requests.put_nowait((line, game_data, answer))
+            had_game = game_data is not None
+            reply, game_data = await answer
+            if not had_game:
+                server_stats['sessions'] += game_data is not None
+            writer.write(reply.encode() + b'\n')
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        server_stats['sessions'] -= game_data is not None
+        writer.close()
+
+
+async def serve(ai_mode: str,
+                queue_size: int,
+                ready: Connection) -> None:
+    """
+    Runs a game server on a free localhost port until cancelled.
+
+    :param ai_mode: An AI mode from AI_MODES the server plays with.
+    :param queue_size: The most requests waiting for the engine.
+    :param ready: A pipe to send the port number to once listening.
+    :return: None.
+    """
+    requests: asyncio.Queue = asyncio.Queue(queue_size)
+    server_stats = make_server_stats()
+    engine = asyncio.create_task(run_engine(requests, server_stats, ai_mode))
+
+    server = await asyncio.start_server(
+        lambda reader, writer: serve_session(reader, writer, requests,
+                                             server_stats),
+        '127.0.0.1', 0, backlog=max(LOAD_TEST_STAGES))
+    ready.send(server.sockets[0].getsockname()[1])
+
+    async with server:
+        await server.serve_forever()
+    engine.cancel()
+
+
+def run_server(ai_mode: str, queue_size: int, ready: Connection) -> None:
+    """
+    Runs a game server in a process of its own.
+
+    :param ai_mode: An AI mode from AI_MODES the server plays with.
+    :param queue_size: The most requests waiting for the engine.
+    :param ready: A pipe to send the port number to once listening.
+    :return: None.
+    """
+    raise_file_limit()
+    asyncio.run(serve(ai_mode, queue_size, ready))
+
+
+def make_client_stats() -> ClientStatsType:
+    """
+    Creates a TypedDict of client counters of a load test stage.
+
+    :return: A TypedDict of client counters.
+    """
+    return {'clients': 0,
+            'moves': 0,
+            'games': 0,
+            'errors': 0,
+            'round_trips': Counter()}
+
+
+async def play_client_game(reader: asyncio.StreamReader,
+                           writer: asyncio.StreamWriter,
+                           human: str,
+                           think_time: float,
+                           rng: random.Random,
+                           stats_holder: list[ClientStatsType]) -> None:
+    """
+    Plays one game as a human would, with random shots or an AI mode,
+    pausing for exponentially distributed think times between shots.
+
+    :param reader: A stream of server answers.
+    :param writer: A stream to write requests to.
+    :param human: A policy from HUMAN_POLICIES.
+    :param think_time: Mean seconds between shots, 0 to not pause.
+    :param rng: A random generator of the client.
+    :param stats_holder: A list holding the client counters of
+    the current stage.
+    :return: None.
+    :raise ConnectionError: If the server is gone.
+    """
+    writer.write(b'n\n')
+    if (await reader.readline()).strip() != b'ok':
+        raise ConnectionError("Load test error. The game has not started.")
+    tiles = [(board_x, board_y)
+             for board_x in range(DEFAULT_RULES.board_width)
+             for board_y in range(DEFAULT_RULES.board_height)]
+    rng.shuffle(tiles)
+    ai_data = set_up_ai()
+    status = '-'
+
+    while status == '-':
+        if think_time:
+            await asyncio.sleep(rng.expovariate(1 / think_time))
+        if human == 'random':
+            move = tiles.pop()
+        else:
+            move, ai_data = choose_next_move(ai_data, human, rng)
+
+        start_time = time.perf_counter_ns()
+        writer.write(f's {move[0]} {move[1]}\n'.encode())
+        answer = (await reader.readline()).decode().split()
+        round_trip = time.perf_counter_ns() - start_time
+
+        if not answer or answer[0] == 'e':
+            raise ConnectionError("Load test error. The shot was refused.")
+        client_stats = stats_holder[0]
+        client_stats['round_trips'][round_trip
+                                    // LOAD_TEST_LATENCY_BUCKET] += 1
+        client_stats['moves'] += 1
+        ai_data = record_shot_result(move, answer[0] == 'h', ai_data)
+        status = answer[1]
+    stats_holder[0]['games'] += 1
+
+
+async def run_client(port: int,
+                     human: str,
+                     think_time: float,
+                     rng: random.Random,
+                     stats_holder: list[ClientStatsType]) -> None:
+    """
+    Plays games one after another until cancelled. A client that
+    loses its connection counts an error and connects again.
+
+    :param port: The server port on localhost.
+    :param human: A policy from HUMAN_POLICIES.
+    :param think_time: Mean seconds between shots, 0 to not pause.
+    :param rng: A random generator of the client.
+    :param stats_holder: A list holding the client counters of
+    the current stage.
+    :return: None.
+    """
+    while True:
+        writer = None
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            while True:
+                await play_client_game(reader, writer, human, think_time,
+                                       rng, stats_holder)
+        except (ConnectionError, OSError):
+            stats_holder[0]['errors'] += 1
+            await asyncio.sleep(think_time)
+        finally:
+            if writer is not None:
+                writer.close()
+
+
+async def ask_server_stats(port: int) -> dict[str, Any]:
+    """
+    Asks the server for its statistics over a control connection.
+
+    :param port: The server port on localhost.
+    :return: A dictionary of server statistics.
+    """
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(b'stats\n')
+    server_stats = json.loads(await reader.readline())
+    writer.close()
+    return server_stats
+
+
+def make_stage_stats(client_stats: ClientStatsType,
+                     server_stats: dict[str, Any],
+                     elapsed_time: float) -> dict[str, Any]:
+    """
+    Summarizes one load test stage. The stage is saturated when
+    the engine queue filled up or the 99th percentile round trip
+    exceeded LOAD_TEST_RTT_LIMIT.
+
+    :param client_stats: A TypedDict of client counters of the stage.
+    :param server_stats: A dictionary of server statistics of the stage.
+    :param elapsed_time: Wall time of the stage in seconds.
+    :return: A dictionary of statistics ready for JSON.
+    """
+    round_trips = client_stats['round_trips']
+    bucket_ms = LOAD_TEST_LATENCY_BUCKET / 10 ** 6
+    stats: dict[str, Any] = {
+        'clients': client_stats['clients'],
+        'moves_per_s': round(client_stats['moves'] / elapsed_time, 1),
+        'games': client_stats['games'],
+        'errors': client_stats['errors'],
+        'round_trip_ms': None,
+        'server': server_stats,
+        'saturated': server_stats['backpressure_waits'] > 0}
+
+    if round_trips:
+        p99 = get_bucket_percentile(round_trips, 99) * bucket_ms
+        stats['round_trip_ms'] = {
+            'p50': round(get_bucket_percentile(round_trips, 50) * bucket_ms,
+                         2),
+            'p99': round(p99, 2),
+            'max': round((max(round_trips) + 1) * bucket_ms, 2)}
+        stats['saturated'] |= p99 > LOAD_TEST_RTT_LIMIT * 1000
+    return stats
+
+
+async def ramp_clients(port: int,
+                       stages: tuple[int, ...],
+                       stage_duration: float,
+                       human: str,
+                       think_time: float,
+                       seed: int) -> list[dict[str, Any]]:
+    """
+    Adds clients stage by stage, measuring every stage separately.
+
+    :param port: The server port on localhost.
+    :param stages: Growing numbers of concurrent clients.
+    :param stage_duration: Seconds every stage is measured for.
+    :param human: A policy from HUMAN_POLICIES.
+    :param think_time: Mean seconds between shots, 0 to not pause.
+    :param seed: A seed of the client random generators.
+    :return: A list of stage statistics.
+    """
+    stats_holder = [make_client_stats()]
+    clients: list[asyncio.Task] = []
+    stage_stats = []
+
+    try:
+        for client_count in stages:
+            while len(clients) < client_count:
+                rng = random.Random(f'{seed}:{len(clients)}:human')
+                clients.append(asyncio.create_task(run_client(
+                    port, human, think_time, rng, stats_holder)))
+            # Let new clients connect before the stage is measured
+            await asyncio.sleep(min(think_time, stage_duration))
+            await ask_server_stats(port)
+            stats_holder[0] = make_client_stats()
+            stats_holder[0]['clients'] = client_count
+            start_time = time.perf_counter()
+
+            await asyncio.sleep(stage_duration)
+            server_stats = await ask_server_stats(port)
+            stage_stats.append(make_stage_stats(
+                stats_holder[0], server_stats,
+                time.perf_counter() - start_time))
+    finally:
+        for client in clients:
+            client.cancel()
+        await asyncio.gather(*clients, return_exceptions=True)
+    return stage_stats
+
+
+def run_load_test(stages: tuple[int, ...] = LOAD_TEST_STAGES,
+                  stage_duration: float = LOAD_TEST_STAGE_DURATION,
+                  human: str = 'random',
+                  think_time: float = LOAD_TEST_THINK_TIME,
+                  ai_mode: str = DEFAULT_AI_MODE,
+                  queue_size: int = LOAD_TEST_QUEUE_SIZE,
+                  seed: Optional[int] = None) -> dict[str, Any]:
+    """
+    Starts a game server process on localhost and ramps up simulated
+    clients playing against it.
+
+    :param stages: Growing numbers of concurrent clients.
+    :param stage_duration: Seconds every stage is measured for.
+    :param human: A policy from HUMAN_POLICIES the clients play with.
+    :param think_time: Mean seconds between shots of a client,
+    0 to not pause.
+    :param ai_mode: An AI mode from AI_MODES the server plays with.
+    :param queue_size: The most requests waiting for the server engine.
+    :param seed: A seed of the client random generators, a random one
+    if None.
+    :return: A dictionary of load test parameters and statistics.
+    """
+    if not stages or list(stages) != sorted(stages) or stages[0] < 1:
+        raise ValueError("Load test error. Stages must be growing "
+                         "positive client counts.")
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    raise_file_limit()
+    ready, server_end = multiprocessing.Pipe(duplex=False)
+    server = multiprocessing.Process(target=run_server,
+                                     args=(ai_mode, queue_size, server_end),
+                                     daemon=True)
+    server.start()
+
+    try:
+        port = ready.recv()
+        stage_stats = asyncio.run(ramp_clients(port, stages, stage_duration,
+                                               human, think_time, seed))
+    finally:
+        server.terminate()
+        server.join()
+
+    saturated_at = next((stage['clients'] for stage in stage_stats
+                         if stage['saturated']), None)
+    return {'stages': stage_stats,
+            'stage_duration': stage_duration,
+            'human': human,
+            'think_time': think_time,
+            'ai_mode': ai_mode,
+            'queue_size': queue_size,
+            'seed': seed,
+            'saturated_at': saturated_at}
+
+
+def parse_stages(text: str) -> tuple[int, ...]:
+    """
+    Parses client counts of load test stages.
+
+    :param text: Comma separated client counts, e.g. '100,500,1000'.
+    :return: A tuple of client counts.
+    """
+    try:
+        return tuple(int(count) for count in text.split(','))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid stages: {text!r}")
+
+
+def main() -> None:
+    """Runs a load test and prints the results as JSON."""
+    parser = argparse.ArgumentParser(
+        description="Ramp simulated clients against a local game server.")
+    parser.add_argument('--stages', type=parse_stages,
+                        default=LOAD_TEST_STAGES,
+                        help="comma separated client counts (default: "
+                             f"{','.join(map(str, LOAD_TEST_STAGES))})")
+    parser.add_argument('--duration', type=float,
+                        default=LOAD_TEST_STAGE_DURATION,
+                        help="seconds per stage (default: %(default)s)")
+    parser.add_argument('--human', choices=HUMAN_POLICIES, default='random',
+                        help="how clients choose shots (default: %(default)s)")
+    parser.add_argument('--think-time', type=float,
+                        default=LOAD_TEST_THINK_TIME,
+                        help="mean seconds between shots "
+                             "(default: %(default)s)")
+    parser.add_argument('--ai', choices=AI_MODES, default=DEFAULT_AI_MODE,
+                        help="AI mode of the server (default: %(default)s)")
+    parser.add_argument('--queue-size', type=int,
+                        default=LOAD_TEST_QUEUE_SIZE,
+                        help="server engine queue bound "
+                             "(default: %(default)s)")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--output', default=None,
+                        help="file to write load test JSON to")
+    args = parser.parse_args()
+
+    try:
+        report = run_load_test(args.stages, args.duration, args.human,
+                               args.think_time, args.ai, args.queue_size,
+                               args.seed)
+    except ValueError as error:
+        parser.error(str(error))
+    save_simulation_stats(report, args.output)
+
+
+if __name__ == '__main__':
+    main()
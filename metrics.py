@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+import os
+import threading
+from bisect import bisect_left
+from typing import Optional, TypedDict
+
+from constants import METRICS_EXPORT_INTERVAL, METRICS_LATENCY_BUCKETS
+
+
+# Label pairs of a metric, e.g. (('result', 'hit'),)
+LabelsType = tuple[tuple[str, str], ...]
+
+HistogramType = TypedDict('HistogramType',
+                          {'bucket_counts': list[int],
+                           'sum': float,
+                           'count': int})
+
+MetricsRegistryType = TypedDict('MetricsRegistryType',
+                                {'enabled': bool,
+                                 'lock': threading.Lock,
+                                 'counters': dict[tuple[str, LabelsType],
+                                                  int],
+                                 'histograms': dict[tuple[str, LabelsType],
+                                                    HistogramType]})
+
+MetricsExporterType = TypedDict('MetricsExporterType',
+                                {'path': str,
+                                 'registry': MetricsRegistryType,
+                                 'stop_event': threading.Event,
+                                 'thread': threading.Thread})
+
+# Exported metrics by name: (type, help text)
+METRIC_DESCRIPTIONS = {
+    'navalbattle_ships_placed_total':
+        ('counter', "Ships placed on randomly generated boards."),
+    'navalbattle_ship_placement_retries_total':
+        ('counter', "Head tiles rejected while placing ships randomly."),
+    'navalbattle_ai_move_seconds':
+        ('histogram', "Time the AI takes to choose a move."),
+    'navalbattle_ai_attacks_finished_total':
+        ('counter', "Attacks the AI finished, switching back to search."),
+    'navalbattle_shots_total':
+        ('counter', "Shots made in games by shooter and result."),
+    'navalbattle_games_total':
+        ('counter', "Finished games by winner."),
+}
+
+
+def make_metrics_registry() -> MetricsRegistryType:
+    """
+    Creates an empty disabled metrics registry.
+
+    :return: A registry of MetricsRegistryType(TypedDict).
+    """
+    registry: MetricsRegistryType
+    registry = {'enabled': False,
+                'lock': threading.Lock(),
+                'counters': {},
+                'histograms': {}}
+    return registry
+
+
+# The registry of the running program, enabled by the metrics exporter
+REGISTRY = make_metrics_registry()
+
+
+def inc_counter(name: str,
+                labels: LabelsType = (),
+                amount: int = 1,
+                registry: MetricsRegistryType = REGISTRY) -> None:
+    """
+    Adds the given amount to a counter. Does nothing if the registry
+    is disabled, so that hot paths only pay for one lookup.
+
+    :param name: A metric name from METRIC_DESCRIPTIONS.
+    :param labels: Label pairs of the counter.
+    :param amount: A non-negative amount to add.
+    :param registry: A metrics registry.
+    :return: None.
+    """
+    if not registry['enabled']:
+        return
+    key = (name, labels)
+    counters = registry['counters']
+
+    with registry['lock']:
+        counters[key] = counters.get(key, 0) + amount
+
+
+def observe_histogram(name: str,
+                      value: float,
+                      labels: LabelsType = (),
+                      registry: MetricsRegistryType = REGISTRY) -> None:
+    """
+    Counts the given value in the fixed buckets of a histogram.
+    Does nothing if the registry is disabled.
+
+    :param name: A metric name from METRIC_DESCRIPTIONS.
+    :param value: An observed value, e.g. seconds of a call.
+    :param labels: Label pairs of the histogram.
+    :param registry: A metrics registry.
+    :return: None.
+    """
+    if not registry['enabled']:
+        return
+    # A value equal to a bucket bound belongs to that bucket
+    bucket = bisect_left(METRICS_LATENCY_BUCKETS, value)
+
+    with registry['lock']:
+        histogram = registry['histograms'].get((name, labels))
+        if histogram is None:
+            histogram = {'bucket_counts': [0] * (
+                len(METRICS_LATENCY_BUCKETS) + 1),
+                'sum': 0.0,
+                'count': 0}
+            registry['histograms'][name, labels] = histogram
+        histogram['bucket_counts'][bucket] += 1
+        histogram['sum'] += value
+        histogram['count'] += 1
+
+
+def format_labels(labels: LabelsType) -> str:
+    """
+    Formats label pairs of a sample in the Prometheus text format.
+
+    :param labels: Label pairs.
+    :return: Labels in braces, empty if there are none.
+    """
+    if not labels:
+        return ''
+    label_pairs = []
+
+    for label, value in labels:
+        escaped_value = (value.replace('\\', r'\\').replace('"', r'\"')
+                         .replace('\n', r'\n'))
+        label_pairs.append(f'{label}="{escaped_value}"')
+    return '{' + ','.join(label_pairs) + '}'
+
+
+def format_metrics(registry: MetricsRegistryType = REGISTRY) -> str:
+    """
+    Renders all metrics of the registry in the Prometheus text
+    exposition format. Histogram buckets are cumulative.
+
+    :param registry: A metrics registry.
+    :return: The text of the metrics file.
+    """
+    with registry['lock']:
+        counters = dict(registry['counters'])
+        histograms: dict[tuple[str, LabelsType], HistogramType] = {
+            key: {'bucket_counts': list(histogram['bucket_counts']),
+                  'sum': histogram['sum'],
+                  'count': histogram['count']}
+            for key, histogram in registry['histograms'].items()}
+    bounds: list[str] = [f'{bound:g}' for bound in METRICS_LATENCY_BUCKETS]
+    lines = []
+
+    for name, (metric_type, help_text) in METRIC_DESCRIPTIONS.items():
+        lines += [f'# HELP {name} {help_text}',
+                  f'# TYPE {name} {metric_type}']
+
+        for (sample_name, labels), value in sorted(counters.items()):
+            if sample_name == name:
+                lines.append(f'{name}{format_labels(labels)} {value}')
+
+        for (sample_name, labels), histogram in sorted(histograms.items()):
+            if sample_name != name:
+                continue
+            cumulative_count = 0
+            for bound, bucket_count in zip(bounds + ['+Inf'],
+                                           histogram['bucket_counts']):
+                cumulative_count += bucket_count
+                bucket_labels = labels + (('le', bound),)
+                lines.append(f'{name}_bucket{format_labels(bucket_labels)} '
+                             f'{cumulative_count}')
+            lines += [f'{name}_sum{format_labels(labels)} '
+                      f'{histogram["sum"]!r}',
+                      f'{name}_count{format_labels(labels)} '
+                      f'{histogram["count"]}']
+    return '\n'.join(lines) + '\n'
+
+
+def write_metrics_file(path: str,
+                       registry: MetricsRegistryType = REGISTRY) -> None:
+    """
+    Writes the metrics file for a scraper. The file is replaced
+    at once, so a scraper never reads a half written file.
+
+    :param path: A path to the metrics file.
+    :param registry: A metrics registry.
+    :return: None.
+    """
+    temporary_path = f'{path}.tmp'
+
+    with open(temporary_path, 'w') as metrics_file:
+        metrics_file.write(format_metrics(registry))
+    os.replace(temporary_path, path)
+
+
+def run_metrics_exporter(path: str,
+                         registry: MetricsRegistryType,
+                         stop_event: threading.Event) -> None:
+    """
+    Background thread body: rewrites the metrics file periodically
+    until stopped, then writes it for the last time.
+
+    :param path: A path to the metrics file.
+    :param registry: A metrics registry.
+    :param stop_event: An event signalling the exporter to finish.
+    :return: None.
+    """
+    while not stop_event.wait(METRICS_EXPORT_INTERVAL):
+        write_metrics_file(path, registry)
+    write_metrics_file(path, registry)
+
+
+def start_metrics_exporter(path: Optional[str],
+                           registry: MetricsRegistryType = REGISTRY
+                           ) -> Optional[MetricsExporterType]:
+    """
+    Enables the registry and starts writing its metrics file
+    in the background.
+
+    :param path: A path to the metrics file, metrics stay disabled
+    if None.
+    :param registry: A metrics registry.
+    :return: A metrics exporter of MetricsExporterType(TypedDict),
+    None if metrics are disabled.
+    """
+    if path is None:
+        return None
+    registry['enabled'] = True
+    stop_event = threading.Event()
+    exporter_thread = threading.Thread(
+        target=run_metrics_exporter,
+        args=(path, registry, stop_event),
+        name='metrics-exporter',
+        daemon=True)
+    exporter_thread.start()
+
+    metrics_exporter: MetricsExporterType
+    metrics_exporter = {'path': path,
+                        'registry': registry,
+                        'stop_event': stop_event,
+                        'thread': exporter_thread}
+    return metrics_exporter
+
+
+def stop_metrics_exporter(metrics_exporter: Optional[MetricsExporterType]
+                          ) -> None:
+    """
+    Stops the metrics exporter after writing the final metrics.
+
+    :param metrics_exporter: A running metrics exporter, if any.
+    :return: None.
+    """
+    if metrics_exporter is None:
+        return
+    metrics_exporter['stop_event'].set()
+    metrics_exporter['thread'].join()
+    metrics_exporter['registry']['enabled'] = False
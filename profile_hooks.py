@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+import cProfile
+import functools
+import io
+import os
+import pstats
+import tracemalloc
+from typing import Callable, Optional, TypedDict, TypeVar
+
+from constants import (
+    PROFILE_HOOKS_ENV_VAR, PROFILE_HOOKS_DIR_ENV_VAR,
+    PROFILE_HOOKS_MEMORY_CALLS, PROFILE_HOOKS_TOP_STATS)
+
+
+FrameProfileType = TypedDict('FrameProfileType',
+                             {'profile': cProfile.Profile,
+                              'frames_left': int,
+                              'output_dir': str})
+
+TracedFunctionType = TypeVar('TracedFunctionType', bound=Callable)
+
+
+def get_profile_frames(value: Optional[str]) -> int:
+    """
+    Reads the number of frames to profile from the environment
+    variable value.
+
+    :param value: The value of PROFILE_HOOKS_ENV_VAR, if set.
+    :return: The number of frames, 0 if profiling is disabled.
+    :raise ValueError: If the value is not a non-negative integer.
+    """
+    if not value:
+        return 0
+    if not value.isdigit():
+        raise ValueError(f"Profiling error. {PROFILE_HOOKS_ENV_VAR} must be "
+                         f"a number of frames, got {value!r}.")
+    return int(value)
+
+
+# Read once at import, so that disabled hooks are never installed
+PROFILE_FRAMES = get_profile_frames(os.environ.get(PROFILE_HOOKS_ENV_VAR))
+PROFILE_DIR = os.environ.get(PROFILE_HOOKS_DIR_ENV_VAR, '.')
+# Memory reports of traced calls, written out with the frame profile
+MEMORY_REPORTS: list[str] = []
+
+
+def format_memory_report(name: str,
+                         call_number: int,
+                         snapshot: tracemalloc.Snapshot,
+                         peak_size: int) -> str:
+    """
+    Describes the memory a traced call allocated and still holds.
+
+    :param name: A qualified name of the traced function.
+    :param call_number: The number of the call, starting from 1.
+    :param snapshot: A snapshot taken at the end of the call, with
+    tracing started at its beginning.
+    :param peak_size: The peak traced size during the call in bytes.
+    :return: A report of the largest allocations by source line.
+    """
+    statistics = snapshot.statistics('lineno')
+    kept_size = sum(statistic.size for statistic in statistics)
+    lines = [f'{name} call {call_number}: {kept_size / 1024:.1f} KiB kept, '
+             f'{peak_size / 1024:.1f} KiB peak']
+    lines += [f'    {statistic}'
+              for statistic in statistics[:PROFILE_HOOKS_TOP_STATS]]
+    return '\n'.join(lines)
+
+
+def trace_memory(function: TracedFunctionType) -> TracedFunctionType:
+    """
+    Decorates a function to report memory allocated by its first
+    PROFILE_HOOKS_MEMORY_CALLS calls when profiling is enabled.
+    Returns the function itself when profiling is disabled.
+
+    :param function: A function to trace.
+    :return: The traced function, or the given one.
+    """
+    if not PROFILE_FRAMES:
+        return function
+    call_count = 0
+
+    @functools.wraps(function)
+    def traced_function(*args, **kwargs):
+        nonlocal call_count
+        # Tracing slows allocations down, so only a few calls are traced
+        if call_count >= PROFILE_HOOKS_MEMORY_CALLS or (
+                tracemalloc.is_tracing()):
+            return function(*args, **kwargs)
+        call_count += 1
+
+        tracemalloc.start()
+        try:
+            result = function(*args, **kwargs)
+            snapshot = tracemalloc.take_snapshot()
+            _, peak_size = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        MEMORY_REPORTS.append(format_memory_report(
+            function.__qualname__, call_count, snapshot, peak_size))
+        return result
+
+    return traced_function  # type: ignore[return-value]
+
+
+def start_frame_profile(frames: int = PROFILE_FRAMES,
+                        output_dir: str = PROFILE_DIR
+                        ) -> Optional[FrameProfileType]:
+    """
+    Starts profiling the main loop for the given number of frames.
+
+    :param frames: The number of frames to profile, 0 to disable.
+    :param output_dir: A directory to write profiling results to.
+    :return: A frame profile of FrameProfileType(TypedDict), None
+    if profiling is disabled.
+    """
+    if not frames:
+        return None
+    profile = cProfile.Profile()
+    profile.enable()
+
+    frame_profile: FrameProfileType
+    frame_profile = {'profile': profile,
+                     'frames_left': frames,
+                     'output_dir': output_dir}
+    return frame_profile
+
+
+def finish_profiled_frame(frame_profile: Optional[FrameProfileType]) -> None:
+    """
+    Counts a profiled frame and stops profiling after the last one.
+
+    :param frame_profile: A frame profile, if any.
+    :return: None.
+    """
+    if frame_profile is None or frame_profile['frames_left'] == 0:
+        return
+    frame_profile['frames_left'] -= 1
+    if frame_profile['frames_left'] == 0:
+        frame_profile['profile'].disable()
+
+
+def dump_profile_results(frame_profile: Optional[FrameProfileType]) -> None:
+    """
+    Writes the frame profile and the memory reports collected so far:
+    'navalbattle.prof' for pstats and snakeviz, 'navalbattle-profile.txt'
+    with the slowest functions, and 'navalbattle-memory.txt'.
+
+    :param frame_profile: A frame profile, if any.
+    :return: None.
+    """
+    if frame_profile is None:
+        return
+    profile = frame_profile['profile']
+    output_dir = frame_profile['output_dir']
+    # The program may exit before all the frames were profiled
+    profile.disable()
+    os.makedirs(output_dir, exist_ok=True)
+
+    profile.dump_stats(os.path.join(output_dir, 'navalbattle.prof'))
+    stats_text = io.StringIO()
+    stats = pstats.Stats(profile, stream=stats_text)
+    stats.sort_stats('cumulative').print_stats(PROFILE_HOOKS_TOP_STATS)
+
+    with open(os.path.join(output_dir, 'navalbattle-profile.txt'),
+              'w') as profile_file:
+        profile_file.write(stats_text.getvalue())
+    with open(os.path.join(output_dir, 'navalbattle-memory.txt'),
+              'w') as memory_file:
+        memory_file.write('\n\n'.join(MEMORY_REPORTS) + '\n')
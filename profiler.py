@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+import csv
+import statistics
+import time
+from collections import deque
+from typing import Callable, Optional, TextIO, TypedDict, TypeVar
+
+import pygame
+from pygame import KEYUP
+from pygame.event import Event
+from pygame.rect import Rect
+
+from constants import (
+    TextSurfaceType, RenderStateType, PROFILER_HOTKEY, PROFILER_STAGES,
+    PROFILER_WINDOW, PROFILER_OVERLAY_INTERVAL, PROFILER_OVERLAY_TOPLEFT,
+    PROFILER_OVERLAY_LINE_HEIGHT)
+from graphics import make_text_surface, erase_area
+
+
+ProfilerType = TypedDict('ProfilerType',
+                         {'enabled': bool,
+                          'frame_times': dict[str, int],
+                          'samples': dict[str, deque],
+                          'csv_file': Optional[TextIO],
+                          'csv_writer': Optional[csv.DictWriter],
+                          'frame_number': int,
+                          'overlay': list[TextSurfaceType],
+                          'overlay_updated_at': float})
+
+StageResultType = TypeVar('StageResultType')
+
+
+def make_profiler(csv_path: Optional[str] = None) -> ProfilerType:
+    """
+    Creates a disabled frame stage profiler.
+
+    :param csv_path: A path to stream per-frame records to, if any.
+    :return: A profiler of ProfilerType(TypedDict).
+    """
+    csv_file = None
+    csv_writer = None
+
+    if csv_path is not None:
+        csv_file = open(csv_path, 'w', newline='')
+        csv_writer = csv.DictWriter(
+            csv_file, fieldnames=('frame', *PROFILER_STAGES, 'total'))
+        csv_writer.writeheader()
+
+    profiler: ProfilerType
+    profiler = {'enabled': False,
+                'frame_times': dict.fromkeys(PROFILER_STAGES, 0),
+                'samples': {stage: deque(maxlen=PROFILER_WINDOW)
+                            for stage in (*PROFILER_STAGES, 'total')},
+                'csv_file': csv_file,
+                'csv_writer': csv_writer,
+                'frame_number': 0,
+                'overlay': [],
+                'overlay_updated_at': 0.0}
+    return profiler
+
+
+def time_stage(profiler: ProfilerType,
+               stage: str,
+               function: Callable[..., StageResultType],
+               *args) -> StageResultType:
+    """
+    Calls the given function and, if the profiler is enabled, adds
+    its running time to the given stage of the current frame.
+
+    :param profiler: A profiler of ProfilerType(TypedDict).
+    :param stage: A stage name from PROFILER_STAGES.
+    :param function: A function to call.
+    :param args: Arguments of the function.
+    :return: The function result.
+    """
+    if not profiler['enabled']:
+        return function(*args)
+
+    start_time = time.perf_counter_ns()
+    result = function(*args)
+    profiler['frame_times'][stage] += time.perf_counter_ns() - start_time
+    return result
+
+
+def finish_frame(profiler: ProfilerType) -> None:
+    """
+    Stores stage times of the current frame and starts a new one.
+
+    :param profiler: A profiler of ProfilerType(TypedDict).
+    :return: None.
+    """
+    if not profiler['enabled']:
+        return
+
+    frame_times = profiler['frame_times']
+    total_time = sum(frame_times.values())
+
+    for stage, stage_time in frame_times.items():
+        profiler['samples'][stage].append(stage_time)
+    profiler['samples']['total'].append(total_time)
+
+    if profiler['csv_writer'] is not None:
+        profiler['csv_writer'].writerow({'frame': profiler['frame_number'],
+                                         **frame_times,
+                                         'total': total_time})
+
+    profiler['frame_number'] += 1
+    profiler['frame_times'] = dict.fromkeys(PROFILER_STAGES, 0)
+
+
+def get_stage_percentiles(profiler: ProfilerType
+                          ) -> dict[str, tuple[float, float, float]]:
+    """
+    Returns rolling p50, p95 and p99 of every stage time.
+
+    :param profiler: A profiler of ProfilerType(TypedDict).
+    :return: A dictionary of {stage: (p50, p95, p99)} in milliseconds,
+    stages with less than two samples are omitted.
+    """
+    stage_percentiles = {}
+
+    for stage, samples in profiler['samples'].items():
+        if len(samples) >= 2:
+            percentiles = statistics.quantiles(samples, n=100,
+                                               method='inclusive')
+            stage_percentiles[stage] = tuple(
+                percentiles[index] / 1_000_000 for index in (49, 94, 98))
+    return stage_percentiles
+
+
+def erase_overlay(profiler: ProfilerType,
+                  render_state: RenderStateType) -> list[Rect]:
+    """
+    Covers the profiler overlay with the background layer.
+
+    :param profiler: A profiler of ProfilerType(TypedDict).
+    :param render_state: A TypedDict of what is currently on screen.
+    :return: A list of screen areas that have been redrawn.
+    """
+    erased_rects = [line['rect'] for line in profiler['overlay']]
+
+    for rect in erased_rects:
+        erase_area(rect, render_state)
+    profiler['overlay'] = []
+    return erased_rects
+
+
+def make_overlay_lines(profiler: ProfilerType) -> list[TextSurfaceType]:
+    """
+    Renders the current stage percentiles as lines of text.
+
+    :param profiler: A profiler of ProfilerType(TypedDict).
+    :return: A list of overlay lines of TextSurfaceType.
+    """
+    overlay_x, overlay_y = PROFILER_OVERLAY_TOPLEFT
+    overlay_lines = []
+
+    for line_number, (stage, percentiles) in enumerate(
+            get_stage_percentiles(profiler).items()):
+        p50, p95, p99 = percentiles
+        text = f"{stage}: {p50:.2f} / {p95:.2f} / {p99:.2f} ms"
+        line_topleft = (overlay_x,
+                        overlay_y + line_number * PROFILER_OVERLAY_LINE_HEIGHT)
+        overlay_lines.append(make_text_surface(text=text,
+                                               topleft=line_topleft))
+    return overlay_lines
+
+
+def draw_profiler_overlay(profiler: ProfilerType,
+                          render_state: RenderStateType) -> None:
+    """
+    Draws the stage percentiles over the game screen, refreshing
+    them at most every PROFILER_OVERLAY_INTERVAL milliseconds.
+
+    :param profiler: A profiler of ProfilerType(TypedDict).
+    :param render_state: A TypedDict of what is currently on screen.
+    :return: None.
+    """
+    if not profiler['enabled']:
+        return
+
+    dirty_rects = []
+    since_update = time.monotonic() - profiler['overlay_updated_at']
+
+    if since_update * 1000 >= PROFILER_OVERLAY_INTERVAL:
+        dirty_rects += erase_overlay(profiler, render_state)
+        profiler['overlay'] = make_overlay_lines(profiler)
+        profiler['overlay_updated_at'] = time.monotonic()
+
+    # The overlay is drawn every frame since a full redraw wipes it
+    for line in profiler['overlay']:
+        render_state['surface'].blit(line['surf'], line['rect'])
+        dirty_rects.append(line['rect'])
+    pygame.display.update(dirty_rects)
+
+
+def handle_profiler_events(profiler: ProfilerType,
+                           render_state: RenderStateType,
+                           events: list[Event]) -> None:
+    """
+    Turns the profiler on or off when its hotkey is pressed.
+
+    :param profiler: A profiler of ProfilerType(TypedDict).
+    :param render_state: A TypedDict of what is currently on screen.
+    :param events: A list of events to handle.
+    :return: None.
+    """
+    for event in events:
+        if event.type == KEYUP and (
+                event.key == pygame.key.key_code(PROFILER_HOTKEY)):
+            profiler['enabled'] = not profiler['enabled']
+            profiler['frame_times'] = dict.fromkeys(PROFILER_STAGES, 0)
+
+            if not profiler['enabled']:
+                pygame.display.update(erase_overlay(profiler, render_state))
+
+
+def close_profiler(profiler: ProfilerType) -> None:
+    """
+    Closes the CSV stream of the profiler, if any.
+
+    :param profiler: A profiler of ProfilerType(TypedDict).
+    :return: None.
+    """
+    if profiler['csv_file'] is not None:
+        profiler['csv_file'].close()
@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+import queue
+import sqlite3
+import threading
+import time
+from typing import TypedDict
+
+from constants import (
+    GameDataType, GameBoardType, GameResultType,
+    RESULTS_DB_PATH, RESULTS_BATCH_SIZE, RESULTS_FLUSH_INTERVAL)
+
+
+ResultsStoreType = TypedDict('ResultsStoreType',
+                             {'db_path': str,
+                              'queue': queue.SimpleQueue,
+                              'stop_event': threading.Event,
+                              'thread': threading.Thread})
+
+CREATE_RESULTS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS game_results (
+        id INTEGER PRIMARY KEY,
+        winner TEXT NOT NULL,
+        player_shots INTEGER NOT NULL,
+        ai_shots INTEGER NOT NULL,
+        duration REAL NOT NULL,
+        ai_mode TEXT NOT NULL,
+        finished_at REAL NOT NULL)"""
+CREATE_RESULTS_INDEXES_SQL = (
+    """CREATE INDEX IF NOT EXISTS idx_results_mode_winner
+       ON game_results (ai_mode, winner)""",
+    """CREATE INDEX IF NOT EXISTS idx_results_winner_shots
+       ON game_results (winner, player_shots, ai_shots)""")
+INSERT_RESULT_SQL = """
+    INSERT INTO game_results
+        (winner, player_shots, ai_shots, duration, ai_mode, finished_at)
+    VALUES
+        (:winner, :player_shots, :ai_shots, :duration, :ai_mode, :finished_at)
+    """
+
+
+def open_results_db(db_path: str = RESULTS_DB_PATH) -> sqlite3.Connection:
+    """
+    Opens the results database, creating the table and its indexes
+    if they do not exist yet.
+
+    :param db_path: A path to the SQLite database file.
+    :return: An open database connection.
+    """
+    connection = sqlite3.connect(db_path)
+    # WAL lets the aggregate queries read while the writer flushes
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    with connection:
+        connection.execute(CREATE_RESULTS_TABLE_SQL)
+        for index_sql in CREATE_RESULTS_INDEXES_SQL:
+            connection.execute(index_sql)
+    return connection
+
+
+def count_shots(board: GameBoardType) -> int:
+    """
+    Counts tiles of the given board that have been shot at.
+
+    :param board: A game board of GameBoardType(TypedDict).
+    :return: The number of shots made at the board.
+    """
+    return sum(1 for column in board['tiles'] for tile in column
+               if tile['hit_result'] is not None)
+
+
+def make_game_result(game_data: GameDataType) -> GameResultType:
+    """
+    Creates a result record of the finished game.
+
+    :param game_data: A TypedDict of finished game state variables.
+    :return: A game result record of GameResultType(TypedDict).
+    """
+    player_won = len(game_data['enemy_board']['targets']) == 0
+
+    game_result: GameResultType
+    game_result = {'winner': 'player' if player_won else 'ai',
+                   'player_shots': count_shots(game_data['enemy_board']),
+                   'ai_shots': count_shots(game_data['player_board']),
+                   'duration': time.monotonic() - game_data['start_time'],
+                   'ai_mode': game_data['ai_mode'],
+                   'finished_at': time.time()}
+    return game_result
+
+
+def flush_results(connection: sqlite3.Connection,
+                  records: list[GameResultType]) -> None:
+    """
+    Writes the given records to the database in a single transaction.
+
+    :param connection: An open results database connection.
+    :param records: A list of game results to write.
+    :return: None.
+    """
+    if records:
+        with connection:
+            connection.executemany(INSERT_RESULT_SQL, records)
+
+
+def collect_batch(results_queue: queue.SimpleQueue,
+                  timeout: float) -> list[GameResultType]:
+    """
+    Waits for the first queued record and collects a batch of records
+    that are ready by that time.
+
+    :param results_queue: A queue of pending game results.
+    :param timeout: Maximal time to wait for the first record in seconds.
+    :return: A list of up to RESULTS_BATCH_SIZE records, may be empty.
+    """
+    try:
+        records = [results_queue.get(timeout=timeout)]
+    except queue.Empty:
+        return []
+
+    while len(records) < RESULTS_BATCH_SIZE:
+        try:
+            records.append(results_queue.get_nowait())
+        except queue.Empty:
+            break
+    # None is the wake-up sentinel put by stop_results_store()
+    return [record for record in records if record is not None]
+
+
+def run_results_writer(db_path: str,
+                       results_queue: queue.SimpleQueue,
+                       stop_event: threading.Event) -> None:
+    """
+    Background thread body: flushes queued results in batches until
+    stopped, then drains whatever is left in the queue.
+
+    :param db_path: A path to the SQLite database file.
+    :param results_queue: A queue of pending game results.
+    :param stop_event: An event signalling the writer to finish.
+    :return: None.
+    """
+    connection = open_results_db(db_path)
+    try:
+        while not stop_event.is_set():
+            flush_results(connection,
+                          collect_batch(results_queue, RESULTS_FLUSH_INTERVAL))
+
+        while not results_queue.empty():
+            flush_results(connection, collect_batch(results_queue, timeout=0))
+    finally:
+        connection.close()
+
+
+def start_results_store(db_path: str = RESULTS_DB_PATH) -> ResultsStoreType:
+    """
+    Starts the background writer of game results.
+
+    :param db_path: A path to the SQLite database file.
+    :return: A results store of ResultsStoreType(TypedDict).
+    """
+    results_queue: queue.SimpleQueue = queue.SimpleQueue()
+    stop_event = threading.Event()
+    writer_thread = threading.Thread(
+        target=run_results_writer,
+        args=(db_path, results_queue, stop_event),
+        name='results-writer',
+        daemon=True)
+    writer_thread.start()
+
+    results_store: ResultsStoreType
+    results_store = {'db_path': db_path,
+                     'queue': results_queue,
+                     'stop_event': stop_event,
+                     'thread': writer_thread}
+    return results_store
+
+
+def record_game_result(results_store: ResultsStoreType,
+                       game_result: GameResultType) -> None:
+    """
+    Queues the given game result for writing. Never blocks the caller.
+
+    :param results_store: A running results store.
+    :param game_result: A game result record to save.
+    :return: None.
+    """
+    results_store['queue'].put_nowait(game_result)
+
+
+def stop_results_store(results_store: ResultsStoreType) -> None:
+    """
+    Stops the background writer after all queued results are written.
+
+    :param results_store: A running results store.
+    :return: None.
+    """
+    results_store['stop_event'].set()
+    results_store['queue'].put_nowait(None)
+    results_store['thread'].join()
+
+
+def get_win_rate_by_ai_mode(db_path: str = RESULTS_DB_PATH
+                            ) -> dict[str, float]:
+    """
+    Returns the human win ratio for each AI mode.
+
+    :param db_path: A path to the SQLite database file.
+    :return: A dictionary of {ai_mode: player win ratio} format.
+    """
+    connection = open_results_db(db_path)
+    try:
+        rows = connection.execute(
+            """SELECT ai_mode,
+                      AVG(winner = 'player')
+               FROM game_results
+               GROUP BY ai_mode""").fetchall()
+    finally:
+        connection.close()
+    return {ai_mode: win_rate for ai_mode, win_rate in rows}
+
+
+def get_shot_count_histogram(winner: str,
+                             db_path: str = RESULTS_DB_PATH
+                             ) -> dict[int, int]:
+    """
+    Returns the distribution of the winner's shot count over the games
+    won by the given side.
+
+    :param winner: The winning side, 'player' or 'ai'.
+    :param db_path: A path to the SQLite database file.
+    :return: A dictionary of {shot count: number of games} format.
+    """
+    if winner == 'player':
+        shots_column = 'player_shots'
+    elif winner == 'ai':
+        shots_column = 'ai_shots'
+    else:
+        raise ValueError("Shot count histogram error. Invalid winner, "
+                         "must be 'player' or 'ai'.")
+
+    connection = open_results_db(db_path)
+    try:
+        rows = connection.execute(
+            f"""SELECT {shots_column}, COUNT(*)
+                FROM game_results
+                WHERE winner = ?
+                GROUP BY {shots_column}
+                ORDER BY {shots_column}""", (winner,)).fetchall()
+    finally:
+        connection.close()
+    return {shots: games for shots, games in rows}
@@ -0,0 +1,584 @@
+# -*- coding: utf-8 -*-
+import math
+import time
+from functools import lru_cache
+from typing import Optional
+
+import pygame
+from pygame import QUIT, KEYUP, K_ESCAPE, MOUSEBUTTONUP, MOUSEMOTION
+from pygame.event import Event
+from pygame.rect import Rect
+from pygame.surface import Surface
+
+from ai import set_up_ai, get_ai_move
+from board_generator import get_random_board
+from constants import (
+    SimulGameType, SimulLayoutType, SimulDataType, SimulRenderStateType,
+    GameBoardType, GameResultType, TextSurfaceType, RuleSet,
+    DEFAULT_AI_MODE, DEFAULT_RULES, BG_COLOR, MESSAGE_TOPLEFT,
+    SIMUL_MAX_BOARDS, SIMUL_MAX_TILE_SIZE, SIMUL_MIN_TILE_SIZE,
+    SIMUL_GRID_TOPLEFT, SIMUL_GRID_SIZE, SIMUL_CELL_GAP, SIMUL_BOARD_GAP,
+    SIMUL_SCORE_TEXT, SIMUL_OVER_TEXT)
+from controls import quit_program
+from game_engine import (get_reference_to_tile, mark_shot_result,
+                         victory_achieved)
+from graphics import (make_text_surface, make_surface, get_tile_color,
+                      get_lighter_shade)
+from thumbnails import render_board_pixels
+
+
+SimulMoveType = tuple[int, tuple[int, int]]
+
+
+def get_player_tile_size(tile_size: int) -> int:
+    """
+    Returns the tile size of player boards, which are drawn smaller
+    than enemy boards as the player only watches them.
+
+    :param tile_size: The enemy board tile size, grid line included.
+    :return: The player board tile size, grid line included.
+    """
+    return max(tile_size // 2, 3)
+
+
+def get_cell_size(tile_size: int, rules: RuleSet) -> tuple[int, int]:
+    """
+    Returns the screen space one game of the simul takes: the enemy
+    board, the player board on its right and the gaps.
+
+    :param tile_size: The enemy board tile size, grid line included.
+    :param rules: A RuleSet of the simul.
+    :return: The cell size in (width, height) format.
+    """
+    enemy_board_width = rules.board_width * tile_size + 1
+    player_board_width = (rules.board_width * get_player_tile_size(tile_size)
+                          + 1)
+    board_height = rules.board_height * tile_size + 1
+    return (enemy_board_width + SIMUL_BOARD_GAP + player_board_width
+            + SIMUL_CELL_GAP, board_height + SIMUL_CELL_GAP)
+
+
+@lru_cache()
+def get_simul_layout(count: int,
+                     rules: RuleSet = DEFAULT_RULES) -> SimulLayoutType:
+    """
+    Lays out the given number of games in a grid with the biggest tiles
+    that fit the simul area of the window.
+
+    :param count: The number of games.
+    :param rules: A RuleSet of the simul.
+    :return: A shared layout of SimulLayoutType(TypedDict), must not
+    be modified.
+    """
+    grid_width, grid_height = SIMUL_GRID_SIZE
+    best_fit = None
+
+    for columns in range(1, count + 1):
+        rows = math.ceil(count / columns)
+        for tile_size in range(SIMUL_MAX_TILE_SIZE, SIMUL_MIN_TILE_SIZE - 1,
+                               -1):
+            cell_width, cell_height = get_cell_size(tile_size, rules)
+            # The last column and row need no gap after them
+            fits = (columns * cell_width <= grid_width + SIMUL_CELL_GAP
+                    and rows * cell_height <= grid_height + SIMUL_CELL_GAP)
+            if fits:
+                if best_fit is None or tile_size > best_fit[0]:
+                    best_fit = (tile_size, columns)
+                break
+
+    if best_fit is None:
+        raise ValueError("Simul layout error. The boards do not fit "
+                         "the window.")
+
+    tile_size, columns = best_fit
+    rows = math.ceil(count / columns)
+    cell_width, cell_height = get_cell_size(tile_size, rules)
+    player_tile_size = get_player_tile_size(tile_size)
+    origin_x = SIMUL_GRID_TOPLEFT[0] + (
+            grid_width + SIMUL_CELL_GAP - columns * cell_width) // 2
+    origin_y = SIMUL_GRID_TOPLEFT[1] + (
+            grid_height + SIMUL_CELL_GAP - rows * cell_height) // 2
+
+    enemy_boards = []
+    player_boards = []
+    for game_number in range(count):
+        row, column = divmod(game_number, columns)
+        enemy_board = Rect(origin_x + column * cell_width,
+                           origin_y + row * cell_height,
+                           rules.board_width * tile_size + 1,
+                           rules.board_height * tile_size + 1)
+        enemy_boards.append(enemy_board)
+        player_boards.append(Rect(enemy_board.right + SIMUL_BOARD_GAP,
+                                  enemy_board.top,
+                                  rules.board_width * player_tile_size + 1,
+                                  rules.board_height * player_tile_size + 1))
+
+    layout: SimulLayoutType
+    layout = {'columns': columns,
+              'tile_size': tile_size,
+              'player_tile_size': player_tile_size,
+              'origin': (origin_x, origin_y),
+              'cell_size': (cell_width, cell_height),
+              'enemy_boards': enemy_boards,
+              'player_boards': player_boards}
+    return layout
+
+
+def get_simul_tile_at_pixel(pixel_coords: tuple[int, int],
+                            layout: SimulLayoutType
+                            ) -> Optional[SimulMoveType]:
+    """
+    Returns the enemy board tile at the given pixel coordinates.
+    The game is found from the grid cell the pixel is in, so the time
+    does not depend on the number of boards.
+
+    :param pixel_coords: A tuple of pixel coordinates in (x, y) format.
+    :param layout: A simul layout of SimulLayoutType(TypedDict).
+    :return: A tuple of (game number, tile coordinates in (x, y)
+    format) if there is an enemy tile at the pixel, else None.
+    """
+    pixel_x, pixel_y = pixel_coords
+    origin_x, origin_y = layout['origin']
+    cell_width, cell_height = layout['cell_size']
+    column = (pixel_x - origin_x) // cell_width
+    row = (pixel_y - origin_y) // cell_height
+    game_number = row * layout['columns'] + column
+
+    if not (0 <= column < layout['columns']
+            and 0 <= game_number < len(layout['enemy_boards'])):
+        return None
+
+    board_rect = layout['enemy_boards'][game_number]
+    board_x, offset_x = divmod(pixel_x - board_rect.left, layout['tile_size'])
+    board_y, offset_y = divmod(pixel_y - board_rect.top, layout['tile_size'])
+
+    # Grid lines and the gaps around the board belong to no tile
+    if not board_rect.collidepoint(pixel_coords) or not (offset_x
+                                                         and offset_y):
+        return None
+    return game_number, (board_x, board_y)
+
+
+def set_up_simul_game(game_number: int,
+                      layout: SimulLayoutType,
+                      rules: RuleSet) -> SimulGameType:
+    """
+    Creates one game of the simul: its boards and AI data.
+
+    :param game_number: A number of the game in the simul.
+    :param layout: A simul layout of SimulLayoutType(TypedDict).
+    :param rules: A RuleSet of the simul.
+    :return: A simul game of SimulGameType(TypedDict).
+    """
+    simul_game: SimulGameType
+    simul_game = {'player_board': get_random_board(
+                      layout['player_boards'][game_number].topleft,
+                      rules=rules),
+                  'enemy_board': get_random_board(
+                      layout['enemy_boards'][game_number].topleft,
+                      rules=rules),
+                  'ai_data': set_up_ai(rules),
+                  'winner': None,
+                  'player_shots': 0,
+                  'ai_shots': 0,
+                  'start_time': time.monotonic()}
+    return simul_game
+
+
+def make_simul_message(games: list[SimulGameType]) -> str:
+    """
+    Creates the screen message text with the simul score.
+
+    :param games: A list of simul games of SimulGameType(TypedDict).
+    :return: A message text.
+    """
+    winners = [game['winner'] for game in games]
+    won = winners.count('player')
+    lost = winners.count('ai')
+    playing = winners.count(None)
+
+    if playing:
+        return SIMUL_SCORE_TEXT.format(won=won, lost=lost, playing=playing)
+    return SIMUL_OVER_TEXT.format(won=won, lost=lost)
+
+
+def set_up_simul(count: int,
+                 ai_mode: str = DEFAULT_AI_MODE,
+                 rules: RuleSet = DEFAULT_RULES) -> SimulDataType:
+    """
+    Creates a TypedDict of new simul state variables: a game against
+    its own AI on every board of the grid.
+
+    :param count: The number of games, from 1 to SIMUL_MAX_BOARDS.
+    :param ai_mode: An AI mode from AI_MODES every enemy plays with.
+    :param rules: A RuleSet of all games.
+    :return: A TypedDict of simul state variables.
+    """
+    if not 1 <= count <= SIMUL_MAX_BOARDS:
+        raise ValueError(f"Simul setting up error. The number of games "
+                         f"must be from 1 to {SIMUL_MAX_BOARDS}.")
+
+    layout = get_simul_layout(count, rules)
+    games = [set_up_simul_game(game_number, layout, rules)
+             for game_number in range(count)]
+
+    simul_data: SimulDataType
+    simul_data = {'games': games,
+                  'ai_mode': ai_mode,
+                  'rules': rules,
+                  'layout': layout,
+                  'enemy_is_hidden': True,
+                  'screen_message': make_simul_message(games),
+                  'mouse_position_tile': None}
+    return simul_data
+
+
+def get_simul_move_at_pixel(pixel_coords: tuple[int, int],
+                            simul_data: SimulDataType
+                            ) -> Optional[SimulMoveType]:
+    """
+    Returns the enemy tile at the given pixel if the player can shoot
+    it: the game is not over and the tile was not shot yet.
+
+    :param pixel_coords: A tuple of pixel coordinates in (x, y) format.
+    :param simul_data: A TypedDict of simul state variables.
+    :return: A tuple of (game number, tile coordinates in (x, y)
+    format) or None.
+    """
+    simul_move = get_simul_tile_at_pixel(pixel_coords, simul_data['layout'])
+
+    if simul_move is not None:
+        game_number, tile_coords = simul_move
+        game = simul_data['games'][game_number]
+        tile = get_reference_to_tile(tile_coords, game['enemy_board'])
+
+        if game['winner'] is None and tile['hit_result'] is None:
+            return simul_move
+    return None
+
+
+def play_simul_move(simul_move: SimulMoveType,
+                    simul_data: SimulDataType) -> SimulDataType:
+    """
+    Marks the player shot on the chosen enemy board and lets the AI
+    of that game answer at once.
+
+    :param simul_move: A tuple of (game number, tile coordinates
+    in (x, y) format).
+    :param simul_data: A TypedDict of simul state variables.
+    :return: A TypedDict of simul state variables with the game
+    updated.
+    """
+    game_number, tile_coords = simul_move
+    game = simul_data['games'][game_number]
+
+    game['enemy_board'] = mark_shot_result(tile_coords, game['enemy_board'])
+    game['player_shots'] += 1
+
+    if victory_achieved(game['enemy_board']):
+        game['winner'] = 'player'
+    else:
+        ai_move, game['ai_data'] = get_ai_move(game['ai_data'],
+                                               game['player_board'],
+                                               simul_data['ai_mode'],
+                                               rules=simul_data['rules'])
+        game['player_board'] = mark_shot_result(ai_move,
+                                                game['player_board'])
+        game['ai_shots'] += 1
+
+        if victory_achieved(game['player_board']):
+            game['winner'] = 'ai'
+
+    simul_data['screen_message'] = make_simul_message(simul_data['games'])
+    return simul_data
+
+
+def make_simul_game_result(game: SimulGameType,
+                           ai_mode: str) -> GameResultType:
+    """
+    Creates a result record of the finished simul game.
+
+    :param game: A finished simul game of SimulGameType(TypedDict).
+    :param ai_mode: An AI mode from AI_MODES the enemy played with.
+    :return: A game result record of GameResultType(TypedDict).
+    :raise RuntimeError: If the game is not finished.
+    """
+    if game['winner'] is None:
+        raise RuntimeError("Simul error. Only finished games can be "
+                           "recorded.")
+
+    game_result: GameResultType
+    game_result = {'winner': game['winner'],
+                   'player_shots': game['player_shots'],
+                   'ai_shots': game['ai_shots'],
+                   'duration': time.monotonic() - game['start_time'],
+                   'ai_mode': ai_mode,
+                   'finished_at': time.time()}
+    return game_result
+
+
+def handle_simul_button_click(click_coords: tuple[int, int],
+                              buttons: dict[str, TextSurfaceType],
+                              simul_data: SimulDataType) -> SimulDataType:
+    """
+    Does appropriate action if one of the menu buttons have been
+    pressed.
+
+    :param click_coords: Mouse click pixel coordinates in (x, y)
+    format.
+    :param buttons: A dictionary containing menu buttons
+    of TextSurfaceType.
+    :param simul_data: A TypedDict of simul state variables.
+    :return: An updated TypedDict of simul state variables.
+    """
+    if buttons['newgame']['rect'].collidepoint(click_coords):
+        simul_data = set_up_simul(len(simul_data['games']),
+                                  simul_data['ai_mode'], simul_data['rules'])
+
+    elif buttons['reveal_enemy']['rect'].collidepoint(click_coords):
+        simul_data['enemy_is_hidden'] = not simul_data['enemy_is_hidden']
+
+    elif buttons['quit']['rect'].collidepoint(click_coords):
+        quit_program()
+
+    return simul_data
+
+
+def handle_simul_events(simul_data: SimulDataType,
+                        buttons: dict[str, TextSurfaceType],
+                        events: list[Event]
+                        ) -> tuple[SimulDataType, Optional[SimulMoveType]]:
+    """
+    Handles events of the simul: mouse movement and click, closing
+    the game window or pressing ESC button.
+
+    :param simul_data: A TypedDict of simul state variables.
+    :param buttons: A dictionary containing menu buttons
+    of TextSurfaceType.
+    :param events: A list of events to handle.
+    :return: A tuple of updated simul data and a player move
+    as (game number, tile coordinates in (x, y) format).
+    """
+    simul_move = None
+
+    for event in events:
+        window_was_closed = (event.type == QUIT)
+        esc_was_pressed = (event.type == KEYUP and event.key == K_ESCAPE)
+        mouse_was_moved = (event.type == MOUSEMOTION)
+        mouse_was_clicked = (event.type == MOUSEBUTTONUP)
+
+        if window_was_closed or esc_was_pressed:
+            quit_program()
+
+        elif mouse_was_moved:
+            simul_data['mouse_position_tile'] = get_simul_move_at_pixel(
+                event.pos, simul_data)
+
+        elif mouse_was_clicked:
+            simul_move = get_simul_move_at_pixel(event.pos, simul_data)
+            simul_data = handle_simul_button_click(event.pos, buttons,
+                                                   simul_data)
+            # The shot tile can not be shot again, so it is not lighted
+            simul_data['mouse_position_tile'] = None
+
+    return simul_data, simul_move
+
+
+def render_simul_board(board: GameBoardType,
+                       tile_size: int,
+                       is_hidden: bool = False,
+                       lighted_tile: Optional[tuple[int, int]] = None
+                       ) -> Surface:
+    """
+    Renders the given board with the array renderer, which is much
+    faster than blitting tile sprites when tiles are small.
+
+    :param board: A game board of GameBoardType(TypedDict).
+    :param tile_size: Tile size in pixels, grid line included.
+    :param is_hidden: 'True' if the board belongs to the enemy
+    and needs to be hidden.
+    :param lighted_tile: Coordinates of the tile under the mouse
+    in (x, y) format, if any.
+    :return: A board surface.
+    """
+    pixels = render_board_pixels(board, tile_size, is_hidden)
+
+    if lighted_tile is not None:
+        board_x, board_y = lighted_tile
+        tile = get_reference_to_tile(lighted_tile, board)
+        pixels[board_x * tile_size + 1:(board_x + 1) * tile_size,
+               board_y * tile_size + 1:(board_y + 1) * tile_size] = (
+            get_lighter_shade(get_tile_color(tile, is_hidden)))
+    return pygame.surfarray.make_surface(pixels)
+
+
+def get_board_keys(game_number: int,
+                   simul_data: SimulDataType) -> dict[tuple[int, str], tuple]:
+    """
+    Returns keys that change whenever the look of the boards
+    of the given game does.
+
+    :param game_number: A number of the game in the simul.
+    :param simul_data: A TypedDict of simul state variables.
+    :return: A dictionary of hashable keys by (game number, 'enemy')
+    and (game number, 'player').
+    """
+    game = simul_data['games'][game_number]
+    lighted_tile = None
+    mouse_position_tile = simul_data['mouse_position_tile']
+    if mouse_position_tile is not None and (
+            mouse_position_tile[0] == game_number):
+        lighted_tile = mouse_position_tile[1]
+
+    # A new game of the same grid cell has a new start time
+    enemy_is_hidden = simul_data['enemy_is_hidden'] and game['winner'] is None
+    return {(game_number, 'enemy'): (game['start_time'], game['player_shots'],
+                                     enemy_is_hidden, lighted_tile),
+            (game_number, 'player'): (game['start_time'], game['ai_shots'])}
+
+
+def draw_changed_simul_boards(game_number: int,
+                              simul_data: SimulDataType,
+                              render_state: SimulRenderStateType
+                              ) -> list[Rect]:
+    """
+    Draws boards of the given game whose look has changed since they
+    were drawn last time.
+
+    :param game_number: A number of the game in the simul.
+    :param simul_data: A TypedDict of simul state variables.
+    :param render_state: A TypedDict of what is currently on screen.
+    :return: A list of screen areas that have been redrawn.
+    """
+    game = simul_data['games'][game_number]
+    layout = simul_data['layout']
+    changed_rects = []
+
+    for board_key, look_key in get_board_keys(game_number,
+                                              simul_data).items():
+        if render_state['board_keys'].get(board_key) == look_key:
+            continue
+        render_state['board_keys'][board_key] = look_key
+
+        if board_key[1] == 'enemy':
+            board_surface = render_simul_board(game['enemy_board'],
+                                               layout['tile_size'],
+                                               look_key[2], look_key[3])
+            board_rect = layout['enemy_boards'][game_number]
+        else:
+            board_surface = render_simul_board(game['player_board'],
+                                               layout['player_tile_size'])
+            board_rect = layout['player_boards'][game_number]
+
+        render_state['surface'].blit(board_surface, board_rect)
+        changed_rects.append(board_rect)
+    return changed_rects
+
+
+def draw_simul_message(text: str,
+                       render_state: SimulRenderStateType) -> list[Rect]:
+    """
+    Replaces the message on screen if the given one differs from it.
+
+    :param text: A message text to show.
+    :param render_state: A TypedDict of what is currently on screen.
+    :return: A list of screen areas that have been redrawn.
+    :raise RuntimeError: If the background has not been drawn yet.
+    """
+    last_message = render_state['screen_message']
+    # Rendered texts are cached, so the same text has the same surface
+    screen_message = make_text_surface(text=text, topleft=MESSAGE_TOPLEFT)
+    changed_rects = []
+
+    if last_message is None or screen_message['surf'] is not (
+            last_message['surf']):
+        if last_message is not None:
+            # The message is drawn over the background, so it is composed
+            if render_state['background'] is None:
+                raise RuntimeError("Rendering error. The simul message can "
+                                   "not be erased before the background "
+                                   "is drawn.")
+            render_state['surface'].blit(render_state['background'],
+                                         last_message['rect'],
+                                         last_message['rect'])
+            changed_rects.append(last_message['rect'])
+
+        render_state['surface'].blit(screen_message['surf'],
+                                     screen_message['rect'])
+        changed_rects.append(screen_message['rect'])
+        render_state['screen_message'] = screen_message
+    return changed_rects
+
+
+def draw_simul_background(buttons: dict[str, TextSurfaceType],
+                          render_state: SimulRenderStateType) -> list[Rect]:
+    """
+    Covers the whole display surface with the background and buttons,
+    composing them on the first call.
+
+    :param buttons: A dictionary containing menu buttons
+    of TextSurfaceType.
+    :param render_state: A TypedDict of what is currently on screen.
+    :return: A list with the whole screen area.
+    """
+    background = render_state['background']
+
+    if background is None:
+        background = make_surface(render_state['surface'].get_size())
+        background.fill(BG_COLOR)
+        for _, button in buttons.items():
+            background.blit(button['surf'], button['rect'])
+        render_state['background'] = background
+
+    render_state['surface'].blit(background, (0, 0))
+
+    # Nothing dynamic is on screen anymore
+    render_state['board_keys'].clear()
+    render_state['screen_message'] = None
+    render_state['full_redraw'] = False
+    return [render_state['surface'].get_rect()]
+
+
+def make_simul_render_state(surface: Surface) -> SimulRenderStateType:
+    """
+    Creates a TypedDict tracking what is currently drawn on screen.
+
+    :param surface: The display surface to draw the simul on.
+    :return: A render state that requests the full screen redraw.
+    """
+    render_state: SimulRenderStateType
+    render_state = {'surface': surface,
+                    'full_redraw': True,
+                    'background': None,
+                    'board_keys': {},
+                    'screen_message': None}
+    return render_state
+
+
+def draw_simul_screen(simul_data: SimulDataType,
+                      buttons: dict[str, TextSurfaceType],
+                      render_state: SimulRenderStateType) -> None:
+    """
+    Draws the simul on the display surface of the given render state.
+    Only boards changed since the previous call are rendered again,
+    so a move costs two small boards whatever the number of games is.
+
+    :param simul_data: A TypedDict of simul state variables.
+    :param buttons: A dictionary containing menu buttons
+    of TextSurfaceType.
+    :param render_state: A TypedDict of what is currently on screen.
+    :return: None.
+    """
+    dirty_rects = []
+
+    if render_state['full_redraw']:
+        dirty_rects += draw_simul_background(buttons, render_state)
+
+    dirty_rects += draw_simul_message(simul_data['screen_message'],
+                                      render_state)
+    for game_number in range(len(simul_data['games'])):
+        dirty_rects += draw_changed_simul_boards(game_number, simul_data,
+                                                 render_state)
+
+    if dirty_rects:
+        pygame.display.update(dirty_rects)
@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import random
+import statistics
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Any, Optional
+
+from ai import set_up_ai, get_ai_move, ship_was_hitted
+from analytics import make_game_log_line
+from board_corpus import (
+    BoardCorpusType, create_board_corpus, attach_board_corpus,
+    get_corpus_board)
+from board_generator import get_random_board
+from constants import (
+    GameBoardType, AIDataType, RuleSet, PLAYER_BOARD_TOPLEFT, DEFAULT_AI_MODE,
+    DEFAULT_RULES, SIMULATION_CHUNK_SIZE, SIMULATION_LATENCY_BUCKET)
+
+
+# The board corpus a worker process is attached to, if any
+WORKER_CORPUS: dict[str, BoardCorpusType] = {}
+
+
+def make_game_rng(seed: int, game_number: int, stream: str) -> random.Random:
+    """
+    Creates a random generator of one stream of the given game.
+    Streams depend only on the seed and the game number, so results
+    do not depend on which worker plays the game.
+
+    :param seed: A seed of the whole simulation.
+    :param game_number: A number of the game in the simulation.
+    :param stream: A name of the stream, 'board' or 'ai'.
+    :return: A seeded random generator.
+    """
+    return random.Random(f'{seed}:{game_number}:{stream}')
+
+
+def make_board_corpus(games: int,
+                      seed: int,
+                      rules: RuleSet = DEFAULT_RULES) -> BoardCorpusType:
+    """
+    Generates the boards of the given simulation into shared memory,
+    so that several simulations with the same seed can reuse them.
+
+    :param games: The number of games.
+    :param seed: A seed of the simulation.
+    :param rules: A RuleSet of the simulation.
+    :return: A board corpus of BoardCorpusType(TypedDict), the caller
+    must close it with unlink=True when done.
+    """
+    boards = (get_random_board(PLAYER_BOARD_TOPLEFT,
+                               make_game_rng(seed, game_number, 'board'),
+                               rules)
+              for game_number in range(games))
+    return create_board_corpus(boards, games, seed, rules)
+
+
+def attach_worker_corpus(name: str,
+                         count: int,
+                         seed: int,
+                         rules: RuleSet) -> None:
+    """
+    Attaches a worker process to a board corpus. Used as a process
+    pool initializer.
+
+    :param name: The shared memory block name of the corpus.
+    :param count: The number of boards in the corpus.
+    :param seed: A seed of the simulation the boards are for.
+    :param rules: A RuleSet the boards were generated with.
+    :return: None.
+    """
+    WORKER_CORPUS['corpus'] = attach_board_corpus(name, count, seed, rules)
+
+
+def get_pool_options(board_corpus: Optional[BoardCorpusType]
+                     ) -> dict[str, Any]:
+    """
+    Returns process pool options attaching workers to the given corpus.
+
+    :param board_corpus: A board corpus of BoardCorpusType, if any.
+    :return: Keyword arguments for ProcessPoolExecutor.
+    """
+    if board_corpus is None:
+        return {}
+    return {'initializer': attach_worker_corpus,
+            'initargs': (board_corpus['shared_memory'].name,
+                         len(board_corpus['tiles']),
+                         board_corpus['seed'],
+                         board_corpus['rules'])}
+
+
+def get_game_board(seed: int,
+                   game_number: int,
+                   rules: RuleSet = DEFAULT_RULES) -> GameBoardType:
+    """
+    Returns the board of the given game, decoded from the worker board
+    corpus if it has one, else generated.
+
+    :param seed: A seed of the whole simulation.
+    :param game_number: A number of the game in the simulation.
+    :param rules: A RuleSet of the simulation.
+    :return: A game board of GameBoardType(TypedDict).
+    """
+    board = get_corpus_board(WORKER_CORPUS.get('corpus'), seed, game_number,
+                             rules)
+
+    if board is None:
+        board = get_random_board(PLAYER_BOARD_TOPLEFT,
+                                 make_game_rng(seed, game_number, 'board'),
+                                 rules)
+    return board
+
+
+def is_probing_after_first_hit(ai_data: AIDataType) -> bool:
+    """
+    Checks if the next AI move probes directions around a first hit,
+    which happens while a bigger ship than the one hit is afloat.
+
+    :param ai_data: A TypedDict of AI state variables.
+    :return: True if the AI is probing, else False.
+    """
+    return (ai_data['state'] == 'attack'
+            and len(ai_data['hit_moves']) == 1
+            and max(ai_data['ships_on_board_by_size'], default=0) > 1)
+
+
+def play_simulated_game(seed: int,
+                        game_number: int,
+                        ai_mode: str = DEFAULT_AI_MODE,
+                        board: Optional[GameBoardType] = None,
+                        rules: RuleSet = DEFAULT_RULES,
+                        log: Optional[list[str]] = None
+                        ) -> tuple[int, Counter]:
+    """
+    Lets the AI sink a random fleet without any graphics.
+
+    :param seed: A seed of the whole simulation.
+    :param game_number: A number of the game in the simulation.
+    :param ai_mode: An AI mode from AI_MODES.
+    :param board: The board of the game, found by get_game_board
+    if None. The board is not modified.
+    :param rules: A RuleSet of the simulation.
+    :param log: A list to append the game log line to, if any.
+    :return: The number of shots the AI made and a Counter of its move
+    times in SIMULATION_LATENCY_BUCKET nanosecond buckets.
+    """
+    if board is None:
+        board = get_game_board(seed, game_number, rules)
+    ai_rng = make_game_rng(seed, game_number, 'ai')
+    ai_data = set_up_ai(rules)
+    targets_left = len(board['targets'])
+    shots = 0
+    move_times: Counter = Counter()
+    moves: list[tuple[int, int]] = []
+    hits: list[bool] = []
+    exhausted_probes = 0
+
+    while targets_left > 0:
+        was_probing = log is not None and is_probing_after_first_hit(ai_data)
+        start_time = time.perf_counter_ns()
+        move, ai_data = get_ai_move(ai_data, board, ai_mode, ai_rng, rules)
+        move_time = time.perf_counter_ns() - start_time
+
+        move_times[move_time // SIMULATION_LATENCY_BUCKET] += 1
+        shots += 1
+        is_hit = ship_was_hitted(move, board)
+        # The AI never shoots the same tile twice
+        if is_hit:
+            targets_left -= 1
+
+        if log is not None:
+            moves.append(move)
+            hits.append(is_hit)
+            # Out of directions the AI searches, and may hit a new ship
+            exhausted_probes += was_probing and (
+                ai_data['state'] == 'search' or ai_data['hit_moves'] == [move])
+    if log is not None:
+        log.append(make_game_log_line(game_number, ai_mode, rules, moves,
+                                      hits, exhausted_probes))
+    return shots, move_times
+
+
+def play_simulated_games(seed: int,
+                         game_numbers: range,
+                         ai_mode: str = DEFAULT_AI_MODE,
+                         rules: RuleSet = DEFAULT_RULES,
+                         log_games: bool = False
+                         ) -> tuple[list[int], Counter, list[str]]:
+    """
+    Plays the given games of the simulation one by one.
+
+    :param seed: A seed of the whole simulation.
+    :param game_numbers: Numbers of the games to play.
+    :param ai_mode: An AI mode from AI_MODES.
+    :param rules: A RuleSet of the simulation.
+    :param log_games: True to make game log lines.
+    :return: A list of shot counts in game order, a Counter of all
+    move times in SIMULATION_LATENCY_BUCKET nanosecond buckets and
+    a list of game log lines in game order, empty if not logged.
+    """
+    shot_counts = []
+    move_times: Counter = Counter()
+    log: Optional[list[str]] = [] if log_games else None
+
+    for game_number in game_numbers:
+        shots, game_move_times = play_simulated_game(seed, game_number,
+                                                     ai_mode, rules=rules,
+                                                     log=log)
+        shot_counts.append(shots)
+        move_times.update(game_move_times)
+    return shot_counts, move_times, log or []
+
+
+def get_bucket_percentile(buckets: Counter, percent: float) -> int:
+    """
+    Returns a percentile of values counted in buckets.
+
+    :param buckets: A Counter of values by bucket number.
+    :param percent: A percentile to find, from 0 to 100.
+    :return: The upper bound of the bucket holding the percentile,
+    in bucket units.
+    """
+    rank = sum(buckets.values()) * percent / 100
+    counted = 0
+
+    for bucket in sorted(buckets):
+        counted += buckets[bucket]
+        if counted >= rank:
+            return bucket + 1
+    return 0
+
+
+def make_simulation_stats(shot_counts: list[int],
+                          move_times: Counter,
+                          elapsed_time: float) -> dict[str, Any]:
+    """
+    Summarizes results of a simulation.
+
+    :param shot_counts: A list of shot counts of every game.
+    :param move_times: A Counter of move times in
+    SIMULATION_LATENCY_BUCKET nanosecond buckets.
+    :param elapsed_time: Wall time of the simulation in seconds.
+    :return: A dictionary of statistics ready for JSON.
+    """
+    bucket_us = SIMULATION_LATENCY_BUCKET / 1000
+    return {'elapsed': round(elapsed_time, 3),
+            'games_per_s': round(len(shot_counts) / elapsed_time, 1),
+            'shots': {'mean': round(statistics.fmean(shot_counts), 3),
+                      'stdev': round(statistics.pstdev(shot_counts), 3),
+                      'min': min(shot_counts),
+                      'max': max(shot_counts),
+                      'distribution': dict(sorted(
+                          Counter(shot_counts).items()))},
+            'move_latency_us': {
+                'p50': round(get_bucket_percentile(move_times, 50)
+                             * bucket_us, 1),
+                'p99': round(get_bucket_percentile(move_times, 99)
+                             * bucket_us, 1),
+                'max': round((max(move_times) + 1) * bucket_us, 1)}}
+
+
+def simulate(games: int,
+             workers: Optional[int] = None,
+             seed: Optional[int] = None,
+             ai_mode: str = DEFAULT_AI_MODE,
+             board_corpus: Optional[BoardCorpusType] = None,
+             rules: RuleSet = DEFAULT_RULES,
+             log_path: Optional[str] = None) -> dict[str, Any]:
+    """
+    Plays the given number of AI games on a pool of processes.
+
+    Games are split into chunks of SIMULATION_CHUNK_SIZE and every game
+    draws from its own random streams, so shot statistics are the same
+    for the same seed whatever the number of workers is.
+
+    :param games: The number of games to play.
+    :param workers: The number of worker processes, one per CPU if None.
+    :param seed: A seed of the simulation, a random one if None.
+    :param ai_mode: An AI mode from AI_MODES.
+    :param board_corpus: Pregenerated boards of BoardCorpusType
+    the workers share instead of generating boards, if any.
+    :param rules: A RuleSet of the simulation.
+    :param log_path: A game log file to append a JSON line of every
+    game to, in game order, if any.
+    :return: A dictionary of simulation parameters and statistics.
+    """
+    if games < 1:
+        raise ValueError("Simulation error. The number of games "
+                         "must be positive.")
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    workers = workers or os.cpu_count() or 1
+    chunks = [range(first_game, min(first_game + SIMULATION_CHUNK_SIZE,
+                                    games))
+              for first_game in range(0, games, SIMULATION_CHUNK_SIZE)]
+
+    shot_counts = []
+    move_times: Counter = Counter()
+    log_file = None if log_path is None else open(log_path, 'a')
+    start_time = time.perf_counter()
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers,
+                                 **get_pool_options(board_corpus)
+                                 ) as executor:
+            # Chunk results come back in order, whichever worker played them
+            for chunk_shot_counts, chunk_move_times, chunk_log in (
+                    executor.map(play_simulated_games, repeat(seed), chunks,
+                                 repeat(ai_mode), repeat(rules),
+                                 repeat(log_file is not None))):
+                shot_counts += chunk_shot_counts
+                move_times.update(chunk_move_times)
+                if log_file is not None:
+                    log_file.writelines(line + '\n' for line in chunk_log)
+    finally:
+        if log_file is not None:
+            log_file.close()
+    elapsed_time = time.perf_counter() - start_time
+
+    return {'games': games,
+            'workers': workers,
+            'seed': seed,
+            'ai_mode': ai_mode,
+            'rules': rules._asdict(),
+            **make_simulation_stats(shot_counts, move_times, elapsed_time)}
+
+
+def save_simulation_stats(stats: dict[str, Any],
+                          path: Optional[str] = None) -> None:
+    """
+    Writes simulation statistics as JSON.
+
+    :param stats: A dictionary of simulation statistics.
+    :param path: A file to write to, standard output if None.
+    :return: None.
+    """
+    if path is None:
+        print(json.dumps(stats, indent=4))
+    else:
+        with open(path, 'w') as stats_file:
+            json.dump(stats, stats_file, indent=4)
+            stats_file.write('\n')
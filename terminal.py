@@ -0,0 +1,383 @@
+# -*- coding: utf-8 -*-
+import argparse
+import curses
+import os
+from typing import Optional, TypedDict
+
+from ai import set_up_ai, get_ai_move
+from constants import (
+    GameDataType, GameBoardType, TileDataType, AI_MODES, DEFAULT_AI_MODE,
+    SHIP_COLORS, PLAYER_BOARD_TITLE_TEXT, AI_BOARD_TITLE_TEXT,
+    TERMINAL_BOARDS_TOP, TERMINAL_BOARD_LEFT, TERMINAL_TILE_WIDTH,
+    TERMINAL_BOARD_GAP, TERMINAL_SHIP_COLORS, TERMINAL_WATCH_DELAY,
+    TERMINAL_HELP_TEXT, TERMINAL_TOO_SMALL_TEXT)
+from game_engine import (set_up_new_game, get_reference_to_tile,
+                         update_highlighted_tile, handle_player_move,
+                         make_ai_move)
+from results import (start_results_store, stop_results_store,
+                     record_game_result, make_game_result)
+
+
+# Screen cells by (row, column): (text, curses attributes)
+ScreenCellsType = dict[tuple[int, int], tuple[str, int]]
+TerminalStateType = TypedDict('TerminalStateType',
+                              {'cells': ScreenCellsType,
+                               'color_pairs': dict[tuple[int, int, int],
+                                                   int]})
+
+QUIT_KEYS = (ord('q'), 27)  # 27 is ESC
+SHOT_KEYS = (ord(' '), ord('\n'), curses.KEY_ENTER)
+CURSOR_KEYS = {curses.KEY_LEFT: (-1, 0), ord('h'): (-1, 0),
+               curses.KEY_RIGHT: (1, 0), ord('l'): (1, 0),
+               curses.KEY_UP: (0, -1), ord('k'): (0, -1),
+               curses.KEY_DOWN: (0, 1), ord('j'): (0, 1)}
+
+
+def make_terminal_state() -> TerminalStateType:
+    """
+    Creates a TypedDict tracking what is currently drawn in the
+    terminal, with a color pair for every ship color.
+
+    :return: A terminal state with nothing drawn.
+    """
+    color_pairs = {}
+
+    if curses.has_colors():
+        curses.use_default_colors()
+        for pair_number, (color, color_name) in enumerate(
+                zip(SHIP_COLORS, TERMINAL_SHIP_COLORS), start=1):
+            curses.init_pair(pair_number,
+                             getattr(curses, f'COLOR_{color_name.upper()}'),
+                             -1)
+            color_pairs[color] = curses.color_pair(pair_number)
+
+    terminal_state: TerminalStateType
+    terminal_state = {'cells': {}, 'color_pairs': color_pairs}
+    return terminal_state
+
+
+def get_board_left(board_number: int, board_width: int) -> int:
+    """
+    Returns the terminal column of the first tile of a board.
+
+    :param board_number: 0 for the player board, 1 for the enemy board.
+    :param board_width: The board width in tiles.
+    :return: A terminal column.
+    """
+    return TERMINAL_BOARD_LEFT + board_number * (
+            board_width * TERMINAL_TILE_WIDTH + TERMINAL_BOARD_GAP)
+
+
+def get_tile_glyph(tile: TileDataType, is_hidden: bool) -> str:
+    """
+    Returns a character showing the given tile.
+
+    :param tile: A tile of TileDataType.
+    :param is_hidden: 'True' if the tile belongs to the enemy
+    and needs to be hidden.
+    :return: 'X' for damage, 'o' for a miss, '.' for a closed tile,
+    '#' for a ship and '~' for water.
+    """
+    if tile['hit_result'] == 'damage':
+        return 'X'
+    elif tile['hit_result'] == 'miss':
+        return 'o'
+    elif is_hidden:
+        return '.'
+    elif tile['is_empty']:
+        return '~'
+    return '#'
+
+
+def get_tile_attributes(tile: TileDataType,
+                        is_hidden: bool,
+                        terminal_state: TerminalStateType) -> int:
+    """
+    Returns curses attributes of the given tile: the ship color and
+    reverse video for the lighted tile.
+
+    :param tile: A tile of TileDataType.
+    :param is_hidden: 'True' if the tile belongs to the enemy
+    and needs to be hidden.
+    :param terminal_state: A TypedDict of what is currently drawn.
+    :return: Curses attributes.
+    """
+    attributes = curses.A_NORMAL
+
+    if not (is_hidden or tile['is_empty']):
+        attributes |= terminal_state['color_pairs'].get(tile['color'], 0)
+    if tile['is_lighted']:
+        attributes |= curses.A_REVERSE
+    return attributes
+
+
+def add_board_cells(cells: ScreenCellsType,
+                    board: GameBoardType,
+                    board_left: int,
+                    is_hidden: bool,
+                    terminal_state: TerminalStateType) -> None:
+    """
+    Adds a cell of every tile of the given board.
+
+    :param cells: Screen cells to add to.
+    :param board: A game board of GameBoardType(TypedDict).
+    :param board_left: The terminal column of the first tile.
+    :param is_hidden: 'True' if the board belongs to the enemy
+    and needs to be hidden.
+    :param terminal_state: A TypedDict of what is currently drawn.
+    :return: None.
+    """
+    for board_x, column in enumerate(board['tiles']):
+        for board_y, tile in enumerate(column):
+            cells[TERMINAL_BOARDS_TOP + board_y,
+                  board_left + board_x * TERMINAL_TILE_WIDTH] = (
+                get_tile_glyph(tile, is_hidden),
+                get_tile_attributes(tile, is_hidden, terminal_state))
+
+
+def get_screen_cells(game_data: GameDataType,
+                     terminal_state: TerminalStateType,
+                     screen_size: tuple[int, int]) -> ScreenCellsType:
+    """
+    Composes the whole terminal screen of the game.
+
+    :param game_data: A TypedDict of game state variables.
+    :param terminal_state: A TypedDict of what is currently drawn.
+    :param screen_size: The terminal size in (rows, columns) format.
+    :return: Screen cells by (row, column).
+    """
+    rows, columns = screen_size
+    board_width = len(game_data['player_board']['tiles'])
+    board_height = len(game_data['player_board']['tiles'][0])
+    enemy_board_left = get_board_left(1, board_width)
+    help_row = TERMINAL_BOARDS_TOP + board_height + 1
+
+    # The last column is left empty, curses can not write the last cell
+    if (rows <= help_row or columns <= max(
+            enemy_board_left + board_width * TERMINAL_TILE_WIDTH,
+            len(TERMINAL_HELP_TEXT), len(game_data['screen_message']))):
+        return {(0, 0): (TERMINAL_TOO_SMALL_TEXT[:columns - 1],
+                         curses.A_NORMAL)}
+
+    # Lines are padded, so a shorter text covers a longer one
+    line_width = columns - 1
+    cells: ScreenCellsType
+    cells = {(0, 0): (game_data['screen_message'].ljust(line_width),
+                      curses.A_BOLD),
+             (help_row, 0): (TERMINAL_HELP_TEXT.ljust(line_width),
+                             curses.A_DIM)}
+    cells[TERMINAL_BOARDS_TOP - 1, 0] = (
+        ' ' * TERMINAL_BOARD_LEFT + PLAYER_BOARD_TITLE_TEXT.ljust(
+            enemy_board_left - TERMINAL_BOARD_LEFT) + AI_BOARD_TITLE_TEXT,
+        curses.A_NORMAL)
+
+    add_board_cells(cells, game_data['player_board'], TERMINAL_BOARD_LEFT,
+                    False, terminal_state)
+    add_board_cells(cells, game_data['enemy_board'], enemy_board_left,
+                    game_data['enemy_is_hidden'], terminal_state)
+    return cells
+
+
+def draw_terminal_screen(window: 'curses.window',
+                         game_data: GameDataType,
+                         terminal_state: TerminalStateType) -> None:
+    """
+    Draws the game in the terminal. Only cells changed since
+    the previous call are written.
+
+    :param window: The curses window of the whole terminal.
+    :param game_data: A TypedDict of game state variables.
+    :param terminal_state: A TypedDict of what is currently drawn.
+    :return: None.
+    """
+    cells = get_screen_cells(game_data, terminal_state,
+                             window.getmaxyx())
+    last_cells = terminal_state['cells']
+
+    for (row, column), (text, attributes) in cells.items():
+        if last_cells.get((row, column)) != (text, attributes):
+            window.addstr(row, column, text, attributes)
+
+    terminal_state['cells'] = cells
+    window.refresh()
+
+
+def move_cursor(game_data: GameDataType,
+                cursor_tile: Optional[tuple[int, int]]) -> GameDataType:
+    """
+    Moves the lighted cursor to the given enemy board tile.
+
+    :param game_data: A TypedDict of game state variables.
+    :param cursor_tile: Coordinates of the new cursor tile
+    in (x, y) format, None to hide the cursor.
+    :return: A TypedDict of game state variables.
+    """
+    game_data['enemy_board'] = update_highlighted_tile(
+        cursor_tile, game_data['mouse_position_tile'],
+        game_data['enemy_board'])
+    game_data['mouse_position_tile'] = cursor_tile
+    return game_data
+
+
+def get_tile_at_cell(row: int,
+                     column: int,
+                     board: GameBoardType,
+                     board_left: int) -> Optional[tuple[int, int]]:
+    """
+    Returns board coordinates of a tile at the given terminal cell,
+    if it exists.
+
+    :param row: A terminal row.
+    :param column: A terminal column.
+    :param board: A game board to search the tile.
+    :param board_left: The terminal column of the first tile.
+    :return: A tuple of tile coordinates in (x, y) format or None.
+    """
+    board_x = (column - board_left) // TERMINAL_TILE_WIDTH
+    board_y = row - TERMINAL_BOARDS_TOP
+
+    if (column >= board_left and 0 <= board_x < len(board['tiles'])
+            and 0 <= board_y < len(board['tiles'][0])):
+        return board_x, board_y
+    return None
+
+
+def handle_terminal_key(key: int,
+                        game_data: GameDataType
+                        ) -> tuple[GameDataType, Optional[tuple[int, int]]]:
+    """
+    Handles a key press or a mouse click: moving the cursor, shooting,
+    starting a new game and revealing the enemy board.
+
+    :param key: A key code from curses getch().
+    :param game_data: A TypedDict of game state variables.
+    :return: A tuple of updated game data and board coordinates
+    of a player move in format (x, y).
+    """
+    enemy_board = game_data['enemy_board']
+    board_width = len(enemy_board['tiles'])
+    board_height = len(enemy_board['tiles'][0])
+    cursor_tile = game_data['mouse_position_tile'] or (0, 0)
+    target_tile = None
+
+    if key in CURSOR_KEYS:
+        shift_x, shift_y = CURSOR_KEYS[key]
+        game_data = move_cursor(game_data, (
+            min(max(cursor_tile[0] + shift_x, 0), board_width - 1),
+            min(max(cursor_tile[1] + shift_y, 0), board_height - 1)))
+
+    elif key in SHOT_KEYS:
+        target_tile = cursor_tile
+
+    elif key == curses.KEY_MOUSE:
+        try:
+            _, column, row, _, _ = curses.getmouse()
+        except curses.error:
+            # Mouse events the terminal could not decode
+            return game_data, None
+        target_tile = get_tile_at_cell(row, column, enemy_board,
+                                       get_board_left(1, board_width))
+        if target_tile is not None:
+            game_data = move_cursor(game_data, target_tile)
+
+    elif key == ord('n'):
+        game_data = set_up_new_game(game_data['ai_mode'], game_data['rules'])
+        game_data = move_cursor(game_data, (0, 0))
+
+    elif key == ord('r'):
+        game_data['enemy_is_hidden'] = not game_data['enemy_is_hidden']
+
+    if target_tile is not None:
+        tile = get_reference_to_tile(target_tile, enemy_board)
+        if tile['hit_result'] is None:
+            return game_data, target_tile
+    return game_data, None
+
+
+def run_terminal(window: 'curses.window',
+                 ai_mode: str = DEFAULT_AI_MODE,
+                 watch_delay: Optional[int] = None) -> None:
+    """
+    Plays games in the terminal until the player quits. Sleeps
+    in getch() until a key is pressed, so an idle game takes no CPU.
+
+    :param window: The curses window of the whole terminal.
+    :param ai_mode: An AI mode from AI_MODES the enemy plays with.
+    :param watch_delay: Milliseconds between moves of an AI playing
+    for the player, None to play yourself.
+    :return: None.
+    """
+    try:
+        curses.curs_set(0)
+    except curses.error:
+        pass  # the terminal can not hide the cursor
+    curses.mousemask(curses.BUTTON1_CLICKED | curses.BUTTON1_RELEASED)
+
+    terminal_state = make_terminal_state()
+    game_data = move_cursor(set_up_new_game(ai_mode), (0, 0))
+    player_ai_data = set_up_ai(game_data['rules'])
+    # Games an AI played for the player are not the player's results
+    results_store = None if watch_delay else start_results_store()
+
+    try:
+        while True:
+            game_is_watched = bool(watch_delay) and not (
+                game_data['game_is_over'])
+            if watch_delay and game_is_watched:
+                window.timeout(watch_delay)
+            else:
+                window.timeout(-1)
+            draw_terminal_screen(window, game_data, terminal_state)
+
+            key = window.getch()
+            if key in QUIT_KEYS:
+                break
+            elif key == curses.KEY_RESIZE:
+                window.clear()
+                terminal_state['cells'] = {}
+
+            last_game_data = game_data
+            game_data, player_move = handle_terminal_key(key, game_data)
+            if game_data is not last_game_data:
+                player_ai_data = set_up_ai(game_data['rules'])
+
+            # The watch delay has passed without a key press
+            if game_is_watched and key == -1:
+                player_move, player_ai_data = get_ai_move(
+                    player_ai_data, game_data['enemy_board'], ai_mode,
+                    rules=game_data['rules'])
+
+            if player_move and not game_data['game_is_over']:
+                game_data = handle_player_move(player_move, game_data)
+                if not game_data['game_is_over']:
+                    game_data = make_ai_move(game_data)
+
+                if game_data['game_is_over'] and results_store is not None:
+                    record_game_result(results_store,
+                                       make_game_result(game_data))
+    finally:
+        if results_store is not None:
+            stop_results_store(results_store)
+
+
+def main() -> None:
+    """Plays the game in a terminal without graphics."""
+    parser = argparse.ArgumentParser(
+        description="Naval battle game in the terminal.")
+    parser.add_argument('--ai', choices=AI_MODES, default=DEFAULT_AI_MODE,
+                        help="AI mode (default: %(default)s)")
+    parser.add_argument('--watch', action='store_true',
+                        help="let an AI play for you")
+    parser.add_argument('--delay', type=int, default=TERMINAL_WATCH_DELAY,
+                        help="ms between watched moves "
+                             "(default: %(default)s)")
+    args = parser.parse_args()
+
+    # ESC is also the start of escape sequences, do not wait for them long
+    os.environ.setdefault('ESCDELAY', '25')
+    curses.wrapper(run_terminal, args.ai,
+                   max(args.delay, 1) if args.watch else None)
+
+
+if __name__ == '__main__':
+    main()
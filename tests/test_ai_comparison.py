@@ -0,0 +1,37 @@
+import random
+
+from ai_comparison import (make_sequential_test, add_game_pair,
+                           get_decision, compare_ai_modes)
+
+
+def test_sequential_test_finds_stronger_mode():
+    # GIVEN a sequential test
+    sequential_test = make_sequential_test(delta=1.0)
+    # AND games where the first mode needs two shots less on average
+    rng = random.Random(0)
+    game_pairs = [(60 + rng.randint(-5, 5), 62 + rng.randint(-5, 5))
+                  for _ in range(10_000)]
+
+    # WHEN adding game pairs until the test is decided
+    decision = None
+    for shots in game_pairs:
+        add_game_pair(shots, sequential_test)
+        decision = get_decision(sequential_test)
+        if decision is not None:
+            break
+
+    # THEN the first mode is found stronger long before games run out
+    assert decision == 'first_stronger'
+    assert sequential_test['games'] < 1000
+
+
+def test_same_mode_comparison_finds_no_difference():
+    # GIVEN the same AI mode on both sides
+
+    # WHEN comparing it with itself
+    report = compare_ai_modes(('classic', 'classic'), workers=1, seed=7)
+
+    # THEN the test stops as soon as allowed with no difference found
+    assert report['decision'] == 'no_difference'
+    assert report['games'] == 100
+    assert report['mean_difference'] == 0
@@ -0,0 +1,44 @@
+from analytics import (make_game_log_line, fold_log_lines, fold_log_range,
+                       get_log_ranges, merge_aggregates, make_analytics_report)
+from constants import RuleSet
+from simulator import simulate
+
+
+def test_log_lines_decode_first_hits_of_large_boards():
+    # GIVEN games on a board with more tiles than a byte can number
+    rules = RuleSet(board_width=20, board_height=20, ship_sizes=(1,),
+                    ship_counts=(1,), ships_may_touch=False)
+    lines = [make_game_log_line(0, 'classic', rules,
+                                [(0, 0), (19, 19), (5, 7)],
+                                [False, True, True], 1),
+             make_game_log_line(1, 'classic', rules, [(12, 3)], [True], 0)]
+
+    # WHEN folding the log lines
+    aggregate = fold_log_lines(lines, {})['classic:20x20']
+
+    # THEN the first hit of every game is counted at its tile
+    assert aggregate['first_hits'][19 * 20 + 19] == 1
+    assert aggregate['first_hits'][12 * 20 + 3] == 1
+    assert aggregate['first_hits'].sum() == 2
+    # AND shot counts and exhausted probes are counted per game
+    assert aggregate['shot_counts'][3] == aggregate['shot_counts'][1] == 1
+    assert aggregate['games_with_exhausted_probes'] == 1
+
+
+def test_log_ranges_merge_into_simulation_stats(tmp_path):
+    # GIVEN a game log of a simulation
+    log_path = str(tmp_path / 'games.log')
+    stats = simulate(300, workers=1, seed=5, log_path=log_path)
+
+    # WHEN folding the log in many small byte ranges and merging them
+    aggregates = {}
+    for path, start, end in get_log_ranges([log_path], range_size=4096):
+        aggregates = merge_aggregates(aggregates,
+                                      fold_log_range(path, start, end,
+                                                     chunk_size=64))
+    report = make_analytics_report(aggregates)['classic:10x10']
+
+    # THEN every game is counted once with the shots the simulation made
+    assert report['games'] == 300
+    assert report['shots']['mean'] == stats['shots']['mean']
+    assert sum(map(sum, report['first_hit_heatmap'])) == 300
@@ -0,0 +1,38 @@
+from board_corpus import (encode_board, decode_board, close_board_corpus,
+                          get_corpus_board)
+from simulator import simulate, make_board_corpus
+
+
+def test_decoded_board_matches_original(player_board_params,
+                                        player_board_sample):
+    # GIVEN a game-ready board
+    board = player_board_sample
+
+    # WHEN encoding and decoding it
+    tile_codes = encode_board(board)
+    decoded_board = decode_board(tile_codes, player_board_params['topleft'])
+
+    # THEN the board is one byte per tile
+    assert tile_codes.shape == (10, 10)
+    # AND the decoded board matches the original
+    assert decoded_board == board
+
+
+def test_simulation_on_corpus_matches_generated_boards():
+    # GIVEN a board corpus of a simulation
+    games = 150
+    seed = 11
+    board_corpus = make_board_corpus(games, seed)
+
+    # WHEN simulating on the corpus and on generated boards
+    try:
+        corpus_stats = simulate(games, workers=2, seed=seed,
+                                board_corpus=board_corpus)
+    finally:
+        close_board_corpus(board_corpus, unlink=True)
+    generated_stats = simulate(games, workers=2, seed=seed)
+
+    # THEN the games are the same
+    assert corpus_stats['shots'] == generated_stats['shots']
+    # AND a closed corpus has no boards left
+    assert get_corpus_board(board_corpus, seed, 0) is None
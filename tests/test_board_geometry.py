@@ -0,0 +1,30 @@
+from ai import set_up_ai, remove_ship_spacing
+from board_geometry import get_tile_halos, get_ship_halo
+
+
+def test_halos_are_clipped_to_board():
+    # GIVEN a corner tile and a ship along the board edge
+    corner_tile = (0, 0)
+    ship_head = (0, 9)
+
+    # WHEN getting their halos
+    tile_halo = get_tile_halos()[corner_tile[0]][corner_tile[1]]
+    ship_halo = get_ship_halo(*ship_head, 3, 'horizontal')
+
+    # THEN only tiles on the board are included
+    assert set(tile_halo) == {(0, 0), (0, 1), (1, 0), (1, 1)}
+    assert set(ship_halo) == {(x, y) for x in range(4) for y in (8, 9)}
+
+
+def test_remove_ship_spacing_keeps_move_order():
+    # GIVEN new AI data that has destroyed a ship at the board edge
+    ai_data = set_up_ai()
+    ai_data['hit_moves'] = [(9, 3), (9, 4)]
+    expected_moves = [move for move in ai_data['available_moves']
+                      if not (move[0] >= 8 and 2 <= move[1] <= 5)]
+
+    # WHEN removing the ship spacing from available moves
+    ai_data = remove_ship_spacing(ai_data)
+
+    # THEN the ship and its surrounding are removed, other moves kept
+    assert ai_data['available_moves'] == expected_moves
@@ -0,0 +1,85 @@
+import copy
+import random
+from concurrent.futures import Executor, Future
+
+from game_engine import (set_up_new_game, handle_player_move, make_ai_move,
+                         ponder_ai_move, submit_ai_move, player_can_move,
+                         receive_ai_move)
+
+
+class SynchronousExecutor(Executor):
+    """Runs every submitted call at once, so tests need no threads."""
+
+    def submit(self, fn, /, *args, **kwargs):
+        future = Future()
+        future.set_result(fn(*args, **kwargs))
+        return future
+
+
+def test_click_is_ignored_while_ai_move_is_pending():
+    # GIVEN a game where the AI is still choosing its move
+    game_data = set_up_new_game()
+    game_data = handle_player_move((0, 0), game_data)
+    ai_move = Future()
+    game_data['pending_ai_move'] = ai_move
+
+    # WHEN the main loop checks for a move before the AI has answered
+    game_data = receive_ai_move(game_data)
+
+    # THEN the player can not shoot
+    assert not player_can_move(game_data)
+    assert game_data['pending_ai_move'] is ai_move
+
+    # WHEN the AI move is ready
+    ai_move.set_result(((0, 0), game_data['ai_data']))
+    game_data = receive_ai_move(game_data)
+
+    # THEN it is applied and the player can shoot again
+    assert game_data['last_ai_move'] == (0, 0)
+    assert player_can_move(game_data)
+
+
+def test_stale_ponder_is_dropped_after_new_game():
+    # GIVEN a game with a ponder that must never be used again
+    game_data = set_up_new_game()
+    stale_ponder = Future()
+    stale_ponder.set_exception(RuntimeError("The stale ponder was used."))
+    game_data['ai_ponder'] = stale_ponder
+
+    # WHEN a new game is started and the player shoots
+    game_data = set_up_new_game(game_data['ai_mode'], game_data['rules'])
+    assert game_data['ai_ponder'] is None
+    game_data = handle_player_move((0, 0), game_data)
+    game_data = submit_ai_move(game_data, SynchronousExecutor())
+    game_data = receive_ai_move(game_data)
+
+    # THEN the AI answers from the new game without the stale ponder
+    assert game_data['last_ai_move'] is not None
+    assert game_data['pending_ai_move'] is None
+
+
+def test_pondered_move_equals_direct_choice():
+    # GIVEN two copies of the same game
+    executor = SynchronousExecutor()
+    pondered_game = set_up_new_game()
+    direct_game = copy.deepcopy(pondered_game)
+    player_moves = [(board_x, board_y)
+                    for board_x in range(10) for board_y in range(10)]
+
+    for turn, player_move in enumerate(player_moves[:40]):
+        pondered_game = handle_player_move(player_move, pondered_game)
+        direct_game = handle_player_move(player_move, direct_game)
+        if pondered_game['game_is_over']:
+            break
+
+        # WHEN one AI ponders its move and the other chooses it directly
+        random.seed(turn)
+        pondered_game = ponder_ai_move(pondered_game, executor)
+        pondered_game = submit_ai_move(pondered_game, executor)
+        pondered_game = receive_ai_move(pondered_game)
+        random.seed(turn)
+        direct_game = make_ai_move(direct_game)
+
+        # THEN both make the same shot with the same knowledge
+        assert pondered_game['last_ai_move'] == direct_game['last_ai_move']
+        assert pondered_game['ai_data'] == direct_game['ai_data']
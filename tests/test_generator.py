@@ -1,7 +1,10 @@
+import random
+
 import pytest
 
 from board_generator import (get_new_board, place_ship_randomly,
                              get_random_board)
+from constants import RuleSet
 
 
 def test_get_new_board(player_board_params, new_player_board):
@@ -54,3 +57,28 @@ def test_get_random_board(board_params, sample_board, patch_random, request):
     board = get_random_board(board_topleft)
     # THEN generated board matches the sample
     assert board == sample_board
+
+
+def test_get_random_board_with_custom_rules():
+    # GIVEN rules of a bigger board with a dense fleet
+    rules = RuleSet(board_width=12,
+                    board_height=8,
+                    ship_sizes=(4, 3, 2, 1),
+                    ship_counts=(2, 3, 3, 4),
+                    ships_may_touch=False)
+
+    # WHEN a random board is generated
+    board = get_random_board((0, 0), random.Random(41), rules)
+
+    # THEN the board has the rules size, the whole fleet
+    # and no two ships touching
+    assert len(board['tiles']) == 12
+    assert all(len(column) == 8 for column in board['tiles'])
+    assert len(board['targets']) == 4 * 2 + 3 * 3 + 2 * 3 + 1 * 4
+    for board_x, board_y in board['targets']:
+        color = board['tiles'][board_x][board_y]['color']
+        for neighbor_x in range(max(board_x - 1, 0), min(board_x + 2, 12)):
+            for neighbor_y in range(max(board_y - 1, 0),
+                                    min(board_y + 2, 8)):
+                neighbor = board['tiles'][neighbor_x][neighbor_y]
+                assert neighbor['is_empty'] or neighbor['color'] == color
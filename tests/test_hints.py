@@ -0,0 +1,51 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from constants import DEFAULT_RULES, HINT_LEVELS
+from game_engine import set_up_new_game, handle_player_move
+from hints import compute_hint, update_hint
+
+
+def test_hint_marks_tiles_around_lone_hit():
+    # GIVEN a miss and a lone hit in the middle of the board
+    shots = [((0, 0), False), ((5, 5), True)]
+
+    # WHEN computing the hint
+    levels = compute_hint(None, shots, DEFAULT_RULES)['levels']
+
+    # THEN shot tiles are not shaded
+    assert levels[0][0] == levels[5][5] == 0
+    # AND the rest of the ship is likely next to the hit, not diagonally
+    highest_level = max(max(column) for column in levels)
+    assert levels[5][4] == levels[4][5] == highest_level
+    assert levels[4][4] == levels[6][6] == 0
+    # AND far tiles stay possible but less likely
+    assert 0 < levels[9][5] < highest_level < HINT_LEVELS
+
+
+def test_background_hint_follows_shots_incrementally():
+    # GIVEN a game with the hint shown and a few player shots
+    game_data = set_up_new_game()
+    game_data['hint_is_shown'] = True
+    executor = ThreadPoolExecutor(max_workers=1)
+
+    for move in [(0, 0), (3, 7), (9, 2), (4, 4), (6, 1)]:
+        game_data = handle_player_move(move, game_data)
+
+        # WHEN the hint is updated after every shot
+        game_data = update_hint(game_data, executor)
+        game_data['pending_hint'].result()
+        game_data = update_hint(game_data, executor)
+
+    executor.shutdown()
+    enemy_tiles = game_data['enemy_board']['tiles']
+    full_hint = compute_hint(None,
+                             [(move, enemy_tiles[move[0]][move[1]][
+                                 'hit_result'] == 'damage')
+                              for move in game_data['player_moves']],
+                             DEFAULT_RULES)
+
+    # THEN every shot is applied once and nothing is left pending
+    assert game_data['hint']['shots'] == 5
+    assert game_data['pending_hint'] is None
+    # AND the incremental hint equals the hint of all shots at once
+    assert game_data['hint']['levels'] == full_hint['levels']
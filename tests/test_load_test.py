@@ -0,0 +1,34 @@
+from load_test import handle_request, run_load_test
+
+
+def test_session_requests_play_a_game():
+    # GIVEN a session that has started a game
+    answer, game_data = handle_request('n', None)
+    assert answer == 'ok'
+
+    # WHEN the player shoots a tile, then the same tile and off the board
+    first_answer, game_data = handle_request('s 0 0', game_data)
+    repeated_answer, game_data = handle_request('s 0 0', game_data)
+    off_board_answer, game_data = handle_request('s 10 -1', game_data)
+
+    # THEN the first shot is answered with its result and the AI move
+    result, status, ai_x, ai_y = first_answer.split()
+    assert result in ('h', 'm') and status == '-'
+    assert game_data['last_ai_move'] == (int(ai_x), int(ai_y))
+    # AND the other shots are refused
+    assert repeated_answer == off_board_answer == 'e'
+
+
+def test_load_test_measures_every_stage():
+    # GIVEN a local server and two stages of clients that do not pause
+
+    # WHEN running the load test
+    report = run_load_test(stages=(2, 4), stage_duration=0.3, think_time=0.0,
+                           seed=1)
+
+    # THEN every stage has moves measured with every client in session
+    assert [stage['clients'] for stage in report['stages']] == [2, 4]
+    for stage in report['stages']:
+        assert stage['moves_per_s'] > 0 and stage['errors'] == 0
+        assert stage['server']['sessions'] == stage['clients']
+        assert stage['round_trip_ms']['p50'] <= stage['round_trip_ms']['max']
@@ -0,0 +1,67 @@
+from game_engine import set_up_new_game, handle_player_move, make_ai_move
+from metrics import (REGISTRY, make_metrics_registry, inc_counter,
+                     observe_histogram, format_metrics,
+                     start_metrics_exporter, stop_metrics_exporter)
+
+
+def test_metrics_are_formatted_for_prometheus():
+    # GIVEN an enabled registry and a disabled one
+    registry = make_metrics_registry()
+    registry['enabled'] = True
+    disabled_registry = make_metrics_registry()
+
+    # WHEN counting and observing values in both
+    for metrics_registry in (registry, disabled_registry):
+        inc_counter('navalbattle_games_total', (('winner', 'ai'),),
+                    registry=metrics_registry)
+        inc_counter('navalbattle_games_total', (('winner', 'ai'),),
+                    amount=2, registry=metrics_registry)
+        for value in (0.00001, 0.0003, 7.0):
+            observe_histogram('navalbattle_ai_move_seconds', value,
+                              (('ai_mode', 'classic'),),
+                              registry=metrics_registry)
+    inc_counter('navalbattle_games_total', (('winner', 'a "b"\\\nc'),),
+                registry=registry)
+    lines = format_metrics(registry).splitlines()
+
+    # THEN counters are summed by labels
+    assert 'navalbattle_games_total{winner="ai"} 3' in lines
+    # AND histogram buckets are cumulative, bounds included
+    assert ('navalbattle_ai_move_seconds_bucket'
+            '{ai_mode="classic",le="1e-05"} 1') in lines
+    assert ('navalbattle_ai_move_seconds_bucket'
+            '{ai_mode="classic",le="0.0005"} 2') in lines
+    assert ('navalbattle_ai_move_seconds_bucket'
+            '{ai_mode="classic",le="+Inf"} 3') in lines
+    assert 'navalbattle_ai_move_seconds_count{ai_mode="classic"} 3' in lines
+    # AND label values are escaped, so a sample stays on one line
+    assert r'navalbattle_games_total{winner="a \"b\"\\\nc"} 1' in lines
+    # AND a disabled registry records nothing
+    assert disabled_registry['counters'] == {}
+    assert disabled_registry['histograms'] == {}
+
+
+def test_metrics_exporter_writes_game_metrics(tmp_path):
+    # GIVEN a running metrics exporter
+    REGISTRY['counters'].clear()
+    REGISTRY['histograms'].clear()
+    metrics_path = str(tmp_path / 'navalbattle.prom')
+    metrics_exporter = start_metrics_exporter(metrics_path)
+
+    # WHEN a game is set up and a few moves are made
+    game_data = set_up_new_game()
+    for move in [(0, 0), (1, 1), (2, 2)]:
+        game_data = handle_player_move(move, game_data)
+        game_data = make_ai_move(game_data)
+    stop_metrics_exporter(metrics_exporter)
+
+    # THEN the final metrics file counts them
+    with open(metrics_path) as metrics_file:
+        lines = metrics_file.read().splitlines()
+    assert 'navalbattle_ships_placed_total 20' in lines
+    assert 'navalbattle_ai_move_seconds_count{ai_mode="classic"} 3' in lines
+    shot_counts = [int(line.split()[-1]) for line in lines
+                   if line.startswith('navalbattle_shots_total{')]
+    assert sum(shot_counts) == 6
+    # AND metrics are disabled again after the exporter stops
+    assert not REGISTRY['enabled']
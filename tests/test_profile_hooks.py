@@ -0,0 +1,50 @@
+import profile_hooks
+from game_engine import set_up_new_game
+from graphics import draw_game_screen
+from profile_hooks import (get_profile_frames, trace_memory,
+                           start_frame_profile, finish_profiled_frame,
+                           dump_profile_results)
+
+
+def test_profile_hooks_are_not_installed_by_default():
+    # GIVEN no profiling environment variable
+    assert get_profile_frames(None) == get_profile_frames('') == 0
+    assert get_profile_frames('120') == 120
+
+    # WHEN decorating a function with the memory hook
+    def function():
+        return 42
+
+    # THEN the function is returned as it is
+    assert trace_memory(function) is function
+    # AND the hooked hot path functions are not wrapped
+    assert not hasattr(set_up_new_game, '__wrapped__')
+    assert not hasattr(draw_game_screen, '__wrapped__')
+    # AND no frame profile is started
+    assert start_frame_profile(0) is None
+
+
+def test_profile_hooks_dump_frame_profile_and_memory(tmp_path,
+                                                    monkeypatch):
+    # GIVEN profiling enabled for two frames
+    monkeypatch.setattr(profile_hooks, 'PROFILE_FRAMES', 2)
+    monkeypatch.setattr(profile_hooks, 'MEMORY_REPORTS', [])
+    traced_set_up = trace_memory(set_up_new_game)
+    frame_profile = start_frame_profile(2, str(tmp_path))
+
+    # WHEN more frames and calls than profiled are made and results dumped
+    for _ in range(5):
+        traced_set_up()
+        finish_profiled_frame(frame_profile)
+    dump_profile_results(frame_profile)
+
+    # THEN only the first calls are traced
+    assert len(profile_hooks.MEMORY_REPORTS) == 3
+    assert profile_hooks.MEMORY_REPORTS[0].startswith(
+        'set_up_new_game call 1: ')
+    # AND the frame profile stopped after the profiled frames
+    assert frame_profile['frames_left'] == 0
+    profile_text = (tmp_path / 'navalbattle-profile.txt').read_text()
+    assert 'set_up_new_game' in profile_text
+    assert (tmp_path / 'navalbattle.prof').stat().st_size > 0
+    assert 'call 3: ' in (tmp_path / 'navalbattle-memory.txt').read_text()
@@ -0,0 +1,109 @@
+import csv
+import time
+
+import pygame
+import pytest
+from pygame import KEYUP
+from pygame.event import Event
+
+from constants import (PROFILER_HOTKEY, PROFILER_STAGES, WINDOW_WIDTH,
+                       WINDOW_HEIGHT)
+from graphics import make_render_state
+from profiler import (make_profiler, time_stage, finish_frame,
+                      get_stage_percentiles, handle_profiler_events,
+                      close_profiler)
+
+
+def test_disabled_profiler_passes_stages_through():
+    # GIVEN a new profiler, disabled until its hotkey is pressed
+    profiler = make_profiler()
+
+    # WHEN timing a stage and finishing the frame
+    result = time_stage(profiler, 'make_ai_move', divmod, 7, 2)
+    finish_frame(profiler)
+
+    # THEN the stage result is returned as it is
+    assert result == (3, 1)
+    # AND nothing is recorded
+    assert all(not samples for samples in profiler['samples'].values())
+    assert profiler['frame_times'] == dict.fromkeys(PROFILER_STAGES, 0)
+    assert profiler['frame_number'] == 0
+    assert get_stage_percentiles(profiler) == {}
+
+
+def test_stage_percentiles_are_in_milliseconds():
+    # GIVEN an enabled profiler
+    profiler = make_profiler()
+    profiler['enabled'] = True
+
+    # WHEN a stage is timed and frames of 1 to 100 ms are finished
+    time_stage(profiler, 'handle_events', time.sleep, 0.001)
+    assert profiler['frame_times']['handle_events'] >= 1_000_000
+    profiler['frame_times']['handle_events'] = 0
+    for frame_ms in range(1, 101):
+        profiler['frame_times']['draw_game_screen'] = frame_ms * 1_000_000
+        finish_frame(profiler)
+    percentiles = get_stage_percentiles(profiler)
+
+    # THEN stages have their p50, p95 and p99
+    assert percentiles['draw_game_screen'] == pytest.approx(
+        (50.5, 95.05, 99.01))
+    assert percentiles['handle_events'] == (0.0, 0.0, 0.0)
+    # AND the frame total sums up its stages
+    assert percentiles['total'] == percentiles['draw_game_screen']
+    assert profiler['frame_number'] == 100
+
+
+def test_frame_records_are_streamed_to_csv(tmp_path):
+    # GIVEN an enabled profiler streaming to a CSV file
+    csv_path = tmp_path / 'frames.csv'
+    profiler = make_profiler(str(csv_path))
+    profiler['enabled'] = True
+
+    # WHEN two frames are finished and the profiler is closed
+    for stage_time in (1000, 2000):
+        profiler['frame_times']['make_ai_move'] = stage_time
+        profiler['frame_times']['draw_game_screen'] = 3 * stage_time
+        finish_frame(profiler)
+    close_profiler(profiler)
+
+    # THEN the file is closed
+    assert profiler['csv_file'].closed
+    # AND it has a row of stage times per frame
+    with open(csv_path, newline='') as csv_file:
+        rows = list(csv.DictReader(csv_file))
+    assert [row['frame'] for row in rows] == ['0', '1']
+    assert rows[1]['make_ai_move'] == '2000'
+    assert rows[1]['handle_events'] == '0'
+    assert rows[1]['total'] == '8000'
+
+
+def test_hotkey_toggles_profiler(monkeypatch):
+    # GIVEN a profiler with a stage time of a frame before the toggle
+    monkeypatch.setenv('SDL_VIDEODRIVER', 'dummy')
+    pygame.display.init()
+    try:
+        render_state = make_render_state(
+            pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT)))
+        profiler = make_profiler()
+        profiler['frame_times']['handle_events'] = 5000
+        hotkey_event = Event(KEYUP,
+                             key=pygame.key.key_code(PROFILER_HOTKEY))
+
+        # WHEN the hotkey is pressed
+        handle_profiler_events(profiler, render_state, [hotkey_event])
+
+        # THEN the profiler is enabled with a new frame
+        assert profiler['enabled']
+        assert profiler['frame_times'] == dict.fromkeys(PROFILER_STAGES, 0)
+
+        # WHEN a stage is timed and the hotkey is pressed again
+        time_stage(profiler, 'handle_events', time.sleep, 0.001)
+        handle_profiler_events(profiler, render_state, [hotkey_event])
+
+        # THEN the profiler is disabled and the unfinished frame dropped
+        assert not profiler['enabled']
+        assert profiler['frame_times'] == dict.fromkeys(PROFILER_STAGES, 0)
+        assert profiler['overlay'] == []
+    finally:
+        pygame.display.quit()
@@ -0,0 +1,33 @@
+from results import (start_results_store, record_game_result,
+                     stop_results_store, get_win_rate_by_ai_mode,
+                     get_shot_count_histogram)
+
+
+def make_result(winner, player_shots, ai_shots, ai_mode='classic'):
+    return {'winner': winner,
+            'player_shots': player_shots,
+            'ai_shots': ai_shots,
+            'duration': 60.0,
+            'ai_mode': ai_mode,
+            'finished_at': 0.0}
+
+
+def test_results_store_writes_and_aggregates(tmp_path):
+    # GIVEN a running results store
+    db_path = str(tmp_path / 'results.sqlite3')
+    results_store = start_results_store(db_path)
+    # AND three finished games, one with an AI mode no longer offered
+    game_results = (make_result('player', 50, 49),
+                    make_result('ai', 60, 61),
+                    make_result('player', 50, 49, ai_mode='old'))
+
+    # WHEN recording results and stopping the store
+    for game_result in game_results:
+        record_game_result(results_store, game_result)
+    stop_results_store(results_store)
+
+    # THEN every queued result was written
+    assert get_win_rate_by_ai_mode(db_path) == {'classic': 0.5,
+                                                'old': 1.0}
+    assert get_shot_count_histogram('player', db_path) == {50: 2}
+    assert get_shot_count_histogram('ai', db_path) == {61: 1}
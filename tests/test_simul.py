@@ -0,0 +1,49 @@
+from constants import SIMUL_GRID_TOPLEFT, SIMUL_GRID_SIZE
+from simul import (get_simul_layout, get_simul_tile_at_pixel, set_up_simul,
+                   get_simul_move_at_pixel, play_simul_move)
+
+
+def test_simul_layout_fits_and_finds_tiles():
+    # GIVEN the layout of the biggest simul
+    layout = get_simul_layout(16)
+    grid_area = (*SIMUL_GRID_TOPLEFT, *SIMUL_GRID_SIZE)
+    boards = layout['enemy_boards'] + layout['player_boards']
+    tile_size = layout['tile_size']
+    board_rect = layout['enemy_boards'][5]
+
+    # WHEN finding tiles at pixels inside a tile, on a grid line
+    # and outside the boards
+    tile_pixel = (board_rect.left + 3 * tile_size + tile_size // 2,
+                  board_rect.top + 4 * tile_size + 1)
+    grid_pixel = (board_rect.left + 3 * tile_size, board_rect.top + 5)
+    player_board_pixel = layout['player_boards'][5].center
+
+    # THEN boards fit the grid area without overlapping and only
+    # the enemy tile is found
+    assert all(board.clip(grid_area) == board
+               for board in boards)
+    assert all(board.collidelist(boards[:number] + boards[number + 1:])
+               == -1 for number, board in enumerate(boards))
+    assert get_simul_tile_at_pixel(tile_pixel, layout) == (5, (3, 4))
+    assert get_simul_tile_at_pixel(grid_pixel, layout) is None
+    assert get_simul_tile_at_pixel(player_board_pixel, layout) is None
+
+
+def test_simul_move_plays_only_its_game():
+    # GIVEN a new simul and the first tile of its second enemy board
+    simul_data = set_up_simul(4)
+    board_rect = simul_data['layout']['enemy_boards'][1]
+    click = (board_rect.left + 2, board_rect.top + 2)
+
+    # WHEN the player shoots the tile
+    simul_move = get_simul_move_at_pixel(click, simul_data)
+    simul_data = play_simul_move(simul_move, simul_data)
+
+    # THEN the tile is shot, its AI has answered, other games
+    # are untouched and the tile can not be shot again
+    games = simul_data['games']
+    assert simul_move == (1, (0, 0))
+    assert games[1]['enemy_board']['tiles'][0][0]['hit_result'] is not None
+    assert [(game['player_shots'], game['ai_shots']) for game in games] == [
+        (0, 0), (1, 1), (0, 0), (0, 0)]
+    assert get_simul_move_at_pixel(click, simul_data) is None
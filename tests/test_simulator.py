@@ -0,0 +1,49 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from simulator import simulate
+
+
+REPOSITORY_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_simulation_does_not_depend_on_workers():
+    # GIVEN a number of games and a seed
+    games = 250
+    seed = 2023
+
+    # WHEN simulating with one and with several worker processes
+    single_worker_stats = simulate(games, workers=1, seed=seed)
+    several_workers_stats = simulate(games, workers=3, seed=seed)
+
+    # THEN every game was played
+    assert sum(single_worker_stats['shots']['distribution'].values()) == games
+    # AND shot statistics are the same
+    assert single_worker_stats['shots'] == several_workers_stats['shots']
+
+
+def test_simulation_rejects_unknown_ai_mode():
+    # GIVEN an AI mode that does not exist
+    ai_mode = 'cheating'
+
+    # WHEN simulating with it
+    # THEN the AI refuses to move
+    with pytest.raises(ValueError):
+        simulate(1, workers=1, seed=0, ai_mode=ai_mode)
+
+
+def test_simulation_prints_only_json():
+    # GIVEN the game started in simulation mode
+    command = [sys.executable, 'NavalBattle.py', '--simulate', '20',
+               '--workers', '2', '--seed', '1']
+
+    # WHEN reading its standard output
+    result = subprocess.run(command, capture_output=True, text=True,
+                            check=True, cwd=REPOSITORY_ROOT)
+
+    # THEN the whole output is the JSON report
+    assert json.loads(result.stdout)['games'] == 20
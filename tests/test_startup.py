@@ -0,0 +1,37 @@
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from constants import DEFAULT_AI_MODE, DEFAULT_RULES
+from NavalBattle import load_first_game
+
+
+def test_game_window_does_not_import_simulation_modules():
+    # GIVEN a new interpreter
+    code = ("import sys, NavalBattle; "
+            "print(sorted({'simulator', 'board_corpus', 'analytics'} "
+            "& set(sys.modules)))")
+
+    # WHEN importing the game
+    result = subprocess.run([sys.executable, '-c', code],
+                            capture_output=True, text=True, check=True)
+
+    # THEN the modules needed only by simulations are not loaded
+    assert result.stdout.splitlines()[-1] == '[]'
+
+
+def test_first_game_is_loaded_in_background():
+    # GIVEN a worker to set the first game up on
+    executor = ThreadPoolExecutor(max_workers=1)
+
+    # WHEN loading the first game
+    titles, buttons, game_data = load_first_game(DEFAULT_AI_MODE,
+                                                 DEFAULT_RULES, executor)
+    executor.shutdown()
+
+    # THEN the texts and both boards are ready to draw
+    assert set(titles) == {'player_board', 'ai_board'}
+    assert 'hint' in buttons
+    assert len(game_data['enemy_board']['targets']) == sum(
+        size * count for size, count in zip(DEFAULT_RULES.ship_sizes,
+                                            DEFAULT_RULES.ship_counts))
@@ -0,0 +1,39 @@
+import curses
+import os
+import subprocess
+import sys
+
+from game_engine import set_up_new_game
+from terminal import handle_terminal_key, get_screen_cells
+
+
+def test_terminal_front_end_does_not_import_pygame():
+    # GIVEN a fresh interpreter
+    code = "import sys, terminal; print('pygame' in sys.modules)"
+
+    # WHEN the terminal front end is imported
+    repository_dir = os.path.dirname(os.path.dirname(__file__))
+    result = subprocess.run([sys.executable, '-c', code], cwd=repository_dir,
+                            capture_output=True, text=True, check=True)
+
+    # THEN pygame is not loaded
+    assert result.stdout.strip() == 'False'
+
+
+def test_terminal_keys_aim_and_shoot():
+    # GIVEN a new game
+    game_data = set_up_new_game()
+
+    # WHEN the cursor is moved right twice and down once, then shot
+    for key in (curses.KEY_RIGHT, ord('l'), curses.KEY_DOWN):
+        game_data, player_move = handle_terminal_key(key, game_data)
+        assert player_move is None
+    game_data, player_move = handle_terminal_key(ord(' '), game_data)
+    cells = get_screen_cells(game_data, {'cells': {}, 'color_pairs': {}},
+                             (30, 100))
+
+    # THEN the cursor tile is lighted, drawn reversed and shot
+    assert player_move == (2, 1)
+    assert game_data['enemy_board']['tiles'][2][1]['is_lighted']
+    assert [cell for cell in cells.values()
+            if cell[1] & curses.A_REVERSE] == [('.', curses.A_REVERSE)]
@@ -0,0 +1,25 @@
+import pygame
+
+from game_engine import mark_shot_result
+from thumbnails import render_board_pixels, save_replay_frames
+
+
+def test_replay_frame_matches_full_render(player_board_sample, tmp_path):
+    # GIVEN a game-ready board and a sequence of shots
+    board = player_board_sample
+    shots = [(5, 0), (0, 0), (6, 0), (9, 9), (2, 8)]
+    tile_size = 8
+
+    # WHEN saving replay frames and rendering the shot board at once
+    paths = save_replay_frames(board, shots, str(tmp_path), tile_size)
+    for shot in shots:
+        board = mark_shot_result(shot, board)
+    pixels = render_board_pixels(board, tile_size)
+
+    # THEN there is a frame per shot
+    assert len(paths) == len(shots)
+    # AND the pixel array covers every tile and the closing grid lines
+    assert pixels.shape == (10 * tile_size + 1, 10 * tile_size + 1, 3)
+    # AND the last frame shows the same board as the full render
+    last_frame = pygame.surfarray.array3d(pygame.image.load(paths[-1]))
+    assert (last_frame == pixels).all()
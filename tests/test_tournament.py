@@ -0,0 +1,57 @@
+import shlex
+import sys
+
+from simulator import play_simulated_game
+from tournament import BOT_SCRIPT_PATH, run_tournament
+
+
+def test_builtin_bots_play_like_simulator():
+    # GIVEN the built-in AI and the same bot started as a command
+    bot_command = shlex.join([sys.executable, BOT_SCRIPT_PATH, 'classic'])
+
+    # WHEN they play a tournament
+    report = run_tournament(['classic', bot_command], games=20, workers=1,
+                            seed=3)
+
+    # THEN bots sink fleets in as many shots as the simulated AI does
+    mean_shots = sum(play_simulated_game(3, game_number, 'classic')[0]
+                     for game_number in range(20)) / 20
+    classic_stats = report['bots']['classic']
+    assert classic_stats['shots_to_win']['mean'] == round(mean_shots, 3)
+    # AND every board decides the match between them
+    assert (classic_stats['wins'] + classic_stats['losses']
+            + classic_stats['draws']) == 20
+    assert classic_stats['forfeits'] == {}
+
+
+def test_broken_bots_forfeit():
+    # GIVEN a bot that exits at once and a bot that never moves
+    python = shlex.quote(sys.executable)
+    crashing_bot = f'{python} -c "raise SystemExit(1)"'
+    silent_bot = (f'{python} -c "import sys; [print(\'ok\', flush=True) '
+                  f'for line in sys.stdin if line[0] == \'n\']"')
+
+    # WHEN they play a tournament with a built-in bot
+    report = run_tournament(['classic', crashing_bot, silent_bot], games=10,
+                            workers=1, seed=3, move_timeout=0.05)
+
+    # THEN they forfeit every game and the built-in bot wins them all
+    assert report['bots'][crashing_bot]['forfeits'] == {'crash': 10}
+    assert report['bots'][silent_bot]['forfeits'] == {'timeout': 10}
+    assert report['bots']['classic']['wins'] == 20
+    assert report['standings'][0] == 'classic'
+
+
+def test_bot_over_memory_limit_forfeits():
+    # GIVEN a bot that allocates 512 MiB when a game starts
+    python = shlex.quote(sys.executable)
+    memory_hog_bot = (f'{python} -c "import sys; [print(bytearray(2 ** 29) '
+                      f'and \'ok\', flush=True) for line in sys.stdin]"')
+
+    # WHEN it plays a tournament with bots capped at 256 MiB
+    report = run_tournament(['classic', memory_hog_bot], games=5, workers=1,
+                            seed=3, memory_limit=256)
+
+    # THEN it crashes and forfeits every game
+    assert report['bots'][memory_hog_bot]['forfeits'] == {'crash': 5}
+    assert report['bots']['classic']['wins'] == 5
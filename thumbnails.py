@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+import argparse
+import os
+import random
+import time
+from functools import lru_cache
+
+import numpy as np
+import pygame
+
+from board_generator import get_random_board
+from constants import (
+    GameBoardType, LIGHT_GRAY, WHITE, BLACK,
+    THUMBNAIL_TILE_SIZE, PLAYER_BOARD_TOPLEFT)
+from graphics import get_tile_color
+
+
+HIT_CODES = {None: 0, 'miss': 1, 'damage': 2}
+
+
+def get_tile_colors(board: GameBoardType,
+                    is_hidden: bool = False) -> np.ndarray:
+    """
+    Returns colors of all tiles of the given board.
+
+    :param board: A game board of GameBoardType(TypedDict).
+    :param is_hidden: 'True' if the board belongs to the enemy
+    and needs to be hidden.
+    :return: An array of (R, G, B) colors indexed by [x, y].
+    """
+    return np.array([[get_tile_color(tile, is_hidden) for tile in column]
+                     for column in board['tiles']], dtype=np.uint8)
+
+
+def get_hit_codes(board: GameBoardType) -> np.ndarray:
+    """
+    Returns shot results of all tiles of the given board.
+
+    :param board: A game board of GameBoardType(TypedDict).
+    :return: An array of HIT_CODES values indexed by [x, y].
+    """
+    return np.array([[HIT_CODES[tile['hit_result']] for tile in column]
+                     for column in board['tiles']], dtype=np.uint8)
+
+
+@lru_cache()
+def get_hit_masks(tile_size: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns pixel masks of the miss sign (dot) and the hit sign (cross)
+    for tiles of the given size.
+
+    :param tile_size: Tile size in pixels, grid line included.
+    :return: Boolean arrays of (miss mask, damage mask).
+    """
+    pixel_x, pixel_y = np.indices((tile_size, tile_size))
+    center = tile_size / 2
+    radius = max(tile_size / 8, 0.75)
+
+    miss_mask = ((pixel_x + 0.5 - center) ** 2
+                 + (pixel_y + 0.5 - center) ** 2) <= radius ** 2
+    damage_mask = ((pixel_x == pixel_y)
+                   | (pixel_x == tile_size - pixel_y))
+    return miss_mask, damage_mask
+
+
+def paint_tiles(colors: np.ndarray,
+                hit_codes: np.ndarray,
+                tile_size: int,
+                is_hidden: bool = False) -> np.ndarray:
+    """
+    Paints the given tiles into a pixel array, one tile_size block
+    per tile, grid lines not included.
+
+    :param colors: An array of tile colors indexed by [x, y].
+    :param hit_codes: An array of tile HIT_CODES indexed by [x, y].
+    :param tile_size: Tile size in pixels, grid line included.
+    :param is_hidden: 'True' if the tiles belong to the enemy
+    and need to be hidden.
+    :return: A pixel array indexed by [x, y] as pygame.surfarray uses.
+    """
+    width, height = hit_codes.shape
+    miss_mask, damage_mask = get_hit_masks(tile_size)
+    damage_color = WHITE if is_hidden else BLACK
+
+    # Blocks are indexed by [tile x, tile y, pixel x, pixel y]
+    blocks = np.empty((width, height, tile_size, tile_size, 3), np.uint8)
+    blocks[:] = colors[:, :, np.newaxis, np.newaxis, :]
+    blocks[(hit_codes == 1)[:, :, np.newaxis, np.newaxis]
+           & miss_mask] = WHITE
+    blocks[(hit_codes == 2)[:, :, np.newaxis, np.newaxis]
+           & damage_mask] = damage_color
+
+    return blocks.transpose(0, 2, 1, 3, 4).reshape(
+        width * tile_size, height * tile_size, 3)
+
+
+def draw_grid_pixels(pixels: np.ndarray, tile_size: int) -> None:
+    """
+    Draws one pixel wide grid lines over the given pixel array.
+
+    :param pixels: A board pixel array indexed by [x, y].
+    :param tile_size: Tile size in pixels, grid line included.
+    :return: None.
+    """
+    pixels[::tile_size, :] = LIGHT_GRAY
+    pixels[:, ::tile_size] = LIGHT_GRAY
+
+
+def render_board_pixels(board: GameBoardType,
+                        tile_size: int = THUMBNAIL_TILE_SIZE,
+                        is_hidden: bool = False) -> np.ndarray:
+    """
+    Renders the given board into a pixel array.
+
+    :param board: A game board of GameBoardType(TypedDict).
+    :param tile_size: Tile size in pixels, grid line included.
+    :param is_hidden: 'True' if the board belongs to the enemy
+    and needs to be hidden.
+    :return: A pixel array indexed by [x, y] as pygame.surfarray uses.
+    """
+    hit_codes = get_hit_codes(board)
+    width, height = hit_codes.shape
+
+    pixels = np.empty((width * tile_size + 1, height * tile_size + 1, 3),
+                      np.uint8)
+    pixels[:-1, :-1] = paint_tiles(get_tile_colors(board, is_hidden),
+                                   hit_codes, tile_size, is_hidden)
+    draw_grid_pixels(pixels, tile_size)
+    return pixels
+
+
+def save_pixels(pixels: np.ndarray, path: str) -> None:
+    """
+    Saves the given pixel array as an image file.
+
+    :param pixels: A pixel array indexed by [x, y].
+    :param path: A path of the image file, the format is chosen
+    by the extension.
+    :return: None.
+    """
+    pygame.image.save(pygame.surfarray.make_surface(pixels), path)
+
+
+def save_board_thumbnails(boards: list[GameBoardType],
+                          out_dir: str,
+                          tile_size: int = THUMBNAIL_TILE_SIZE
+                          ) -> list[str]:
+    """
+    Saves a PNG thumbnail of every given board with revealed ships.
+
+    :param boards: A list of game boards of GameBoardType(TypedDict).
+    :param out_dir: A directory to save thumbnails to.
+    :param tile_size: Tile size in pixels, grid line included.
+    :return: A list of saved file paths.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+
+    for board_number, board in enumerate(boards):
+        path = os.path.join(out_dir, f'board_{board_number:06d}.png')
+        save_pixels(render_board_pixels(board, tile_size), path)
+        paths.append(path)
+    return paths
+
+
+def save_replay_frames(board: GameBoardType,
+                       shots: list[tuple[int, int]],
+                       out_dir: str,
+                       tile_size: int = THUMBNAIL_TILE_SIZE) -> list[str]:
+    """
+    Saves a PNG frame of the given board after each of the given shots.
+    Shot results are taken from the board, which is not modified.
+
+    :param board: A game board of GameBoardType(TypedDict) the shots
+    were made at.
+    :param shots: A list of shot coordinates in (x, y) format,
+    in the order they were made.
+    :param out_dir: A directory to save frames to.
+    :param tile_size: Tile size in pixels, grid line included.
+    :return: A list of saved file paths.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    colors = get_tile_colors(board)
+    hit_codes = np.zeros(colors.shape[:2], np.uint8)
+
+    pixels = np.empty((colors.shape[0] * tile_size + 1,
+                       colors.shape[1] * tile_size + 1, 3), np.uint8)
+    pixels[:-1, :-1] = paint_tiles(colors, hit_codes, tile_size)
+    draw_grid_pixels(pixels, tile_size)
+    paths = []
+
+    for shot_number, (board_x, board_y) in enumerate(shots):
+        tile_is_empty = board['tiles'][board_x][board_y]['is_empty']
+        hit_codes[board_x, board_y] = HIT_CODES['miss' if tile_is_empty
+                                                else 'damage']
+
+        # Only the shot tile is repainted, then its grid lines restored
+        tile_slice = (slice(board_x, board_x + 1),
+                      slice(board_y, board_y + 1))
+        pixel_x = board_x * tile_size
+        pixel_y = board_y * tile_size
+        tile_pixels = pixels[pixel_x:pixel_x + tile_size + 1,
+                             pixel_y:pixel_y + tile_size + 1]
+        tile_pixels[:-1, :-1] = paint_tiles(
+            colors[tile_slice], hit_codes[tile_slice], tile_size)
+        draw_grid_pixels(tile_pixels, tile_size)
+
+        path = os.path.join(out_dir, f'frame_{shot_number:04d}.png')
+        save_pixels(pixels, path)
+        paths.append(path)
+    return paths
+
+
+def main() -> None:
+    """Saves thumbnails of randomly generated boards."""
+    parser = argparse.ArgumentParser(
+        description="Render thumbnails of random game boards.")
+    parser.add_argument('count', type=int, help="number of boards")
+    parser.add_argument('out_dir', help="directory to save PNG files to")
+    parser.add_argument('--tile-size', type=int, default=THUMBNAIL_TILE_SIZE)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    boards = [get_random_board(PLAYER_BOARD_TOPLEFT)
+              for _ in range(args.count)]
+
+    start_time = time.perf_counter()
+    save_board_thumbnails(boards, args.out_dir, args.tile_size)
+    elapsed_time = time.perf_counter() - start_time
+    print(f"{args.count} thumbnails in {elapsed_time:.2f} s "
+          f"({args.count / elapsed_time:.0f} boards/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,511 @@
+# -*- coding: utf-8 -*-
+import argparse
+import importlib.util
+import os
+import queue
+import random
+import shlex
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations, repeat
+from typing import Any, Optional, TextIO, TypedDict
+
+from ai import ship_was_hitted
+from constants import (
+    GameBoardType, RuleSet, AI_MODES, DEFAULT_RULES, SIMULATION_CHUNK_SIZE,
+    SIMULATION_LATENCY_BUCKET, TOURNAMENT_GAMES, TOURNAMENT_START_TIMEOUT,
+    TOURNAMENT_MOVE_TIMEOUT, TOURNAMENT_MEMORY_LIMIT, TOURNAMENT_MAX_FORFEITS)
+from simulator import (get_game_board, get_bucket_percentile,
+                       save_simulation_stats)
+
+# The launcher needs the resource module, without it (on Windows)
+# bots run without a memory cap
+HAS_RESOURCE = importlib.util.find_spec('resource') is not None
+
+
+BotProcessType = TypedDict('BotProcessType',
+                           {'process': subprocess.Popen,
+                            'replies': queue.SimpleQueue})
+
+# Running bot processes of a worker process by bot name
+WORKER_BOTS: dict[str, BotProcessType] = {}
+
+BOT_SCRIPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                               'tournament_bot.py')
+LAUNCHER_SCRIPT_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'tournament_launcher.py')
+
+
+def get_bot_command(bot_name: str) -> list[str]:
+    """
+    Returns the command line starting the given bot. A name from
+    AI_MODES starts the built-in AI, anything else is a command.
+
+    :param bot_name: An AI mode or a bot command line.
+    :return: A list of program arguments.
+    """
+    if bot_name in AI_MODES:
+        return [sys.executable, BOT_SCRIPT_PATH, bot_name]
+    return shlex.split(bot_name)
+
+
+def read_replies(stream: TextIO, replies: queue.SimpleQueue) -> None:
+    """
+    Moves lines of a bot output to a queue, and None when the bot
+    closes it. Runs in a thread per bot process.
+
+    :param stream: The bot output stream.
+    :param replies: A queue of bot lines.
+    :return: None.
+    """
+    for line in stream:
+        replies.put(line)
+    replies.put(None)
+
+
+def start_bot(bot_name: str, memory_limit: int) -> BotProcessType:
+    """
+    Starts a bot process with its output read by a thread.
+
+    :param bot_name: An AI mode or a bot command line.
+    :param memory_limit: Address space limit of the bot in MiB,
+    applied on platforms with the resource module.
+    :return: A bot process of BotProcessType(TypedDict).
+    """
+    command = get_bot_command(bot_name)
+
+    # The launcher sets the limit before it becomes the bot, so the bot
+    # can not allocate first
+    if HAS_RESOURCE:
+        command = [sys.executable, LAUNCHER_SCRIPT_PATH, str(memory_limit),
+                   *command]
+    process = subprocess.Popen(command,
+                               stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE,
+                               stderr=subprocess.DEVNULL,
+                               text=True,
+                               bufsize=1)
+
+    replies: queue.SimpleQueue = queue.SimpleQueue()
+    threading.Thread(target=read_replies, args=(process.stdout, replies),
+                     daemon=True).start()
+    return {'process': process, 'replies': replies}
+
+
+def stop_bot(bot: BotProcessType) -> None:
+    """
+    Kills a bot process and waits for it to exit.
+
+    :param bot: A bot process of BotProcessType(TypedDict).
+    :return: None.
+    """
+    bot['process'].kill()
+    bot['process'].wait()
+
+
+def get_worker_bot(bot_name: str, memory_limit: int) -> BotProcessType:
+    """
+    Returns the running process of the given bot in this worker,
+    starting a new one if there is none or the last one has exited.
+
+    :param bot_name: An AI mode or a bot command line.
+    :param memory_limit: Address space limit of the bot in MiB.
+    :return: A bot process of BotProcessType(TypedDict).
+    """
+    bot = WORKER_BOTS.get(bot_name)
+
+    if bot is None or bot['process'].poll() is not None:
+        bot = start_bot(bot_name, memory_limit)
+        WORKER_BOTS[bot_name] = bot
+    return bot
+
+
+def send_to_bot(bot: BotProcessType, line: str) -> None:
+    """
+    Writes a protocol line to a bot.
+
+    :param bot: A bot process of BotProcessType(TypedDict).
+    :param line: A line to send without the line end.
+    :return: None.
+    :raise ConnectionError: If the bot has no input or has closed it.
+    """
+    bot_input = bot['process'].stdin
+    if bot_input is None:
+        raise ConnectionError("Tournament error. The bot has no input pipe.")
+
+    try:
+        bot_input.write(line + '\n')
+        bot_input.flush()
+    except (BrokenPipeError, ValueError):
+        raise ConnectionError("Tournament error. The bot has exited.")
+
+
+def ask_bot(bot: BotProcessType, line: str, timeout: float) -> str:
+    """
+    Writes a protocol line to a bot and waits for its answer.
+
+    :param bot: A bot process of BotProcessType(TypedDict).
+    :param line: A line to send without the line end.
+    :param timeout: Seconds to wait for the answer.
+    :return: The answer line.
+    :raise TimeoutError: If the bot does not answer in time.
+    :raise ConnectionError: If the bot has exited.
+    """
+    send_to_bot(bot, line)
+    try:
+        reply = bot['replies'].get(timeout=timeout)
+    except queue.Empty:
+        raise TimeoutError("Tournament error. The bot is out of time.")
+
+    if reply is None:
+        raise ConnectionError("Tournament error. The bot has exited.")
+    return reply
+
+
+def parse_move(reply: str, rules: RuleSet) -> tuple[int, int]:
+    """
+    Reads a bot move.
+
+    :param reply: An answer line of a bot, 'x y'.
+    :param rules: A RuleSet of the game.
+    :return: Shot coordinates in (x,y) format.
+    :raise ValueError: If the answer is not a move on the board.
+    """
+    board_x, board_y = (int(field) for field in reply.split())
+
+    if not (0 <= board_x < rules.board_width
+            and 0 <= board_y < rules.board_height):
+        raise ValueError(f"Tournament error. The move {reply!r} is off "
+                         f"the board.")
+    return board_x, board_y
+
+
+def format_new_game(seed: int, game_number: int, rules: RuleSet) -> str:
+    """
+    Returns the protocol line starting a game. The game key lets bots
+    seed their randomness the way the simulator does.
+
+    :param seed: A seed of the whole tournament.
+    :param game_number: A number of the game in the tournament.
+    :param rules: A RuleSet of the game.
+    :return: A new game line without the line end.
+    """
+    sizes = ','.join(str(size) for size in rules.ship_sizes)
+    counts = ','.join(str(count) for count in rules.ship_counts)
+    return (f'n {rules.board_width} {rules.board_height} {sizes} {counts} '
+            f'{int(rules.ships_may_touch)} {seed}:{game_number}')
+
+
+def play_bot_game(bot: BotProcessType,
+                  seed: int,
+                  game_number: int,
+                  board: GameBoardType,
+                  rules: RuleSet = DEFAULT_RULES,
+                  move_timeout: float = TOURNAMENT_MOVE_TIMEOUT
+                  ) -> tuple[int, Counter]:
+    """
+    Lets a bot sink the fleet of the given board. Shots at the same
+    tile count, but only the first one can hit. Starting the game
+    has its own TOURNAMENT_START_TIMEOUT, which also covers starting
+    the bot process, and is not counted in move times.
+
+    :param bot: A bot process of BotProcessType(TypedDict).
+    :param seed: A seed of the whole tournament.
+    :param game_number: A number of the game in the tournament.
+    :param board: The board of the game. The board is not modified.
+    :param rules: A RuleSet of the tournament.
+    :param move_timeout: Seconds the bot may think over one shot.
+    :return: The number of shots the bot made and a Counter of its move
+    times in SIMULATION_LATENCY_BUCKET nanosecond buckets.
+    :raise TimeoutError: If the bot is out of time.
+    :raise ConnectionError: If the bot has exited.
+    :raise ValueError: If the bot answers with something but a move,
+    or has not sunk the fleet after shooting as many times as there
+    are tiles.
+    """
+    if ask_bot(bot, format_new_game(seed, game_number, rules),
+               TOURNAMENT_START_TIMEOUT).strip() != 'ok':
+        raise ValueError("Tournament error. The bot has not started "
+                         "the game.")
+    targets_left = len(board['targets'])
+    shot_tiles = set()
+    last_result = '-'
+    shots = 0
+    move_times: Counter = Counter()
+
+    while targets_left > 0:
+        if shots == rules.board_width * rules.board_height:
+            raise ValueError("Tournament error. The bot keeps shooting "
+                             "the same tiles.")
+        start_time = time.perf_counter_ns()
+        reply = ask_bot(bot, f'm {last_result}', move_timeout)
+        move_time = time.perf_counter_ns() - start_time
+
+        move = parse_move(reply, rules)
+        move_times[move_time // SIMULATION_LATENCY_BUCKET] += 1
+        shots += 1
+        is_hit = ship_was_hitted(move, board)
+
+        if is_hit and move not in shot_tiles:
+            targets_left -= 1
+        shot_tiles.add(move)
+        last_result = 'h' if is_hit else 'm'
+    return shots, move_times
+
+
+def play_bot_games(bot_name: str,
+                   seed: int,
+                   game_numbers: range,
+                   rules: RuleSet = DEFAULT_RULES,
+                   move_timeout: float = TOURNAMENT_MOVE_TIMEOUT,
+                   memory_limit: int = TOURNAMENT_MEMORY_LIMIT
+                   ) -> tuple[list[Optional[int]], Counter, Counter]:
+    """
+    Plays the given games of the tournament with one bot, reusing
+    the bot process of this worker between games. A bot that runs out
+    of time, exits or breaks the protocol forfeits the game and is
+    restarted for the next one. After TOURNAMENT_MAX_FORFEITS forfeits
+    in a row the bot forfeits the rest of the games for the same
+    reason, so a broken bot does not hold a worker for long.
+
+    :param bot_name: An AI mode or a bot command line.
+    :param seed: A seed of the whole tournament.
+    :param game_numbers: Numbers of the games to play.
+    :param rules: A RuleSet of the tournament.
+    :param move_timeout: Seconds the bot may think over one shot.
+    :param memory_limit: Address space limit of the bot in MiB.
+    :return: A list of shot counts in game order, None for forfeited
+    games, a Counter of forfeits by reason and a Counter of move times
+    in SIMULATION_LATENCY_BUCKET nanosecond buckets.
+    """
+    shot_counts: list[Optional[int]] = []
+    forfeits: Counter = Counter()
+    move_times: Counter = Counter()
+
+    forfeit_reason = None
+    forfeits_in_row = 0
+
+    for game_number in game_numbers:
+        if forfeits_in_row == TOURNAMENT_MAX_FORFEITS:
+            shot_counts.append(None)
+            forfeits[forfeit_reason] += 1
+            continue
+        board = get_game_board(seed, game_number, rules)
+        forfeit_reason = None
+        try:
+            bot = get_worker_bot(bot_name, memory_limit)
+            shots, game_move_times = play_bot_game(bot, seed, game_number,
+                                                   board, rules, move_timeout)
+        except TimeoutError:
+            forfeit_reason = 'timeout'
+        except (ConnectionError, OSError):
+            forfeit_reason = 'crash'
+        except ValueError:
+            forfeit_reason = 'invalid'
+
+        if forfeit_reason is None:
+            shot_counts.append(shots)
+            move_times.update(game_move_times)
+            forfeits_in_row = 0
+        else:
+            shot_counts.append(None)
+            forfeits[forfeit_reason] += 1
+            forfeits_in_row += 1
+            if bot_name in WORKER_BOTS:
+                stop_bot(WORKER_BOTS.pop(bot_name))
+    return shot_counts, forfeits, move_times
+
+
+def score_round_robin(shot_counts: dict[str, list[Optional[int]]]
+                      ) -> dict[str, Counter]:
+    """
+    Scores every pair of bots game by game: the bot that sank the same
+    fleet in fewer shots wins, a forfeit loses to a finished game.
+
+    :param shot_counts: Lists of shot counts in game order by bot name,
+    None for forfeited games.
+    :return: Counters of 'wins', 'losses' and 'draws' by bot name.
+    """
+    scores: dict[str, Counter] = {bot_name: Counter()
+                                  for bot_name in shot_counts}
+
+    for first_bot, second_bot in combinations(shot_counts, 2):
+        for first_shots, second_shots in zip(shot_counts[first_bot],
+                                             shot_counts[second_bot]):
+            first_score = (float('inf') if first_shots is None
+                           else float(first_shots))
+            second_score = (float('inf') if second_shots is None
+                            else float(second_shots))
+
+            if first_score < second_score:
+                scores[first_bot]['wins'] += 1
+                scores[second_bot]['losses'] += 1
+            elif first_score > second_score:
+                scores[first_bot]['losses'] += 1
+                scores[second_bot]['wins'] += 1
+            else:
+                scores[first_bot]['draws'] += 1
+                scores[second_bot]['draws'] += 1
+    return scores
+
+
+def make_bot_stats(shot_counts: list[Optional[int]],
+                   forfeits: Counter,
+                   move_times: Counter,
+                   score: Counter) -> dict[str, Any]:
+    """
+    Summarizes tournament results of one bot.
+
+    :param shot_counts: A list of shot counts of every game, None for
+    forfeited games.
+    :param forfeits: A Counter of forfeits by reason.
+    :param move_times: A Counter of move times in
+    SIMULATION_LATENCY_BUCKET nanosecond buckets.
+    :param score: A Counter of round robin 'wins', 'losses' and 'draws'.
+    :return: A dictionary of statistics ready for JSON.
+    """
+    finished_shots = [shots for shots in shot_counts if shots is not None]
+    bucket_us = SIMULATION_LATENCY_BUCKET / 1000
+    stats: dict[str, Any] = {'wins': score['wins'],
+                             'losses': score['losses'],
+                             'draws': score['draws'],
+                             'finished': len(finished_shots),
+                             'forfeits': dict(forfeits),
+                             'shots_to_win': None,
+                             'move_latency_us': None}
+
+    if finished_shots:
+        stats['shots_to_win'] = {
+            'mean': round(statistics.fmean(finished_shots), 3),
+            'stdev': round(statistics.pstdev(finished_shots), 3),
+            'min': min(finished_shots),
+            'max': max(finished_shots)}
+    if move_times:
+        stats['move_latency_us'] = {
+            'p50': round(get_bucket_percentile(move_times, 50) * bucket_us, 1),
+            'p99': round(get_bucket_percentile(move_times, 99) * bucket_us, 1),
+            'max': round((max(move_times) + 1) * bucket_us, 1)}
+    return stats
+
+
+def run_tournament(bot_names: list[str],
+                   games: int = TOURNAMENT_GAMES,
+                   workers: Optional[int] = None,
+                   seed: Optional[int] = None,
+                   rules: RuleSet = DEFAULT_RULES,
+                   move_timeout: float = TOURNAMENT_MOVE_TIMEOUT,
+                   memory_limit: int = TOURNAMENT_MEMORY_LIMIT
+                   ) -> dict[str, Any]:
+    """
+    Plays a round robin tournament of bots on a pool of processes.
+
+    Every bot plays every board of the tournament once, and a match
+    between two bots is decided board by board from those games, so
+    the work grows with the number of bots, not of pairs. Chunks
+    of SIMULATION_CHUNK_SIZE games of every bot are spread over
+    the workers, each keeping one process per bot.
+
+    :param bot_names: AI modes or bot command lines, at least two.
+    :param games: The number of boards every bot plays.
+    :param workers: The number of worker processes, one per CPU if None.
+    :param seed: A seed of the tournament, a random one if None.
+    :param rules: A RuleSet of the tournament.
+    :param move_timeout: Seconds a bot may think over one shot.
+    :param memory_limit: Address space limit of a bot in MiB.
+    :return: A dictionary of tournament parameters and statistics.
+    """
+    if len(set(bot_names)) < 2 or len(set(bot_names)) < len(bot_names):
+        raise ValueError("Tournament error. At least two different bots "
+                         "are needed.")
+    if games < 1:
+        raise ValueError("Tournament error. The number of games "
+                         "must be positive.")
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    workers = workers or os.cpu_count() or 1
+    chunks = [(bot_name, range(first_game,
+                               min(first_game + SIMULATION_CHUNK_SIZE, games)))
+              for first_game in range(0, games, SIMULATION_CHUNK_SIZE)
+              for bot_name in bot_names]
+    chunk_bots, chunk_games = zip(*chunks)
+
+    shot_counts: dict[str, list[Optional[int]]] = {
+        bot_name: [] for bot_name in bot_names}
+    forfeits: dict[str, Counter] = {bot_name: Counter()
+                                    for bot_name in bot_names}
+    move_times: dict[str, Counter] = {bot_name: Counter()
+                                      for bot_name in bot_names}
+    start_time = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Chunk results come back in order, whichever worker played them
+        for bot_name, (chunk_shot_counts, chunk_forfeits,
+                       chunk_move_times) in zip(chunk_bots, executor.map(
+                play_bot_games, chunk_bots, repeat(seed), chunk_games,
+                repeat(rules), repeat(move_timeout), repeat(memory_limit))):
+            shot_counts[bot_name] += chunk_shot_counts
+            forfeits[bot_name].update(chunk_forfeits)
+            move_times[bot_name].update(chunk_move_times)
+    elapsed_time = time.perf_counter() - start_time
+
+    scores = score_round_robin(shot_counts)
+    results = {bot_name: make_bot_stats(shot_counts[bot_name],
+                                        forfeits[bot_name],
+                                        move_times[bot_name],
+                                        scores[bot_name])
+               for bot_name in bot_names}
+    standings = sorted(bot_names,
+                       key=lambda bot_name: (-results[bot_name]['wins'],
+                                             results[bot_name]['losses']))
+
+    return {'games': games,
+            'workers': workers,
+            'seed': seed,
+            'rules': rules._asdict(),
+            'move_timeout': move_timeout,
+            'memory_limit_mib': memory_limit,
+            'elapsed': round(elapsed_time, 3),
+            'games_per_s': round(games * len(bot_names) / elapsed_time, 1),
+            'standings': standings,
+            'bots': results}
+
+
+def main() -> None:
+    """Runs a bot tournament and prints the results as JSON."""
+    parser = argparse.ArgumentParser(
+        description="Play a round robin tournament of AI bots on the same "
+                    "random fleets.")
+    parser.add_argument('bots', nargs='+',
+                        help=f"built-in AI modes {', '.join(AI_MODES)} "
+                             f"or bot command lines")
+    parser.add_argument('--games', type=int, default=TOURNAMENT_GAMES,
+                        help="boards every bot plays (default: %(default)s)")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--move-timeout', type=float,
+                        default=TOURNAMENT_MOVE_TIMEOUT,
+                        help="seconds per shot (default: %(default)s)")
+    parser.add_argument('--memory-limit', type=int,
+                        default=TOURNAMENT_MEMORY_LIMIT,
+                        help="MiB of address space per bot "
+                             "(default: %(default)s)")
+    parser.add_argument('--output', default=None,
+                        help="file to write tournament JSON to")
+    args = parser.parse_args()
+
+    try:
+        report = run_tournament(args.bots, args.games, args.workers,
+                                args.seed, move_timeout=args.move_timeout,
+                                memory_limit=args.memory_limit)
+    except ValueError as error:
+        parser.error(str(error))
+    save_simulation_stats(report, args.output)
+
+
+if __name__ == '__main__':
+    main()
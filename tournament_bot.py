@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+import argparse
+import random
+import sys
+from typing import Optional, TextIO
+
+from ai import set_up_ai, choose_next_move, record_shot_result
+from constants import AIDataType, RuleSet, AI_MODES, DEFAULT_RULES
+
+
+def parse_new_game(fields: list[str]) -> tuple[RuleSet, random.Random]:
+    """
+    Reads the rules and the random stream of a new tournament game.
+
+    :param fields: Fields of a new game line after the 'n' command:
+    board width, board height, comma separated ship sizes and counts,
+    1 if ships may touch else 0, and a game key.
+    :return: A RuleSet of the game and a random generator seeded the
+    same way the simulator seeds the AI of that game.
+    """
+    width, height, sizes, counts, ships_may_touch, game_key = fields
+    rules = RuleSet(board_width=int(width),
+                    board_height=int(height),
+                    ship_sizes=tuple(int(size) for size in sizes.split(',')),
+                    ship_counts=tuple(int(count)
+                                      for count in counts.split(',')),
+                    ships_may_touch=ships_may_touch == '1')
+    return rules, random.Random(f'{game_key}:ai')
+
+
+def run_bot(ai_mode: str,
+            input_stream: TextIO = sys.stdin,
+            output_stream: TextIO = sys.stdout) -> None:
+    """
+    Plays tournament games with a built-in AI mode, speaking the
+    tournament line protocol until the input is closed.
+
+    The runner sends 'n <width> <height> <sizes> <counts> <touch> <key>'
+    to start a game, which the bot answers with 'ok', then 'm <result>'
+    for every move, where result is 'h' or 'm' for a hit or a miss
+    of the last shot and '-' before the first one. The bot answers
+    every move line with 'x y'.
+
+    :param ai_mode: An AI mode from AI_MODES.
+    :param input_stream: A stream of runner lines.
+    :param output_stream: A stream to write moves to.
+    :return: None.
+    """
+    ai_data: Optional[AIDataType] = None
+    rules = DEFAULT_RULES
+    rng = random.Random()
+    move = (0, 0)
+
+    for line in input_stream:
+        command, *fields = line.split()
+
+        if command == 'n':
+            rules, rng = parse_new_game(fields)
+            ai_data = set_up_ai(rules)
+            output_stream.write('ok\n')
+            output_stream.flush()
+        elif command == 'm' and ai_data is not None:
+            if fields[0] != '-':
+                ai_data = record_shot_result(move, fields[0] == 'h', ai_data)
+            move, ai_data = choose_next_move(ai_data, ai_mode, rng, rules)
+            output_stream.write(f'{move[0]} {move[1]}\n')
+            output_stream.flush()
+        else:
+            raise ValueError(f"Tournament protocol error. Unexpected line: "
+                             f"{line!r}")
+
+
+def main() -> None:
+    """Runs a built-in AI mode as a tournament bot."""
+    parser = argparse.ArgumentParser(
+        description="Play tournament games with a built-in AI mode.")
+    parser.add_argument('ai_mode', choices=AI_MODES)
+    args = parser.parse_args()
+
+    run_bot(args.ai_mode)
+
+
+if __name__ == '__main__':
+    main()
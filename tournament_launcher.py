@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+import os
+import resource
+import sys
+
+
+def launch_bot(memory_limit: int, command: list[str]) -> None:
+    """
+    Limits the address space of this process and replaces it with
+    the bot, which keeps the limit. The tournament runner starts bots
+    through this script instead of setting the limit in preexec_fn,
+    which may deadlock a runner that has threads.
+
+    :param memory_limit: Address space limit in MiB.
+    :param command: The bot command line as a list of arguments.
+    :return: None, the process becomes the bot.
+    """
+    limit = memory_limit * 2 ** 20
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    os.execvp(command[0], command)
+
+
+def main() -> None:
+    """Starts a bot: tournament_launcher.py <MiB> <bot command...>"""
+    memory_limit, *command = sys.argv[1:]
+    launch_bot(int(memory_limit), command)
+
+
+if __name__ == '__main__':
+    main()